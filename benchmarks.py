@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# vim: set noexpandtab
+# encoding: utf-8
+"""
+benchmarks.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+
+Micro-benchmarks for the hot paths of PyPDS.
+Each benchmark runs against a synthetic product so that no test data is required,
+labels from real files may be given as arguments instead.
+
+	python benchmarks.py [pdsFile ...]
+"""
+
+import gc
+import hashlib
+import optparse
+import sys
+import tempfile
+import time
+
+try:
+	import cStringIO as StringIO
+except ImportError:
+	import StringIO
+
+from pds.core.common import map_pds, read_pds_header
+from pds.core.labels import CompactLabels
+from pds.core.parser import Parser
+from pds.core.reader import Reader
+
+
+def synthetic_label(groups=100, recordBytes=1024):
+	"""Return a MER-like label with *groups* camera model groups.
+	
+	The label is padded to a whole number of records, as it would be when attached to a product.
+	"""
+	labelBytes = 1600 + 400 * groups
+	labelRecords = (labelBytes + recordBytes - 1) // recordBytes
+	lines = ["PDS_VERSION_ID = PDS3",
+		"/* FILE FORMAT AND LENGTH */",
+		"RECORD_TYPE = FIXED_LENGTH",
+		"RECORD_BYTES = %d" % (recordBytes),
+		"FILE_RECORDS = %d" % (labelRecords + 1024),
+		"LABEL_RECORDS = %d" % (labelRecords),
+		"^IMAGE = %d" % (labelRecords + 1),
+		'NOTE = "A quoted value',
+		'        which spans two lines"']
+	for i in range(groups):
+		lines.extend(("GROUP = GEOMETRIC_CAMERA_MODEL_%d" % i,
+			'  CALIBRATION_SOURCE_ID = "SN_104"',
+			"  MODEL_TYPE = CAHVOR /* comment */",
+			"  MODEL_COMPONENT_1 = (1.03e+00, -5.22e-02, 7.21e-01)",
+			"  MODEL_COMPONENT_2 = (-1.58e-01, 9.87e-01,",
+			"                       6.09e-03)",
+			'  MODEL_COMPONENT_UNIT = {"METER", "N/A", "PIXEL"}',
+			"  REFERENCE_COORD_SYSTEM_INDEX = (1, 2, 3, 4, 5)",
+			"END_GROUP = GEOMETRIC_CAMERA_MODEL_%d" % i))
+	lines.extend(("OBJECT = IMAGE",
+		"  LINES = 1024",
+		"  LINE_SAMPLES = 1024",
+		"  SAMPLE_BITS = 8",
+		"  SAMPLE_TYPE = MSB_UNSIGNED_INTEGER",
+		"END_OBJECT = IMAGE",
+		"END", ""))
+	label = "\r\n".join(lines)
+	assert len(label) <= labelRecords * recordBytes, "The synthetic label overflows its records"
+	return label.ljust(labelRecords * recordBytes)
+
+def synthetic_product(lines=2048, samples=2048, sampleType="MSB_INTEGER", sampleBits=16, recordBytes=None, checksum=False):
+	"""Return a product with an attached image of ramps, with an MD5_CHECKSUM if *checksum* is set."""
+	sampleBytes = sampleBits // 8
+	recordBytes = recordBytes or samples * sampleBytes
+	line = "".join(chr(i % 251) for i in range(samples * sampleBytes))
+	labels = ["PDS_VERSION_ID = PDS3",
+		"RECORD_TYPE = FIXED_LENGTH",
+		"RECORD_BYTES = %d" % (recordBytes),
+		"FILE_RECORDS = %d",
+		"LABEL_RECORDS = %d",
+		"^IMAGE = %d",
+		"OBJECT = IMAGE",
+		"  LINES = %d" % (lines),
+		"  LINE_SAMPLES = %d" % (samples),
+		"  SAMPLE_TYPE = %s" % (sampleType),
+		"  SAMPLE_BITS = %d" % (sampleBits)]
+	if checksum:
+		labels.append('  MD5_CHECKSUM = "%s"' % (hashlib.md5(line * lines).hexdigest()))
+	labels.extend(("END_OBJECT = IMAGE", "END", ""))
+	label = "\r\n".join(labels)
+	labelRecords = (len(label) + 32) // recordBytes + 1
+	imageRecords = (lines * len(line) + recordBytes - 1) // recordBytes
+	label = label % (labelRecords + imageRecords, labelRecords, labelRecords + 1)
+	data = (line * lines).ljust(imageRecords * recordBytes, "\0")
+	return label.ljust(labelRecords * recordBytes) + data
+
+def legacy_read(source):
+	"""The token list implementation of ``Reader.next`` as of PyPDS 1.0.1, kept for comparison."""
+	tokens = []
+	for line in source:
+		line = line.strip()
+		if not line:
+			continue
+		elif line.startswith("/*"):
+			continue
+		elif line == "END":
+			break
+		else:
+			tokens.extend(line.split())
+	recordIndicies = [i for i, t in enumerate(tokens) if t == "="]
+	for i, recIndx in enumerate(recordIndicies):
+		keyIndex = recIndx - 1
+		dataStartIndex = recIndx + 1
+		try:
+			dataEndIndex = recordIndicies[i + 1] - 1
+		except IndexError:
+			dataEndIndex = len(tokens) - 1
+		if dataStartIndex == dataEndIndex:
+			yield tokens[keyIndex], " ".join(tokens[dataStartIndex:])
+		yield tokens[keyIndex], " ".join(tokens[dataStartIndex:dataEndIndex])
+
+def timeit(func, repeat):
+	"""Return the best wall time of *repeat* calls to *func* and its last result."""
+	best = None
+	for i in range(repeat):
+		start = time.time()
+		result = func()
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best, result
+
+def report(name, seconds, count, unit):
+	"""Write a single result line."""
+	rate = seconds and count / seconds or float("inf")
+	sys.stdout.write("%-60s %12.0f %s/s (%g %s in %.4fs)\n" % (name, rate, unit, count, unit, seconds))
+
+def bench_reader(filenames, repeat):
+	"""Compare records/sec of the legacy token list reader with ``Reader``, reading lines and a memory map."""
+	reader = Reader()
+	for name in filenames:
+		label = read_pds_header(name)
+		mapped = map_pds(name)
+		legacyTime, legacyRecords = timeit(lambda: list(legacy_read(StringIO.StringIO(label))), repeat)
+		readerTime, readerRecords = timeit(lambda: list(reader.read(StringIO.StringIO(label))), repeat)
+		mappedTime, mappedRecords = timeit(lambda: list(reader.read(mapped)), repeat)
+		report("legacy_read %s" % (name), legacyTime, len(legacyRecords), "records")
+		report("Reader.read %s" % (name), readerTime, len(readerRecords), "records")
+		report("Reader.read (mapped) %s" % (name), mappedTime, len(mappedRecords), "records")
+
+def deep_sizeof(root):
+	"""Return the bytes held by *root* and everything it refers to, counting shared objects once."""
+	seen = set()
+	stack = [root]
+	total = 0
+	while stack:
+		obj = stack.pop()
+		if id(obj) in seen or isinstance(obj, type):
+			continue
+		seen.add(id(obj))
+		if isinstance(obj, CompactLabels):
+			# Its own estimate covers the values, which are followed below.
+			total += object.__sizeof__(obj)
+		else:
+			total += sys.getsizeof(obj)
+		stack.extend(gc.get_referents(obj))
+	return total
+
+def bench_memory(filenames, count):
+	"""Compare the bytes per label set held by nested dictionaries with that of ``CompactLabels``."""
+	for name in filenames:
+		label = read_pds_header(name)
+		for parser in (Parser(), Parser(compact=True)):
+			labelSets = [parser.parse(StringIO.StringIO(label)) for i in range(count)]
+			perSet = (deep_sizeof(labelSets) - sys.getsizeof(labelSets)) / float(count)
+			kind = parser.compact and "compact" or "nested"
+			sys.stdout.write("%-60s %12.0f bytes/label set (%d sets)\n" % ("Parser %s %s" % (kind, name), perSet, count))
+			del labelSets
+
+def bench_extract(filenames, repeat):
+	"""Compare the images/sec of ``ImageExtractor.extract`` with ``extract_array`` and ``extract_window``."""
+	from pds.imageextractor import ImageExtractor, numpy
+
+	extractor = ImageExtractor(fullLabels=False)
+	for name in filenames:
+		extractTime, img = timeit(lambda: extractor.extract(name)[0].load(), repeat)
+		report("ImageExtractor.extract %s" % (name), extractTime, 1, "images")
+		if numpy is not None:
+			# Sum the array, so that every byte is read as it is by extract.
+			arrayTime, total = timeit(lambda: extractor.extract_array(name)[0].sum(), repeat)
+			report("ImageExtractor.extract_array %s" % (name), arrayTime, 1, "images")
+			windowTime, total = timeit(lambda: extractor.extract_window(name, slice(1000, 1256), slice(300, 556))[0].sum(), repeat)
+			report("ImageExtractor.extract_window 256x256 %s" % (name), windowTime, 1, "images")
+
+def bench_checksum(repeat, lines=4096, samples=4096):
+	"""Compare the images/sec of ``ImageExtractor.extract`` for each checksum mode, for mapped and read files."""
+	from pds.imageextractor import CHECKSUM_MODES, ImageExtractor
+
+	data = synthetic_product(lines, samples, "MSB_UNSIGNED_INTEGER", 8, checksum=True)
+	product = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".img")
+	product.write(data)
+	product.flush()
+	for checksumMode in CHECKSUM_MODES:
+		extractor = ImageExtractor(fullLabels=False, checksumMode=checksumMode)
+		# The lazy checksum is verified as the image is loaded.
+		mappedTime, img = timeit(lambda: extractor.extract(product.name)[0].load(), repeat)
+		report("ImageExtractor.extract checksumMode=%s mapped" % (checksumMode), mappedTime, 1, "images")
+		readTime, img = timeit(lambda: extractor.extract(StringIO.StringIO(data))[0].load(), repeat)
+		report("ImageExtractor.extract checksumMode=%s read" % (checksumMode), readTime, 1, "images")
+
+def bench_stretch(repeat, lines=2048, samples=2048):
+	"""Compare the images/sec of 16 to 8 bit conversion by ``scale_to_8_bits`` with each stretch."""
+	from pds.imageextractor import Image, ImageExtractor, numpy, scale_to_8_bits
+	from pds.stretch import stretch
+
+	product = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".img")
+	product.write(synthetic_product(lines, samples, "MSB_UNSIGNED_INTEGER", 16))
+	product.flush()
+	extractor = ImageExtractor(fullLabels=False)
+	scaleTime, img = timeit(lambda: scale_to_8_bits(extractor.extract(product.name)[0]), repeat)
+	report("scale_to_8_bits(ImageExtractor.extract)", scaleTime, 1, "images")
+	if numpy is not None:
+		for spec in ("shift", "linear", "percentile"):
+			stretchTime, img = timeit(lambda: Image.fromarray(stretch(extractor.extract_array(product.name)[0], spec)), repeat)
+			report("stretch(ImageExtractor.extract_array, %r)" % (spec), stretchTime, 1, "images")
+
+def bench_thumbnail(repeat, lines=4096, samples=4096, maxSize=1024):
+	"""Compare the images/sec of a browse image resized by PIL with ``ImageExtractor.thumbnail``."""
+	from pds.imageextractor import Image, ImageExtractor, numpy
+
+	data = synthetic_product(lines, samples, "MSB_UNSIGNED_INTEGER", 16)
+	product = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".img")
+	product.write(data)
+	product.flush()
+	extractor = ImageExtractor(fullLabels=False)
+	resizeTime, img = timeit(lambda: extractor.extract(product.name)[0].resize((maxSize, maxSize), Image.NEAREST), repeat)
+	report("ImageExtractor.extract + resize %d" % (maxSize), resizeTime, 1, "images")
+	if numpy is not None:
+		for box in (False, True):
+			thumbnailTime, array = timeit(lambda: extractor.thumbnail(product.name, maxSize, box=box)[0].sum(), repeat)
+			report("ImageExtractor.thumbnail %d box=%s mapped" % (maxSize, box), thumbnailTime, 1, "images")
+			thumbnailTime, array = timeit(lambda: extractor.thumbnail(StringIO.StringIO(data), maxSize, box=box)[0].sum(), repeat)
+			report("ImageExtractor.thumbnail %d box=%s read" % (maxSize, box), thumbnailTime, 1, "images")
+
+def bench_compressed(repeat, lines=2048, samples=2048):
+	"""Compare the windows/sec from a gzip product, decompressed whole or read through its access point index."""
+	import gzip
+
+	from pds.core import compressed
+	from pds.imageextractor import ImageExtractor, numpy
+
+	data = synthetic_product(lines, samples, "MSB_UNSIGNED_INTEGER", 16)
+	if numpy is not None:
+		# Noisy 12 bit samples compress about as well as real ones, unlike the ramps.
+		imageBytes = lines * samples * 2
+		noise = numpy.random.RandomState(0).randint(0, 4096, lines * samples).astype('>u2')
+		data = data[:-imageBytes] + noise.tostring()
+	product = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".img.gz")
+	with gzip.GzipFile(fileobj=product, mode="wb") as f:
+		f.write(data)
+	product.flush()
+	extractor = ImageExtractor(fullLabels=False)
+	wholeTime, data = timeit(lambda: gzip.open(product.name).read(), repeat)
+	report("gzip.open().read() %s" % (product.name), wholeTime, 1, "images")
+	if numpy is not None:
+		window = slice(lines - 256, lines), slice(0, 256)
+		compressed._indexes.clear()
+		coldTime, array = timeit(lambda: extractor.extract_window(product.name, *window)[0].sum(), 1)
+		report("ImageExtractor.extract_window 256x256, building the index", coldTime, 1, "windows")
+		warmTime, array = timeit(lambda: extractor.extract_window(product.name, *window)[0].sum(), repeat)
+		report("ImageExtractor.extract_window 256x256, indexed", warmTime, 1, "windows")
+
+def bench_table(repeat, rows=100000):
+	"""Compare the rows/sec of an ASCII table split and converted row by row in Python with ``TableExtractor``."""
+	from pds.tableextractor import TableExtractor, numpy
+
+	if numpy is None:
+		return
+	row = "%8d,%12.5E,%10s\r\n"
+	rowBytes = len(row % (0, 0.0, '"A"'))
+	label = ["PDS_VERSION_ID = PDS3", "RECORD_TYPE = FIXED_LENGTH", "RECORD_BYTES = %d" % (rowBytes), "LABEL_RECORDS = %d",
+		"^TABLE = %d", "OBJECT = TABLE", "INTERFACE_FORMAT = ASCII", "ROWS = %d" % (rows), "ROW_BYTES = %d" % (rowBytes),
+		"COLUMNS = 3"]
+	for name, dataType, startByte, columnBytes in (("COUNT", "ASCII_INTEGER", 1, 8), ("VALUE", "ASCII_REAL", 10, 12), ("NAME", "CHARACTER", 23, 10)):
+		label.extend(("OBJECT = COLUMN", "NAME = %s" % (name), "DATA_TYPE = %s" % (dataType), "START_BYTE = %d" % (startByte),
+			"BYTES = %d" % (columnBytes), "END_OBJECT = COLUMN"))
+	label.extend(("END_OBJECT = TABLE", "END", ""))
+	label = "\r\n".join(label)
+	labelRecords = len(label) // rowBytes + 2
+	label = (label % (labelRecords, labelRecords + 1)).ljust(labelRecords * rowBytes)
+	product = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".lbl")
+	product.write(label + "".join(row % (i, i / 7.0, '"R%d"' % (i % 1000)) for i in xrange(rows)))
+	product.flush()
+
+	def legacy():
+		with open(product.name, "rb") as f:
+			f.seek(labelRecords * rowBytes)
+			return [(int(line[0:8]), float(line[9:21]), line[22:32].strip(' "')) for line in f]
+	legacyTime, table = timeit(legacy, repeat)
+	report("ASCII table parsed row by row", legacyTime, rows, "rows")
+	extractor = TableExtractor(fullLabels=False)
+	tableTime, table = timeit(lambda: extractor.extract(product.name)[0], repeat)
+	report("TableExtractor.extract", tableTime, rows, "rows")
+	tableTime, table = timeit(lambda: extractor.extract(product.name, columns=['VALUE'])[0], repeat)
+	report("TableExtractor.extract columns=['VALUE']", tableTime, rows, "rows")
+
+def bench_qube(repeat, bands=64, lines=512, samples=512):
+	"""Compare reading a whole band sequential qube with extracting one band, or one spectrum, of it."""
+	from pds.qubeextractor import QubeExtractor, numpy
+
+	if numpy is None:
+		return
+	recordBytes = 512
+	label = ["PDS_VERSION_ID = PDS3", "RECORD_TYPE = FIXED_LENGTH", "RECORD_BYTES = %d" % (recordBytes), "LABEL_RECORDS = 2",
+		"^QUBE = 3", "OBJECT = QUBE", "AXES = 3", "AXIS_NAME = (SAMPLE,LINE,BAND)", "CORE_ITEMS = (%d,%d,%d)" % (samples, lines, bands),
+		"CORE_ITEM_BYTES = 2", "CORE_ITEM_TYPE = SUN_INTEGER", "SUFFIX_BYTES = 4", "SUFFIX_ITEMS = (0,0,2)",
+		"BAND_SUFFIX_ITEM_TYPE = SUN_REAL", "END_OBJECT = QUBE", "END", ""]
+	core = numpy.arange(bands * lines * samples, dtype='>i2')
+	product = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".qub")
+	product.write("\r\n".join(label).ljust(2 * recordBytes))
+	product.write(core.tostring())
+	product.write(numpy.zeros(2 * lines * samples, '>f4').tostring())
+	product.flush()
+	data = open(product.name, "rb").read()
+
+	def legacy():
+		with open(product.name, "rb") as f:
+			f.seek(2 * recordBytes)
+			return numpy.fromstring(f.read(core.nbytes), '>i2').reshape(bands, lines, samples)[:, lines // 2, samples // 2]
+	extractor = QubeExtractor(fullLabels=False)
+	legacyTime, spectrum = timeit(legacy, repeat)
+	report("Qube read whole for a spectrum", legacyTime, 1, "spectra")
+	spectrumTime, spectrum = timeit(lambda: extractor.extract_spectrum(product.name, lines // 2, samples // 2)[0], repeat)
+	report("QubeExtractor.extract_spectrum mapped", spectrumTime, 1, "spectra")
+	spectrumTime, spectrum = timeit(lambda: extractor.extract_spectrum(StringIO.StringIO(data), lines // 2, samples // 2)[0], repeat)
+	report("QubeExtractor.extract_spectrum read", spectrumTime, 1, "spectra")
+	bandTime, band = timeit(lambda: extractor.extract_band(product.name, bands // 2)[0].sum(), repeat)
+	report("QubeExtractor.extract_band mapped", bandTime, 1, "bands")
+	qubeTime, qube = timeit(lambda: extractor.extract(product.name)[0].core[:, lines // 2, samples // 2].sum(), repeat)
+	report("QubeExtractor.extract mapped, one spectrum", qubeTime, 1, "spectra")
+
+def bench_product(repeat, groups=100):
+	"""Compare the products/sec of three extractions which each open and parse a product with those sharing a ``Product``."""
+	from pds.imageextractor import ImageExtractor, numpy
+	from pds.product import Product
+
+	if numpy is None:
+		return
+	product = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".img")
+	product.write(synthetic_label(groups))
+	product.write("".join(chr(i % 251) for i in range(1024)) * 1024)
+	product.flush()
+	extractor = ImageExtractor(checksumMode='skip')
+
+	def separate():
+		return (extractor.extract_array(product.name)[0].sum(), extractor.thumbnail(product.name, 64)[0].sum(),
+			extractor.extract_window(product.name, slice(0, 16), slice(0, 16))[0].sum())
+
+	def shared():
+		with Product(product.name) as pdsProduct:
+			return (extractor.extract_array(pdsProduct)[0].sum(), extractor.thumbnail(pdsProduct, 64)[0].sum(),
+				extractor.extract_window(pdsProduct, slice(0, 16), slice(0, 16))[0].sum())
+	separateTime, result = timeit(separate, repeat)
+	report("3 extractions, each opening the product", separateTime, 1, "products")
+	sharedTime, result = timeit(shared, repeat)
+	report("3 extractions, sharing a Product", sharedTime, 1, "products")
+
+def bench_index(repeat, files=2000, groups=20):
+	"""Compare the files/sec of indexing a tree from scratch with indexing it again, unchanged."""
+	import os
+	import shutil
+	from pds.indexer import Indexer
+
+	directory = tempfile.mkdtemp(prefix="synthetic")
+	try:
+		label = synthetic_label(groups)
+		for i in range(files):
+			with open(os.path.join(directory, "%05d.img" % (i)), "wb") as f:
+				f.write(label)
+		database = os.path.join(directory, "index.db")
+
+		def index():
+			if os.path.exists(database):
+				os.remove(database)
+			indexer = Indexer(database, patterns=('*.img',))
+			try:
+				return indexer.index(directory)
+			finally:
+				indexer.close()
+
+		def reindex():
+			indexer = Indexer(database, patterns=('*.img',))
+			try:
+				return indexer.index(directory)
+			finally:
+				indexer.close()
+		indexTime, stats = timeit(index, repeat)
+		report("Indexer.index from scratch", indexTime, files, "files")
+		reindexTime, stats = timeit(reindex, repeat)
+		report("Indexer.index unchanged", reindexTime, files, "files")
+	finally:
+		shutil.rmtree(directory)
+
+def bench_sample_types(repeat, lines=1024, samples=1024):
+	"""Report the megabytes/sec at which each sample type is extracted, as a view, in native byte order and by PIL."""
+	from pds.imageextractor import ImageExtractor, numpy
+
+	extractor = ImageExtractor(fullLabels=False)
+	if numpy is not None:
+		# The ramps make for nonsense reals, which are summed all the same.
+		numpy.seterr(all="ignore")
+	for sampleType, sampleBits in (("MSB_UNSIGNED_INTEGER", 8), ("MSB_INTEGER", 16), ("LSB_INTEGER", 16),
+			("MSB_UNSIGNED_INTEGER", 32), ("IEEE_REAL", 32), ("PC_REAL", 64)):
+		product = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".img")
+		product.write(synthetic_product(lines, samples, sampleType, sampleBits))
+		product.flush()
+		megabytes = lines * samples * sampleBits / 8 / 1e6
+		name = "%d bit %s" % (sampleBits, sampleType)
+		if numpy is not None:
+			viewTime, total = timeit(lambda: extractor.extract_array(product.name)[0].sum(), repeat)
+			report("extract_array %s" % (name), viewTime, megabytes, "MB")
+			nativeTime, total = timeit(lambda: extractor.extract_array(product.name, native=True)[0].sum(), repeat)
+			report("extract_array native %s" % (name), nativeTime, megabytes, "MB")
+		extractTime, img = timeit(lambda: extractor.extract(product.name)[0].load(), repeat)
+		report("extract %s" % (name), extractTime, megabytes, "MB")
+		product.close()
+
+def setUpOptionParser():
+	"""Define the command line options."""
+	usage = "usage: %prog [options] [pdsFile ...]"
+	parser = optparse.OptionParser(usage=usage)
+	parser.set_defaults(repeat=5)
+	parser.set_defaults(groups=200)
+	parser.set_defaults(count=1000)
+	parser.add_option("--repeat",
+		dest="repeat", type="int",
+		help="number of timed repetitions, the best is reported [default=%default]", metavar="INT")
+	parser.add_option("--groups",
+		dest="groups", type="int",
+		help="number of groups in the synthetic label [default=%default]", metavar="INT")
+	parser.add_option("--count",
+		dest="count", type="int",
+		help="number of label sets held by the memory benchmark [default=%default]", metavar="INT")
+	return parser
+
+
+if __name__ == '__main__':
+	parser = setUpOptionParser()
+	(options, args) = parser.parse_args()
+
+	synthetic = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".lbl")
+	synthetic.write(synthetic_label(options.groups))
+	synthetic.flush()
+	filenames = [synthetic.name] + args
+
+	bench_reader(filenames, options.repeat)
+	bench_memory(filenames, options.count)
+	
+	product = tempfile.NamedTemporaryFile(prefix="synthetic", suffix=".img")
+	product.write(synthetic_product())
+	product.flush()
+	bench_extract([product.name], options.repeat)
+	bench_checksum(options.repeat)
+	bench_stretch(options.repeat)
+	bench_thumbnail(options.repeat)
+	bench_compressed(options.repeat)
+	bench_table(options.repeat)
+	bench_qube(options.repeat)
+	bench_product(options.repeat)
+	bench_index(options.repeat)
+	bench_sample_types(options.repeat)
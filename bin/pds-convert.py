@@ -7,38 +7,94 @@ Created by Ryan Balfanz on 2009-11-27.
 Copyright (c) 2009 Ryan Balfanz. All rights reserved.
 """
 
+import multiprocessing
 import optparse
 import os
+import signal
 import sys
+import time
 
-import cStringIO as StringIO
+from pds.core.cache import LabelCache
+from pds.core.common import iter_pds
+from pds.imageextractor import Image, ImageExtractor
+from pds.stretch import STRETCHES, to_display
 
-from pds.imageextractor import ImageExtractor
+def create_extractor(options):
+	"""Return the extractor used for every file, as set up by *options*."""
+	labelCache = options.label_cache and LabelCache(options.label_cache) or None
+	return ImageExtractor(log=options.log, cache=labelCache, fullLabels=options.show_labels)
 
-def gfiles(*args, **kwargs):
-	"""Generate chunked files from input provided by fileinput.input().
+def convert(extractor, pdsFile, pdsFilename, options):
+	"""Convert the image of *pdsFile*, named *pdsFilename*, into the destination directory.
 	
-	Yields a filename and contents, with line endings preserved.
+	Return the path of the converted image, or None if no image was found, and the labels.
 	"""
-	import fileinput
-	import cStringIO as StringIO
+	if options.thumbnail:
+		array, labels = extractor.thumbnail(pdsFile, options.thumbnail)
+	else:
+		array, labels = extractor.extract_array(pdsFile)
+	if array is None:
+		return None, labels
+	img = Image.fromarray(to_display(array, options.stretch))
+	basename = os.path.basename(pdsFilename)
+	filename = basename + ".%s" % (options.format)
+	filepath = os.path.join(options.dest_dir, filename)
+	img.save(filepath)
+	return filepath, labels
+
+# Results are waited for this many seconds at a time, so that an interrupt is seen while the workers are busy.
+RESULT_POLL_SECONDS = 0.5
+
+# The extractor and options of a worker process, set up once by ``init_worker`` and reused for each of its files.
+_workerExtractor = None
+_workerOptions = None
+
+def init_worker(options):
+	"""Set up a worker process of the pool, interrupts are left to the main process."""
+	global _workerExtractor, _workerOptions
 	
-	from collections import deque
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	_workerExtractor = create_extractor(options)
+	_workerOptions = options
+
+def convert_in_worker(pdsFilename):
+	"""Convert *pdsFilename* in a worker process.
 	
-	d = deque()
-	for line in fileinput.input(*args, **kwargs):
-		if fileinput.isfirstline():
+	Return the filename, the path of the converted image, the labels if they are to be shown, and an error message.
+	Any exception is returned as the error message, rather than raised, so that it only fails its own file.
+	"""
+	try:
+		filepath, labels = convert(_workerExtractor, pdsFilename, pdsFilename, _workerOptions)
+	except Exception, e:
+		return pdsFilename, None, None, "%s: %s" % (e.__class__.__name__, e)
+	return pdsFilename, filepath, _workerOptions.show_labels and labels or None, None
+
+def convert_in_pool(filenames, options):
+	"""Convert *filenames* in a pool of options.jobs worker processes, yielding the results of ``convert_in_worker``.
+	
+	The results are in the order of *filenames*, or in the order they complete if options.unordered is set.
+	"""
+	pool = multiprocessing.Pool(options.jobs, init_worker, (options,))
+	try:
+		# Hand out a few files at a time, enough to keep the workers busy but not so many that the last ones are left idle.
+		chunkSize = max(1, min(16, len(filenames) // (options.jobs * 8)))
+		imap = options.unordered and pool.imap_unordered or pool.imap
+		results = imap(convert_in_worker, filenames, chunkSize)
+		while True:
 			try:
-				fname, fhandle = d.pop()
-				yield fname, fhandle.getvalue()
-			except IndexError:
-				pass
-			d.append((fileinput.filename(), StringIO.StringIO()))
-			buf = d[-1][1]
-		buf.write(line)
-		
-	fname, fhandle = d.pop()
-	yield fname, fhandle.getvalue()
+				# Waiting without a timeout ignores interrupts until a result arrives.
+				result = results.next(timeout=RESULT_POLL_SECONDS)
+			except multiprocessing.TimeoutError:
+				continue
+			except StopIteration:
+				break
+			yield result
+		pool.close()
+	except:
+		pool.terminate()
+		raise
+	finally:
+		pool.join()
 
 def setUpOptionParser():
 	"""docstring for setUpOptionParser"""
@@ -48,12 +104,17 @@ def setUpOptionParser():
 	# Define the option parser default values.
 	parser.set_defaults(filename=sys.stdin)
 	parser.set_defaults(verbose=False)
+	parser.set_defaults(label_cache=None)
 	parser.set_defaults(dest_dir=".")
 	parser.set_defaults(format=None)
 	parser.set_defaults(show_labels=False)
 	parser.set_defaults(no_show=False)
 	parser.set_defaults(ignore_exceptions=False)
 	parser.set_defaults(step_through=False)
+	parser.set_defaults(stretch=None)
+	parser.set_defaults(thumbnail=None)
+	parser.set_defaults(jobs=1)
+	parser.set_defaults(unordered=False)
 	
 	# Define option parser groups.
 	dangerGroup = optparse.OptionGroup(parser, "Dangerous/Experimental Options",
@@ -73,12 +134,29 @@ def setUpOptionParser():
 	parser.add_option("--log",
 		action="store", dest="log",
 		help="optional log filename, .log extension will be added", metavar="FILE")
+	parser.add_option("--label-cache",
+		action="store", dest="label_cache",
+		help="cache parsed labels in DIR, they are reused across runs while the files are unchanged", metavar="DIR")
 	parser.add_option("--dest-dir",
 		action="store", dest="dest_dir",
 		help="destination directory [default=%default]", metavar="DIR")
 	parser.add_option("--format",
 		action="store", dest="format",
 		help="output format [default=%default]")
+	parser.add_option("--stretch",
+		action="store", dest="stretch",
+		help="stretch the samples to 8 bits by one of linear[:LOW,HIGH], percentile[:LOW,HIGH], shift[:BITS] or lut:FILE, "
+		"8 bit samples are only stretched when given [default=linear]", metavar="STRETCH")
+	parser.add_option("--thumbnail",
+		action="store", dest="thumbnail", type="int",
+		help="convert a thumbnail of at most N lines and line samples, only every few lines are read", metavar="N")
+	parser.add_option("-j", "--jobs",
+		action="store", dest="jobs", type="int",
+		help="convert N files at a time, each in a process of its own, "
+		"a file which fails is reported and the others are still converted [default=%default]", metavar="N")
+	parser.add_option("--unordered",
+		action="store_true", dest="unordered",
+		help="with --jobs, report files as they are converted rather than in the order given [default=%default]")
 	parser.add_option("--show-labels",
 		action="store_false", dest="show_labels",
 		help="pretty print PDS labels [default=%default]")
@@ -96,41 +174,80 @@ if __name__ == '__main__':
 	if not args:
 		parser.error("you must specifiy at least one input file argument")
 		
+	if options.thumbnail is not None and options.thumbnail < 1:
+		parser.error("the thumbnail size must be at least 1")
+		
+	if options.stretch and options.stretch.partition(":")[0] not in STRETCHES:
+		parser.error("the stretch must be one of %s" % (", ".join(STRETCHES)))
+		
 	if not options.format:
 		parser.error("you must specifiy at an output file format")
 		
-	extractor = ImageExtractor(log=options.log)
-	for pdsFilename, pdsContents in gfiles(files=args, mode="rb"):
-		pdsFile = StringIO.StringIO(pdsContents)
+	if options.jobs < 1:
+		parser.error("the number of jobs must be at least 1")
 		
-		if options.step_through:
-			sys.stderr.write("stepping through files... press enter to continue\n")
-			raw_input()
-			
-		if options.verbose:
-			errorMessage = "Reading input from '%s'\n" % (pdsFilename)
-			sys.stderr.write(errorMessage)
+	if options.jobs > 1 and options.step_through:
+		parser.error("--step-through can not be used with --jobs")
 		
-		img = None
-		try:
-			img, labels = extractor.extract(pdsFile)
-		except:
-			if options.ignore_exceptions:
-				if options.verbose:
-					errorMessage = "Warn: Caught exception raised during extraction from '%s', ignoring\n" % (pdsFilename)
-					sys.stderr.write(errorMessage)
+	if options.jobs > 1 and '-' in args:
+		parser.error("standard input can not be converted with --jobs")
+		
+	startTime = time.time()
+	converted = failed = errors = 0
+	if options.jobs > 1:
+		for pdsFilename, filepath, labels, error in convert_in_pool(args, options):
+			if error:
+				failed += 1
+				errors += 1
+				errorMessage = "Error: Could not extract image from '%s': %s\n" % (pdsFilename, error)
+				sys.stderr.write(errorMessage)
+			elif filepath is None:
+				failed += 1
+				errorMessage = "Error: Could not extract image from '%s': no image found\n" % (pdsFilename)
+				sys.stderr.write(errorMessage)
 			else:
-				# If not ignoring caught exceptions, re-raise.
-				raise
+				converted += 1
+				if options.verbose:
+					sys.stderr.write("Converted '%s'\n" % (pdsFilename))
+				if options.show_labels:
+					import pprint
+					pprint.pprint(labels)
+	else:
+		extractor = create_extractor(options)
+		for pdsFilename, pdsFile in iter_pds(args):
+			if options.step_through:
+				sys.stderr.write("stepping through files... press enter to continue\n")
+				raw_input()
+				
+			if options.verbose:
+				errorMessage = "Reading input from '%s'\n" % (pdsFilename)
+				sys.stderr.write(errorMessage)
 			
-		if not img:
-			errorMessage = "Error: Could not extract image from '%s': no image found\n" % (pdsFilename)
-			sys.stderr.write(errorMessage)
-		else:
-			if options.show_labels:
-				import pprint
-				pprint.pprint(labels)
-			basename = os.path.basename(pdsFilename)
-			filename = basename + ".%s" % (options.format)
-			filepath = os.path.join(options.dest_dir, filename)
-			img.save(filepath)
+			filepath = None
+			try:
+				filepath, labels = convert(extractor, pdsFile, pdsFilename, options)
+			except:
+				if options.ignore_exceptions:
+					if options.verbose:
+						errorMessage = "Warn: Caught exception raised during extraction from '%s', ignoring\n" % (pdsFilename)
+						sys.stderr.write(errorMessage)
+				else:
+					# If not ignoring caught exceptions, re-raise.
+					raise
+				
+			if filepath is None:
+				failed += 1
+				errorMessage = "Error: Could not extract image from '%s': no image found\n" % (pdsFilename)
+				sys.stderr.write(errorMessage)
+			else:
+				converted += 1
+				if options.show_labels:
+					import pprint
+					pprint.pprint(labels)
+	
+	elapsed = time.time() - startTime
+	sys.stderr.write("Converted %d of %d files in %.2fs, %.1f files/s, %d failed\n"
+		% (converted, converted + failed, elapsed, converted / max(elapsed, 1e-6), failed))
+	if errors and not options.ignore_exceptions:
+		# The exceptions of the workers were reported rather than raised.
+		sys.exit(1)
@@ -12,32 +12,10 @@ import sys
 
 import cStringIO as StringIO
 
-from pds.imageextractor import ImageExtractor
-
-def gfiles(*args, **kwargs):
-	"""Generate chunked files from input provided by fileinput.input().
-	
-	Yields a filename and contents, with line endings preserved.
-	"""
-	import fileinput
-	import cStringIO as StringIO
-	
-	from collections import deque
-	
-	d = deque()
-	for line in fileinput.input(*args, **kwargs):
-		if fileinput.isfirstline():
-			try:
-				fname, fhandle = d.pop()
-				yield fname, fhandle.getvalue()
-			except IndexError:
-				pass
-			d.append((fileinput.filename(), StringIO.StringIO()))
-			buf = d[-1][1]
-		buf.write(line)
-		
-	fname, fhandle = d.pop()
-	yield fname, fhandle.getvalue()
+from pds.core.cache import LabelCache
+from pds.core.common import iter_pds
+from pds.imageextractor import Image, ImageExtractor
+from pds.stretch import STRETCHES, to_display
 
 def setUpOptionParser():
 	"""docstring for setUpOptionParser"""
@@ -47,9 +25,11 @@ def setUpOptionParser():
 	# Define the option parser default values.
 	parser.set_defaults(filename=sys.stdin)
 	parser.set_defaults(verbose=False)
+	parser.set_defaults(label_cache=None)
 	parser.set_defaults(format=None)
 	parser.set_defaults(ignore_exceptions=False)
 	parser.set_defaults(step_through=False)
+	parser.set_defaults(stretch=None)
 	
 	# Define option parser groups.
 	dangerGroup = optparse.OptionGroup(parser, "Dangerous/Experimental Options",
@@ -69,9 +49,17 @@ def setUpOptionParser():
 	parser.add_option("--log",
 		action="store", dest="log",
 		help="optional log filename, .log extension will be added", metavar="FILE")
+	parser.add_option("--label-cache",
+		action="store", dest="label_cache",
+		help="cache parsed labels in DIR, they are reused across runs while the files are unchanged", metavar="DIR")
 	parser.add_option("--format",
 		action="store", dest="format",
 		help="output format [default=%default]", metavar="FRMT")
+	parser.add_option("--stretch",
+		action="store", dest="stretch",
+		help="stretch the samples to 8 bits by one of linear[:LOW,HIGH], percentile[:LOW,HIGH], shift[:BITS] or lut:FILE, "
+		"8 bit samples are only stretched when given, use shift:4 for the division by 16 of earlier releases "
+		"[default=linear]", metavar="STRETCH")
 	parser.add_option("--step-through",
 		action="store_true", dest="step_through",
 		help="step through input files incrementally on user input [default=%default]")
@@ -86,10 +74,12 @@ if __name__ == '__main__':
 	if not args:
 		parser.error("you must specifiy at least one input file argument")
 		
-	extractor = ImageExtractor(log=options.log)
-	for pdsFilename, pdsContents in gfiles(files=args, mode="rb"):
-		pdsFile = StringIO.StringIO(pdsContents)
+	if options.stretch and options.stretch.partition(":")[0] not in STRETCHES:
+		parser.error("the stretch must be one of %s" % (", ".join(STRETCHES)))
 		
+	labelCache = options.label_cache and LabelCache(options.label_cache) or None
+	extractor = ImageExtractor(log=options.log, cache=labelCache, fullLabels=False)
+	for pdsFilename, pdsFile in iter_pds(args):
 		if options.step_through:
 			sys.stderr.write("stepping through files... press enter to continue\n")
 			raw_input()
@@ -98,9 +88,9 @@ if __name__ == '__main__':
 			errorMessage = "Reading input from '%s'\n" % (pdsFilename)
 			sys.stderr.write(errorMessage)
 		
-		img = None
+		array = None
 		try:
-			img, labels = extractor.extract(pdsFile)
+			array, labels = extractor.extract_array(pdsFile)
 		except:
 			if options.ignore_exceptions:
 				if options.verbose:
@@ -110,10 +100,11 @@ if __name__ == '__main__':
 				# If not ignoring caught exceptions, re-raise.
 				raise
 			
-		if not img:
+		if array is None:
 			errorMessage = "Error: Could not extract image from '%s': no image found\n" % (pdsFilename)
 			sys.stderr.write(errorMessage)
 		else:
+			img = Image.fromarray(to_display(array, options.stretch))
 			if options.format:
 				f = StringIO.StringIO()
 				img.save(f, format=options.format)
@@ -122,7 +113,7 @@ if __name__ == '__main__':
 			else:
 				sep = "\n"
 				width, height = img.size
-				imgString = img.tostring()
+				imgString = (getattr(img, 'tobytes', None) or img.tostring)()
 				# import base64
 				# imgString = base64.b64encode(img.tostring())
 				imgBytes = len(imgString)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+pds-index.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import optparse
+import sys
+import time
+
+from pds.indexer import Indexer
+
+def setUpOptionParser():
+	"""docstring for setUpOptionParser"""
+	usage = "usage: %prog [options] DATABASE [DIR ...]"
+	parser = optparse.OptionParser(usage=usage, version="%prog-dev")
+
+	# Define the option parser default values.
+	parser.set_defaults(verbose=False)
+	parser.set_defaults(log=None)
+	parser.set_defaults(patterns=None)
+	parser.set_defaults(find=None)
+
+	# Define the options we accept.
+	parser.add_option("-v", "--verbose",
+		action="store_true", dest="verbose",
+		help="make lots of noise")
+	parser.add_option("-q", "--quiet",
+		action="store_false", dest="verbose",
+		help="surpress output")
+	parser.add_option("--log",
+		action="store", dest="log",
+		help="optional log filename, the extension '.log' will automatically be added", metavar="FILE")
+	parser.add_option("--pattern",
+		action="append", dest="patterns",
+		help="index only the files matching PATTERN, such as '*.img', in either case, "
+		"may be given more than once [default=*]", metavar="PATTERN")
+	parser.add_option("--find",
+		action="store", dest="find",
+		help="once indexed, print the paths of the files with the label KEY, such as IMAGE/LINES, "
+		"or with the label KEY=VALUE, the value as found in the label", metavar="KEY[=VALUE]")
+
+	return parser
+
+
+if __name__ == '__main__':
+	parser = setUpOptionParser()
+	(options, args) = parser.parse_args()
+
+	if not args:
+		parser.error("you must specifiy the database")
+
+	if len(args) < 2 and not options.find:
+		parser.error("you must specifiy at least one directory to index, or --find")
+
+	database, roots = args[0], args[1:]
+	indexer = Indexer(database, patterns=options.patterns or ('*',), log=options.log)
+	try:
+		# Only the files which are new or changed since the last run are parsed.
+		for root in roots:
+			startTime = time.time()
+			stats = indexer.index(root)
+			if options.verbose:
+				sys.stderr.write("Indexed '%s' in %.2fs: %s\n" % (root, time.time() - startTime, stats))
+
+		if options.find:
+			key, sep, value = options.find.partition('=')
+			for path in indexer.find(key, sep and value or None):
+				print path
+	finally:
+		indexer.close()
@@ -7,38 +7,59 @@ Created by Ryan Balfanz on 2009-11-19.
 Copyright (c) 2009 Ryan Balfanz. All rights reserved.
 """
 
+import csv
+import json
 import optparse
+import os
 import sys
 
-import cStringIO as StringIO
-
-from pds.core.common import open_pds
+from pds.core.cache import LabelCache
+from pds.core.common import iter_pds, open_pds
 from pds.core.parser import Parser
- 
-def gfiles(*args, **kwargs):
-	"""Generate chunked files from input provided by fileinput.input().
+
+# The formats labels may be written in, besides pretty printing.
+FORMATS = ('pprint', 'jsonl', 'csv', 'tsv')
+
+# The name of the field holding the path of each file, a leading underscore can not begin a PDS keyword.
+PATH_FIELD = '_PATH'
+
+# Output is written through a buffer of this many bytes.
+OUTPUT_BUFFER_BYTES = 1024 * 1024
+
+def field_value(labels, field):
+	"""Return the value of the label *field*, a path such as 'IMAGE/LINES', or None if there is no such label."""
+	value = labels
+	for key in field.split('/'):
+		try:
+			value = value[key]
+		except (KeyError, TypeError):
+			return None
+	return value
+
+def write_labels(out, writer, filename, labels, fields):
+	"""Write the *fields* of the *labels* of *filename*, or all of them if not given, as a record.
 	
-	Yields a filename and contents, with line endings preserved.
+	A record is a line of JSON, or a row of the csv *writer* if there is one,
+	in which containers are written as JSON and missing labels are left empty.
 	"""
-	import fileinput
-	import cStringIO as StringIO
-	
-	from collections import deque
-	
-	d = deque()
-	for line in fileinput.input(*args, **kwargs):
-		if fileinput.isfirstline():
-			try:
-				fname, fhandle = d.pop()
-				yield fname, fhandle.getvalue()
-			except IndexError:
-				pass
-			d.append((fileinput.filename(), StringIO.StringIO()))
-			buf = d[-1][1]
-		buf.write(line)
-		
-	fname, fhandle = d.pop()
-	yield fname, fhandle.getvalue()
+	if writer is None:
+		if fields:
+			record = dict((field, field_value(labels, field)) for field in fields)
+		else:
+			record = dict(labels)
+		record[PATH_FIELD] = filename
+		out.write(json.dumps(record, separators=(',', ':'), sort_keys=bool(fields)))
+		out.write('\n')
+		return
+	row = [filename]
+	for field in fields:
+		value = field_value(labels, field)
+		if value is None:
+			value = ''
+		elif not isinstance(value, basestring):
+			value = json.dumps(value, separators=(',', ':'))
+		row.append(value)
+	writer.writerow(row)
 
 def setUpOptionParser():
 	"""docstring for setUpOptionParser"""
@@ -48,6 +69,7 @@ def setUpOptionParser():
 	# Define the option parser default values.
 	parser.set_defaults(filename=sys.stdin)
 	parser.set_defaults(verbose=False)
+	parser.set_defaults(label_cache=None)
 	parser.set_defaults(log=None)
 	parser.set_defaults(pretty_print=True)
 	parser.set_defaults(pprint_indent=1)
@@ -55,6 +77,8 @@ def setUpOptionParser():
 	parser.set_defaults(pprint_depth=None)
 	parser.set_defaults(ignore_exceptions=False)
 	parser.set_defaults(step_through=False)
+	parser.set_defaults(format='pprint')
+	parser.set_defaults(fields=None)
 	
 	# Define option parser groups.
 	dangerGroup = optparse.OptionGroup(parser, "Dangerous/Experimental Options",
@@ -75,9 +99,23 @@ def setUpOptionParser():
 	parser.add_option("--log",
 		action="store", dest="log",
 		help="optional log filename, the extension '.log' will automatically be added", metavar="FILE")
+	parser.add_option("--label-cache",
+		action="store", dest="label_cache",
+		help="cache parsed labels in DIR, they are reused across runs while the files are unchanged", metavar="DIR")
 	parser.add_option("--step-through",
 		action="store_true", dest="step_through",
 		help="step through input files incrementally on user input [default=%default]")
+	parser.add_option("--format",
+		action="store", dest="format", type="choice", choices=FORMATS,
+		help="write the labels of each file as one of %s, "
+		"JSON Lines (jsonl) are written a line per file and csv or tsv a row per file, after a header, "
+		"the path of each file is given as %s [default=%%default]"
+		% (", ".join(FORMATS), PATH_FIELD), metavar="FORMAT")
+	parser.add_option("--fields",
+		action="store", dest="fields",
+		help="write only the comma separated FIELDS, such as IMAGE/LINES,START_TIME, "
+		"only these labels are parsed and each label is read no further than the last of them, "
+		"required by csv and tsv", metavar="FIELDS")
 	parser.add_option("--pretty-print",
 		action="store_false", dest="pretty_print",
 		help="pretty print PDS labels [default=%default]")
@@ -99,22 +137,26 @@ if __name__ == '__main__':
 	(options, args) = optParser.parse_args()
 		
 	if not args:
-		# sys.stderr.write("Listening on stdin\n")
-		# *** In this case gfiles() can't split files.
-		# It will only generate a single result.
-		# Can try to handle this in the Reader/Parser or,
-		# probably the better way, is to fix gfiles() - if possible.
+		# Standard input is read when named as '-', see iter_pds.
 		optParser.error("you must specifiy at least one input file argument")
 	
-	pdsParser = Parser(log=options.log)
-	for pdsFilename, pdsContents in gfiles(files=args, mode="U"):
-		# Python issue 1286 (http://bugs.python.org/issue1286)
-		# discusses the with statement context manager and its 
-		# support for fileinput and *StringIO.
-		# with StringIO.StringIO(pdsContents) as pdsFile:
-		# with open_pds(pdsContents) as pdsFile:
-		pdsFile = open_pds(StringIO.StringIO(pdsContents))
-		# pdsFile = open_pds(pdsContents)
+	fields = options.fields and [field.strip() for field in options.fields.split(',') if field.strip()] or None
+	if options.format in ('csv', 'tsv') and not fields:
+		optParser.error("--fields must be given with --format %s" % (options.format))
+	
+	out = sys.stdout
+	writer = None
+	if options.format != 'pprint':
+		out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb', OUTPUT_BUFFER_BYTES)
+	if options.format in ('csv', 'tsv'):
+		writer = csv.writer(out, delimiter=options.format == 'tsv' and '\t' or ',', lineterminator='\n')
+		writer.writerow([PATH_FIELD] + fields)
+	
+	# Only the attached label of each file is read, the image data is never touched.
+	labelCache = options.label_cache and LabelCache(options.label_cache) or None
+	pdsParser = Parser(log=options.log, headerOnly=True, cache=labelCache)
+	for pdsFilename, pdsSource in iter_pds(args):
+		pdsFile = open_pds(pdsSource)
 		if options.step_through:
 			sys.stderr.write("stepping through files... press enter to continue\n")
 			raw_input()
@@ -125,7 +167,8 @@ if __name__ == '__main__':
 
 		labels = None
 		try:
-			labels = pdsParser.parse(pdsFile)
+			# Given fields, only their labels are parsed, and parsing stops once they are all found.
+			labels = pdsParser.parse(pdsFile, keys=fields)
 			# labels = pdsParser.parse(open_pds(pdsFile))
 		except:
 			if options.ignore_exceptions:
@@ -138,9 +181,11 @@ if __name__ == '__main__':
 		finally:
 			pdsFile.close()
 
-		if not labels:
-			errorMessage = "Error: Could not parse %s: no labels were found\n" % (options.filename)
+		if labels is None or not (labels or fields):
+			errorMessage = "Error: Could not parse %s: no labels were found\n" % (pdsFilename)
 			sys.stderr.write(errorMessage)
+		elif options.format != 'pprint':
+			write_labels(out, writer, pdsFilename, labels, fields)
 		else:
 			if options.pretty_print:
 				import pprint
@@ -149,3 +194,4 @@ if __name__ == '__main__':
 					depth=options.pprint_depth)
 			else:
 				print labels
+	out.flush()
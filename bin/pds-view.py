@@ -10,34 +10,9 @@ Copyright (c) 2009 Ryan Balfanz. All rights reserved.
 import optparse
 import sys
 
-import cStringIO as StringIO
-
-from pds.imageextractor import ImageExtractor
-
-def gfiles(*args, **kwargs):
-	"""Generate chunked files from input provided by fileinput.input().
-	
-	Yields a filename and contents, with line endings preserved.
-	"""
-	import fileinput
-	import cStringIO as StringIO
-	
-	from collections import deque
-	
-	d = deque()
-	for line in fileinput.input(*args, **kwargs):
-		if fileinput.isfirstline():
-			try:
-				fname, fhandle = d.pop()
-				yield fname, fhandle.getvalue()
-			except IndexError:
-				pass
-			d.append((fileinput.filename(), StringIO.StringIO()))
-			buf = d[-1][1]
-		buf.write(line)
-		
-	fname, fhandle = d.pop()
-	yield fname, fhandle.getvalue()
+from pds.core.common import iter_pds
+from pds.imageextractor import Image, ImageExtractor
+from pds.stretch import STRETCHES, to_display
 
 def setUpOptionParser():
 	"""docstring for setUpOptionParser"""
@@ -51,6 +26,7 @@ def setUpOptionParser():
 	parser.set_defaults(no_show=False)
 	parser.set_defaults(ignore_exceptions=False)
 	parser.set_defaults(step_through=False)
+	parser.set_defaults(stretch=None)
 	
 	# Define option parser groups.
 	dangerGroup = optparse.OptionGroup(parser, "Dangerous/Experimental Options",
@@ -70,6 +46,10 @@ def setUpOptionParser():
 	parser.add_option("--log",
 		action="store", dest="log",
 		help="optional log filename, .log extension will be added", metavar="FILE")
+	parser.add_option("--stretch",
+		action="store", dest="stretch",
+		help="stretch the samples to 8 bits by one of linear[:LOW,HIGH], percentile[:LOW,HIGH], shift[:BITS] or lut:FILE, "
+		"8 bit samples are only stretched when given [default=linear]", metavar="STRETCH")
 	parser.add_option("--show-labels",
 		action="store_true", dest="show_labels",
 		help="pretty print PDS labels [default=%default]")
@@ -90,10 +70,11 @@ if __name__ == '__main__':
 	if not args:
 		parser.error("you must specifiy at least one input file argument")
 		
-	extractor = ImageExtractor(log=options.log)
-	for pdsFilename, pdsContents in gfiles(files=args, mode="rb"):
-		pdsFile = StringIO.StringIO(pdsContents)
+	if options.stretch and options.stretch.partition(":")[0] not in STRETCHES:
+		parser.error("the stretch must be one of %s" % (", ".join(STRETCHES)))
 		
+	extractor = ImageExtractor(log=options.log)
+	for pdsFilename, pdsFile in iter_pds(args):
 		if options.step_through:
 			sys.stderr.write("stepping through files... press enter to continue\n")
 			raw_input()
@@ -102,9 +83,9 @@ if __name__ == '__main__':
 			errorMessage = "Reading input from '%s'\n" % (pdsFilename)
 			sys.stderr.write(errorMessage)
 			
-		img = None
+		array = None
 		try:
-			img, labels = extractor.extract(pdsFile)
+			array, labels = extractor.extract_array(pdsFile)
 		except:
 			if options.ignore_exceptions:
 				if options.verbose:
@@ -114,13 +95,14 @@ if __name__ == '__main__':
 				# If not ignoring caught exceptions, re-raise.
 				raise
 				
-		if not img:
+		if array is None:
 			errorMessage = "Error: Could not extract image from '%s': no image found\n" % (pdsFilename)
 			sys.stderr.write(errorMessage)
 		else:
 			if options.show_labels:
 				import pprint
 				pprint.pprint(labels)
+			img = Image.fromarray(to_display(array, options.stretch))
 			if not options.no_show:
 				img.show()
 				
\ No newline at end of file
@@ -9,4 +9,4 @@ Copyright (c) 2009 Ryan Matthew Balfanz. All rights reserved.
 
 from core import *
 
-__all__ = ['core', 'imageextractor']
+__all__ = ['core', 'imageextractor', 'stretch', 'tableextractor', 'qubeextractor', 'product', 'indexer']
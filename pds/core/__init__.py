@@ -11,6 +11,11 @@ from common import *
 from reader import *
 from parser import *
 from extractorbase import *
+from cache import *
+from labels import *
+from values import *
+from datatypes import *
+from compressed import *
 
-__all__ = ['reader', 'parser', 'extractorbase']
+__all__ = ['reader', 'parser', 'extractorbase', 'cache', 'labels', 'values', 'datatypes', 'compressed']
   
\ No newline at end of file
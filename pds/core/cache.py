@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+cache.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unittest
+
+from collections import OrderedDict
+
+try:
+	import cPickle as pickle
+except ImportError:
+	import pickle
+
+
+class LabelCache(object):
+	"""A persistent cache of parsed labels which may be shared by several processes.
+
+	Labels are pickled into a SQLite database within *directory*, keyed by the identity
+	of the file they were parsed from (see ``common.file_identity``).
+	A file which has since been modified, replaced or moved is simply parsed again.
+
+	Once the cached labels take up more than *maxBytes*, the least recently used are evicted
+	until only 90% of that remains. Concurrent processes wait up to *timeout* seconds for each other.
+
+	A cache is used by handing it to a Parser, or an ImageExtractor.
+
+	>>> from cache import LabelCache
+	>>> from parser import Parser
+	>>> pdsParser = Parser(cache=LabelCache('/var/cache/pds'))
+	>>> labels = pdsParser.parse(open_pds('pds.img')) # Parsed and stored.
+	>>> labels = pdsParser.parse(open_pds('pds.img')) # Not read at all.
+	"""
+	FILENAME = "labels.sqlite"
+	# The kinds of value which are kept, see ``MemoryCache``.
+	KINDS = ("labels",)
+	# Access times are only refreshed when they are older than this, to keep lookups from writing.
+	ATIME_RESOLUTION = 60.0
+
+	def __init__(self, directory, maxBytes=256 * 1024 * 1024, timeout=30.0):
+		super(LabelCache, self).__init__()
+		if not os.path.isdir(directory):
+			try:
+				os.makedirs(directory)
+			except OSError:
+				# Another process may have beaten us to it.
+				if not os.path.isdir(directory):
+					raise
+		self.path = os.path.join(directory, self.FILENAME)
+		self.maxBytes = maxBytes
+		self.timeout = timeout
+		self._connection = None
+		self._pid = None
+
+	def _connect(self):
+		"""Return a connection to the database, creating it if necessary.
+
+		Connections are not shared across a fork, each process opens its own.
+		"""
+		if self._connection is None or self._pid != os.getpid():
+			connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+			connection.text_factory = str
+			# Readers need not wait on a writer, where the file system allows it.
+			connection.execute("PRAGMA journal_mode=WAL")
+			connection.execute("CREATE TABLE IF NOT EXISTS labels ("
+				"path TEXT PRIMARY KEY, size INTEGER, mtime REAL, inode INTEGER, "
+				"nbytes INTEGER, atime REAL, data BLOB)")
+			connection.execute("CREATE INDEX IF NOT EXISTS labels_atime ON labels (atime)")
+			connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+			connection.execute("INSERT OR IGNORE INTO meta VALUES ('bytes', 0)")
+			self._connection = connection
+			self._pid = os.getpid()
+		return self._connection
+
+	def get(self, identity, kind="labels"):
+		"""Return the labels cached for the file *identity*, or None.
+
+		Only labels are stored persistently, any other *kind* always misses.
+		"""
+		if kind != "labels" or identity is None:
+			return None
+		connection = self._connect()
+		path = identity[0]
+		row = connection.execute("SELECT size, mtime, inode, atime, data FROM labels WHERE path = ?", (path,)).fetchone()
+		if row is None or tuple(row[:3]) != tuple(identity[1:]):
+			return None
+		now = time.time()
+		if now - row[3] > self.ATIME_RESOLUTION:
+			connection.execute("UPDATE labels SET atime = ? WHERE path = ?", (now, path))
+		return pickle.loads(str(row[4]))
+
+	def set(self, identity, labels, kind="labels", nbytes=None):
+		"""Store the *labels* parsed from the file *identity*, replacing any older entry.
+
+		The size is that of the pickled labels, any *nbytes* given is ignored.
+		"""
+		if kind != "labels" or identity is None:
+			return
+		data = pickle.dumps(labels, pickle.HIGHEST_PROTOCOL)
+		path, size, mtime, inode = identity
+		connection = self._connect()
+		connection.execute("BEGIN IMMEDIATE")
+		try:
+			row = connection.execute("SELECT nbytes FROM labels WHERE path = ?", (path,)).fetchone()
+			delta = len(data) - (row and row[0] or 0)
+			connection.execute("INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?, ?, ?)",
+				(path, size, mtime, inode, len(data), time.time(), sqlite3.Binary(data)))
+			connection.execute("UPDATE meta SET value = value + ? WHERE key = 'bytes'", (delta,))
+			self._evict(connection)
+		except:
+			connection.execute("ROLLBACK")
+			raise
+		else:
+			connection.execute("COMMIT")
+
+	def _evict(self, connection):
+		"""Evict the least recently used labels once the cache has outgrown *maxBytes*."""
+		totalBytes = connection.execute("SELECT value FROM meta WHERE key = 'bytes'").fetchone()[0]
+		if totalBytes <= self.maxBytes:
+			return
+		lowWater = int(self.maxBytes * 0.9)
+		evicted = []
+		for path, nbytes in connection.execute("SELECT path, nbytes FROM labels ORDER BY atime"):
+			if totalBytes <= lowWater:
+				break
+			evicted.append((path,))
+			totalBytes -= nbytes
+		connection.executemany("DELETE FROM labels WHERE path = ?", evicted)
+		connection.execute("UPDATE meta SET value = ? WHERE key = 'bytes'", (totalBytes,))
+
+	def clear(self):
+		"""Remove every entry from the cache."""
+		connection = self._connect()
+		connection.execute("BEGIN IMMEDIATE")
+		connection.execute("DELETE FROM labels")
+		connection.execute("UPDATE meta SET value = 0 WHERE key = 'bytes'")
+		connection.execute("COMMIT")
+
+	def close(self):
+		"""Close the connection to the database, it is reopened as needed."""
+		if self._connection is not None:
+			self._connection.close()
+			self._connection = None
+
+
+class MemoryCache(object):
+	"""A bounded, in-process cache of parsed labels and extracted images.
+
+	Entries are keyed by the identity of the file they came from (see ``common.file_identity``)
+	and by their *kind*, either "labels" or "image".
+	An entry for a file which has since been modified or replaced is discarded on lookup.
+
+	The least recently used entries are evicted once there are more than *maxEntries*
+	or their estimated size exceeds *maxBytes*.
+	The number of hits, misses and evictions are counted for tuning.
+
+	Values are returned as they were stored, labels should not be modified by the caller.
+
+	>>> from cache import MemoryCache
+	>>> from imageextractor import ImageExtractor
+	>>> memoryCache = MemoryCache(maxEntries=1000)
+	>>> ie = ImageExtractor(cache=memoryCache)
+	>>> img, labels = ie.extract('pds.img') # Read and decoded.
+	>>> img, labels = ie.extract('pds.img') # Copied from memory.
+	>>> memoryCache.hits, memoryCache.misses, memoryCache.evictions
+	(1, 1, 0)
+	"""
+	# The kinds of value which are kept, an ImageExtractor only copies images for a cache which keeps them.
+	KINDS = ("labels", "image")
+
+	def __init__(self, maxEntries=128, maxBytes=64 * 1024 * 1024):
+		super(MemoryCache, self).__init__()
+		self.maxEntries = maxEntries
+		self.maxBytes = maxBytes
+		self.nbytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__(self):
+		return len(self._entries)
+
+	def get(self, identity, kind="labels"):
+		"""Return the value of *kind* cached for the file *identity*, or None."""
+		if identity is None:
+			return None
+		key = (kind, identity[0])
+		with self._lock:
+			entry = self._entries.pop(key, None)
+			if entry is None or entry[0] != identity:
+				if entry is not None:
+					self.nbytes -= entry[2]
+				self.misses += 1
+				return None
+			# Reinserting the entry marks it as the most recently used.
+			self._entries[key] = entry
+			self.hits += 1
+			return entry[1]
+
+	def set(self, identity, value, kind="labels", nbytes=None):
+		"""Store the *value* of *kind* for the file *identity*, replacing any older entry.
+
+		The size of the value is estimated unless given as *nbytes*.
+		A value larger than the whole cache is not stored.
+		"""
+		if identity is None:
+			return
+		if nbytes is None:
+			nbytes = sizeof(value)
+		key = (kind, identity[0])
+		with self._lock:
+			entry = self._entries.pop(key, None)
+			if entry is not None:
+				self.nbytes -= entry[2]
+			if nbytes > self.maxBytes:
+				return
+			self._entries[key] = (identity, value, nbytes)
+			self.nbytes += nbytes
+			while len(self._entries) > self.maxEntries or self.nbytes > self.maxBytes:
+				key, entry = self._entries.popitem(last=False)
+				self.nbytes -= entry[2]
+				self.evictions += 1
+
+	def clear(self):
+		"""Remove every entry from the cache, the counters are kept."""
+		with self._lock:
+			self._entries.clear()
+			self.nbytes = 0
+
+
+def sizeof(value):
+	"""Return an estimate of the memory held by *value*, following dictionaries and sequences."""
+	size = sys.getsizeof(value)
+	if isinstance(value, dict):
+		for k, v in value.iteritems():
+			size += sys.getsizeof(k) + sizeof(v)
+	elif isinstance(value, (list, tuple)):
+		for v in value:
+			size += sizeof(v)
+	return size
+
+
+class LabelCacheTests(unittest.TestCase):
+	"""Unit tests for class LabelCache"""
+	def setUp(self):
+		import tempfile
+
+		self.directory = tempfile.mkdtemp()
+		self.cache = LabelCache(self.directory, maxBytes=4096)
+		self.identity = ("/data/pds.img", 1024, 1262304000.0, 42)
+		self.labels = {"RECORD_BYTES": "1024", "IMAGE": {"LINES": "1"}}
+
+	def tearDown(self):
+		import shutil
+
+		self.cache.close()
+		shutil.rmtree(self.directory)
+
+	def test_get(self):
+		"""Labels are returned for an unchanged file only"""
+		self.assertEqual(None, self.cache.get(self.identity))
+		self.cache.set(self.identity, self.labels)
+		self.assertEqual(self.labels, self.cache.get(self.identity))
+		self.assertEqual(self.labels, LabelCache(self.directory).get(self.identity))
+		modified = self.identity[:2] + (self.identity[2] + 1,) + self.identity[3:]
+		self.assertEqual(None, self.cache.get(modified))
+
+	def test_eviction(self):
+		"""The least recently used labels are evicted"""
+		for i in range(100):
+			self.cache.set(("/data/%d.img" % (i),) + self.identity[1:], self.labels)
+		self.assertEqual(None, self.cache.get(("/data/0.img",) + self.identity[1:]))
+		self.assertEqual(self.labels, self.cache.get(("/data/99.img",) + self.identity[1:]))
+
+
+class MemoryCacheTests(unittest.TestCase):
+	"""Unit tests for class MemoryCache"""
+	def setUp(self):
+		self.cache = MemoryCache(maxEntries=2, maxBytes=10000)
+		self.identity = ("/data/pds.img", 1024, 1262304000.0, 42)
+		self.labels = {"RECORD_BYTES": "1024", "IMAGE": {"LINES": "1"}}
+
+	def test_get(self):
+		"""Values are returned for an unchanged file only"""
+		self.assertEqual(None, self.cache.get(self.identity))
+		self.cache.set(self.identity, self.labels)
+		self.assertTrue(self.labels is self.cache.get(self.identity))
+		self.assertEqual(None, self.cache.get(self.identity, kind="image"))
+		modified = self.identity[:2] + (self.identity[2] + 1,) + self.identity[3:]
+		self.assertEqual(None, self.cache.get(modified))
+		self.assertEqual(None, self.cache.get(self.identity))
+		self.assertEqual((1, 4), (self.cache.hits, self.cache.misses))
+		self.assertEqual(0, self.cache.nbytes)
+
+	def test_eviction(self):
+		"""The least recently used entries are evicted by count and by size"""
+		identities = [("/data/%d.img" % (i),) + self.identity[1:] for i in range(3)]
+		self.cache.set(identities[0], self.labels)
+		self.cache.set(identities[1], self.labels)
+		self.cache.get(identities[0])
+		self.cache.set(identities[2], self.labels)
+		self.assertEqual(None, self.cache.get(identities[1]))
+		self.assertTrue(self.cache.get(identities[0]) is not None)
+		self.cache.set(identities[1], "x", nbytes=9500)
+		self.assertEqual(1, len(self.cache))
+		self.assertEqual(3, self.cache.evictions)
+		self.cache.set(identities[2], "x", nbytes=10001)
+		self.assertEqual(None, self.cache.get(identities[2]))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -8,29 +8,43 @@ Created by Ryan Matthew Balfanz on 2009-06-24.
 Copyright (c) 2009 Ryan Matthew Balfanz. All rights reserved.
 """
 
+import mmap
+import os
+import re
+import shutil
 import sys
+import tempfile
 
 # from contextlib import contextmanager
 from contextlib import closing
 
+from compressed import open_compressed
+
 PDS_END_OF_LINE = r"\r\n"
 PDS_END_OF_HEADER = r"END"
 PDS_CONTAINERS = {"OBJECT":"END_OBJECT", "GROUP":"END_GROUP"}
 
+# The number of bytes read up front when looking for the extent of an attached label.
+PDS_HEADER_BLOCK_SIZE = 8192
+
+_RECORD_BYTES = re.compile(r"^[ \t]*RECORD_BYTES[ \t]*=[ \t]*(\d+)[ \t]*\r?$", re.M)
+_LABEL_RECORDS = re.compile(r"^[ \t]*LABEL_RECORDS[ \t]*=[ \t]*(\d+)[ \t]*\r?$", re.M)
+_END_OF_HEADER = re.compile(r"^[ \t]*END[ \t]*\r?$", re.M)
+
 def isValidPDSFile(filename):
 	"""Check if a PDS file is valid by performing a series of mini-checks.
 	
 	The following check are performed
 		* Filesize is equal to (RECORD_BYTES * FILE_RECORDS),
 		based afrigeri's comment to issue 3 (http://github.com/RyanBalfanz/PyPDS/issues/#issue/3).
-		Note that this check creates it's own Parser instance, for only two lookups.
+		Note that this check creates it's own Parser instance, which parses only the two labels it needs.
 	"""
 	# Filesize check
 	import os
 	fileBytes = os.path.getsize(filename)
 	from parser import Parser
-	parser = Parser()
-	labels = parser.parse(open_pds(filename))
+	parser = Parser(headerOnly=True)
+	labels = parser.parse(open_pds(filename), keys=["FILE_RECORDS", "RECORD_BYTES"])
 	expectedFileBytes = int(labels["FILE_RECORDS"]) * int(labels["RECORD_BYTES"])
 	
 	validityChecks = (# lambda : True, # lambda : False,
@@ -44,12 +58,16 @@ def open_pds(source):
 	
 	This method generalizes the standard open() function call.
 	The *source* may be a file-like object, a file, a URL, or a string.
+	
+	A compressed source, e.g. an .IMG.gz product, is decompressed as it is read, see ``compressed.open_compressed``.
 	"""
 	# if isinstance(source, file):
 	# 	return source
 	if hasattr(source, "read"):
 		# sys.stderr.write("Identified a file-like object by read() method existence\n")
-		return source
+		if isinstance(source, mmap.mmap):
+			return source
+		return open_compressed(source)
 
 	try:
 		# For universal newlines -- i.e. newlines are automatically converted to "\n", use mode "U".
@@ -57,7 +75,7 @@ def open_pds(source):
 		# PDS style newlines are "\r\n", however, http://pds.jpl.nasa.gov/documents/qs/sample_image.lbl uses "\n".
 		# Check if hasattr(open, 'newlines') to verify that universal newline support is enabeled.
 		f = open(source, "rb")
-		return f
+		return open_compressed(f)
 	except (IOError, OSError):
 		# sys.stderr.write("Could not open source\n")
 		raise
@@ -91,6 +109,145 @@ def open_pds(source):
 	# finally:
 	# 	pass
 
+def read_pds_header(source, blockSize=PDS_HEADER_BLOCK_SIZE):
+	"""Read only the attached label of a PDS data file *source*.
+	
+	The first *blockSize* bytes are read and searched for RECORD_BYTES and LABEL_RECORDS.
+	When both are present the label is exactly (RECORD_BYTES * LABEL_RECORDS) bytes long
+	and at most one more read is needed to complete it.
+	Otherwise, reading continues in growing blocks until the END line is found.
+	
+	The label is returned as a string, a file object *source* is left open and positioned somewhere after it.
+	"""
+	f = open_pds(source)
+	try:
+		return _read_header(f, blockSize)
+	finally:
+		if not hasattr(source, "read"):
+			# We opened the file, so it is ours to close.
+			f.close()
+
+def _read_header(f, blockSize):
+	"""Read the attached label of the opened file *f*, see ``read_pds_header``."""
+	header = f.read(blockSize)
+	recordBytes = _search_complete_line(_RECORD_BYTES, header)
+	labelRecords = _search_complete_line(_LABEL_RECORDS, header)
+	if recordBytes and labelRecords:
+		labelBytes = int(recordBytes.group(1)) * int(labelRecords.group(1))
+		if labelBytes > len(header):
+			header += f.read(labelBytes - len(header))
+		return header[:labelBytes]
+
+	searchStart = 0
+	while True:
+		endOfHeader = _search_complete_line(_END_OF_HEADER, header, searchStart)
+		if endOfHeader:
+			return header[:endOfHeader.end()]
+		# Resume the search at the start of the last (possibly partial) line.
+		searchStart = header.rfind("\n") + 1
+		blockSize *= 2
+		block = f.read(blockSize)
+		if not block:
+			endOfHeader = _END_OF_HEADER.search(header, searchStart)
+			return endOfHeader and header[:endOfHeader.end()] or header
+		header += block
+
+def _search_complete_line(pattern, string, pos=0, endpos=None):
+	"""Search *string* for *pattern*, ignoring a match on a line which may have been cut short."""
+	if endpos is None:
+		endpos = len(string)
+	match = pattern.search(string, pos, endpos)
+	if match and match.end() < endpos:
+		return match
+	return None
+
+def map_pds(source):
+	"""Memory map a PDS data file *source* for reading.
+	
+	The *source* may be a filename or a file object, an existing map is returned unchanged.
+	Sources which can not be mapped, such as StringIO objects, pipes or empty files,
+	are returned as opened by ``open_pds``.
+	
+	The map remains valid after the underlying file is closed.
+	Reader scans a map in place and ImageExtractor reads image data from it without a copy.
+	"""
+	if isinstance(source, mmap.mmap):
+		return source
+	f = open_pds(source)
+	try:
+		fileno = f.fileno()
+	except (AttributeError, IOError, ValueError):
+		return f
+	try:
+		mapped = MappedFile(fileno, 0, access=mmap.ACCESS_READ)
+	except (mmap.error, EnvironmentError, ValueError):
+		return f
+	mapped.name = getattr(f, "name", None)
+	if f is not source:
+		# We opened the file, so it is ours to close.
+		f.close()
+	return mapped
+
+def iter_pds(filenames, stdin=None):
+	"""Yield the (name, source) of each of the PDS data files *filenames*, where '-' is standard input.
+	
+	A filename is its own source, each file is opened, or mapped, only by whatever reads it, and one at a time.
+	Standard input, which can be neither mapped nor sought, is copied in blocks to a temporary file,
+	which is closed, and so removed, once the next file is asked for.
+	"""
+	for filename in filenames:
+		if filename != '-':
+			yield filename, filename
+			continue
+		f = tempfile.TemporaryFile()
+		try:
+			shutil.copyfileobj(stdin or sys.stdin, f, PDS_HEADER_BLOCK_SIZE * 8)
+			f.seek(0)
+			yield '<stdin>', f
+		finally:
+			f.close()
+
+class MappedFile(mmap.mmap):
+	"""A read-only memory map which, like a file object, knows the *name* of the file behind it."""
+	name = None
+
+def file_identity(source):
+	"""Return the identity of the file behind *source* as (path, size, mtime, inode), or None.
+	
+	The *source* may be a filename, a file object or a map from ``map_pds``.
+	Sources without a file on disk behind them, such as StringIO objects, have no identity.
+	A file which is modified, replaced or moved gets a new identity.
+	"""
+	if isinstance(source, basestring):
+		path = source
+	else:
+		path = getattr(source, "name", None)
+		if not isinstance(path, basestring) or path.startswith("<"):
+			# e.g. '<stdin>' or '<fdopen>'
+			return None
+	try:
+		stat = os.fstat(source.fileno())
+	except (AttributeError, EnvironmentError, ValueError):
+		try:
+			stat = os.stat(path)
+		except EnvironmentError:
+			return None
+	return (os.path.abspath(path), stat.st_size, stat.st_mtime, stat.st_ino)
+
+def mapped_header_size(buf, blockSize=PDS_HEADER_BLOCK_SIZE):
+	"""Return the size of the attached label at the start of the memory mapped *buf*.
+	
+	The extent of the label is found as by ``read_pds_header``, but without copying any of it.
+	"""
+	size = len(buf)
+	blockEnd = min(blockSize, size)
+	recordBytes = _search_complete_line(_RECORD_BYTES, buf, 0, blockEnd)
+	labelRecords = _search_complete_line(_LABEL_RECORDS, buf, 0, blockEnd)
+	if recordBytes and labelRecords:
+		return min(int(recordBytes.group(1)) * int(labelRecords.group(1)), size)
+	endOfHeader = _END_OF_HEADER.search(buf)
+	return endOfHeader and endOfHeader.end() or size
+
 if __name__ == '__main__':
 	pass
 	
\ No newline at end of file
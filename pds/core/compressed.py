@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+compressed.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import bisect
+import bz2
+import io
+import unittest
+import zlib
+
+try:
+	import lzma
+except ImportError:
+	try:
+		from backports import lzma
+	except ImportError:
+		lzma = None
+
+from cache import MemoryCache
+
+
+# The leading bytes of each supported compression.
+COMPRESSIONS = (('gzip', "\x1f\x8b"), ('bz2', "BZh"), ('xz', "\xfd7zXZ\x00"))
+
+# Compressed data is read in chunks of this many bytes, and decompressed in chunks of no more than OUTPUT_CHUNK_BYTES.
+INPUT_CHUNK_BYTES = 64 * 1024
+OUTPUT_CHUNK_BYTES = 1024 * 1024
+
+# The decompressed bytes between the access points of a gzip index.
+GZIP_INDEX_SPACING = 1024 * 1024
+
+# An estimate of the memory held by each access point, a copy of the state of zlib and its 32 KiB window.
+GZIP_POINT_BYTES = 48 * 1024
+
+# The size of the buffer of the files returned by ``open_compressed``.
+BUFFER_BYTES = 64 * 1024
+
+# The indexes of gzip files, shared by every file opened while the compressed file is unchanged.
+_indexes = MemoryCache(maxEntries=64, maxBytes=64 * 1024 * 1024)
+
+
+def open_compressed(f):
+	"""Return the file object *f*, or a file of its contents decompressed if they are compressed.
+
+	The compression, gzip, bz2 or xz, is recognized by the leading bytes of *f*, from its current position on.
+	xz is only supported where an lzma module is available.
+	*f* must be seekable, others are returned as they are.
+
+	The decompressed file is a buffered, seekable, read-only file object, whose name is that of *f*.
+	Only as much is decompressed as has been read, reading the label of a product leaves its image compressed.
+	Seeking backwards restarts decompression from the start, except for gzip files:
+	as they are decompressed, access points are recorded every GZIP_INDEX_SPACING bytes,
+	and later reads resume from the nearest one before them rather than from the start.
+	The index of a gzip file on disk is kept, and shared, for as long as the file is unchanged.
+	"""
+	if isinstance(f, io.BufferedReader) and isinstance(f.raw, CompressedFile):
+		return f
+	try:
+		position = f.tell()
+		magic = f.read(max(len(prefix) for name, prefix in COMPRESSIONS))
+		f.seek(position)
+	except (AttributeError, EnvironmentError, ValueError):
+		return f
+	for compression, prefix in COMPRESSIONS:
+		if magic.startswith(prefix):
+			break
+	else:
+		return f
+	if compression == 'xz' and lzma is None:
+		raise IOError("An lzma module is required to decompress '%s'" % (getattr(f, "name", f),))
+	return io.BufferedReader(CompressedFile(f, compression), BUFFER_BYTES)
+
+
+class GzipIndex(object):
+	"""The access points of a gzip file, from which decompression may resume.
+
+	Each is the offset of its decompressed data, that of the compressed data
+	and a copy of the state of the decompressor at that point.
+	"""
+	def __init__(self):
+		super(GzipIndex, self).__init__()
+		self.offsets = []
+		self.points = []
+
+	def __len__(self):
+		return len(self.offsets)
+
+	def add(self, offset, compressedOffset, decompressor):
+		"""Add an access point, beyond the last one."""
+		self.offsets.append(offset)
+		self.points.append((offset, compressedOffset, decompressor))
+
+	def find(self, offset):
+		"""Return the last access point at or before the decompressed *offset*, or None."""
+		i = bisect.bisect_right(self.offsets, offset)
+		return i and self.points[i - 1] or None
+
+
+class CompressedFile(io.RawIOBase):
+	"""The decompressed contents of the file object *f*, a raw file for ``io.BufferedReader``, see ``open_compressed``."""
+
+	def __init__(self, f, compression):
+		super(CompressedFile, self).__init__()
+		self.name = getattr(f, "name", None)
+		self.compression = compression
+		self._file = f
+		self._start = f.tell()
+		self._prefix = dict(COMPRESSIONS)[compression]
+		self._identity = None
+		self._index = None
+		if compression == 'gzip':
+			from common import file_identity
+
+			self._identity = self._start == 0 and file_identity(f) or None
+			self._index = _indexes.get(self._identity, kind="gzip")
+			if self._index is None:
+				self._index = GzipIndex()
+		self._position = 0
+		self._restart()
+
+	def readable(self):
+		return True
+
+	def seekable(self):
+		return True
+
+	def tell(self):
+		return self._position
+
+	def seek(self, offset, whence=io.SEEK_SET):
+		"""Move to the decompressed *offset*, nothing is decompressed until the next read."""
+		if whence == io.SEEK_CUR:
+			offset += self._position
+		elif whence == io.SEEK_END:
+			while self._decompress_chunk():
+				pass
+			offset += self._bufferStart + len(self._buffer)
+		elif whence != io.SEEK_SET:
+			raise ValueError("Invalid whence (%r)" % (whence,))
+		if offset < 0:
+			raise IOError("Negative seek position %d" % (offset,))
+		self._position = offset
+		return offset
+
+	def readinto(self, b):
+		"""Read decompressed bytes into *b*, returning their number, 0 at the end of the file."""
+		while True:
+			bufferEnd = self._bufferStart + len(self._buffer)
+			if self._bufferStart <= self._position < bufferEnd:
+				start = self._position - self._bufferStart
+				size = min(len(b), bufferEnd - self._position)
+				b[:size] = self._buffer[start:start + size]
+				self._position += size
+				return size
+			point = self._index is not None and self._index.find(self._position) or None
+			if self._position < self._bufferStart:
+				# Go back to the nearest access point, or to the start.
+				self._restart(point)
+			elif point and point[0] > bufferEnd:
+				# Skip ahead to an access point rather than decompressing up to it.
+				self._restart(point)
+			elif not self._decompress_chunk():
+				return 0
+
+	def close(self):
+		if not self.closed:
+			self._file.close()
+		super(CompressedFile, self).close()
+
+	def _restart(self, point=None):
+		"""Resume decompression at the access *point*, or at the start of the file."""
+		if point is None:
+			offset, compressedOffset, self._decompressor = 0, self._start, self._new_decompressor()
+		else:
+			offset, compressedOffset, decompressor = point
+			# The point must remain as it was, for the next time.
+			self._decompressor = decompressor.copy()
+		self._file.seek(compressedOffset)
+		self._compressedOffset = compressedOffset
+		self._pending = ""
+		self._buffer = ""
+		self._bufferStart = offset
+
+	def _new_decompressor(self):
+		if self.compression == 'gzip':
+			return zlib.decompressobj(16 + zlib.MAX_WBITS)
+		if self.compression == 'bz2':
+			return bz2.BZ2Decompressor()
+		return lzma.LZMADecompressor()
+
+	def _decompress_chunk(self):
+		"""Decompress the next chunk into the buffer, returning False at the end of the file."""
+		if self._decompressor is None:
+			return False
+		data = self._pending or self._file.read(INPUT_CHUNK_BYTES)
+		self._pending = ""
+		if not data:
+			output = self.compression == 'gzip' and self._decompressor.flush() or ""
+			self._decompressor = None
+		elif self.compression == 'gzip':
+			output = self._decompressor.decompress(data, OUTPUT_CHUNK_BYTES)
+			self._pending = self._decompressor.unconsumed_tail
+		else:
+			try:
+				output = self._decompressor.decompress(data)
+			except EOFError:
+				# The stream ended with the last chunk, another follows.
+				self._decompressor = self._new_decompressor()
+				output = self._decompressor.decompress(data)
+		if data:
+			self._compressedOffset += len(data) - len(self._pending)
+			unused = self._decompressor.unused_data
+			if unused:
+				# The stream has ended, another may follow, e.g. as in a gzip file of several members.
+				self._compressedOffset -= len(unused)
+				if unused.startswith(self._prefix):
+					self._decompressor = self._new_decompressor()
+					self._pending = unused
+				else:
+					# Trailing garbage, such as padding, is ignored.
+					self._decompressor = None
+		self._bufferStart += len(self._buffer)
+		self._buffer = output
+		if self._index is not None and not self._pending and self._decompressor is not None:
+			offset = self._bufferStart + len(output)
+			lastOffset = self._index.offsets and self._index.offsets[-1] or 0
+			if offset - lastOffset >= GZIP_INDEX_SPACING:
+				self._index.add(offset, self._compressedOffset, self._decompressor.copy())
+				if self._identity is not None:
+					_indexes.set(self._identity, self._index, kind="gzip", nbytes=len(self._index) * GZIP_POINT_BYTES)
+		return bool(output) or self._decompressor is not None
+
+
+class CompressedFileTests(unittest.TestCase):
+	"""Unit tests for function open_compressed"""
+	def setUp(self):
+		global GZIP_INDEX_SPACING, INPUT_CHUNK_BYTES
+
+		self.settings = GZIP_INDEX_SPACING, INPUT_CHUNK_BYTES
+		GZIP_INDEX_SPACING, INPUT_CHUNK_BYTES = 5000, 1000
+		self.data = "".join("%06d\r\n" % (i) for i in range(4000))
+
+	def tearDown(self):
+		global GZIP_INDEX_SPACING, INPUT_CHUNK_BYTES
+
+		GZIP_INDEX_SPACING, INPUT_CHUNK_BYTES = self.settings
+
+	def gzip(self, data):
+		import gzip
+		import cStringIO as StringIO
+
+		buf = StringIO.StringIO()
+		with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+			f.write(data)
+		return buf.getvalue()
+
+	def test_seek(self):
+		"""Compressed files are read from anywhere, as they are decompressed"""
+		import random
+		import cStringIO as StringIO
+
+		# A gzip file of two members.
+		half = len(self.data) // 2
+		sources = [("gzip", self.gzip(self.data[:half]) + self.gzip(self.data[half:])), ("bz2", bz2.compress(self.data))]
+		for compression, compressed in sources:
+			f = open_compressed(StringIO.StringIO(compressed))
+			self.assertEqual(compression, f.raw.compression)
+			self.assertEqual("000000\r\n", f.readline())
+			self.assertTrue(open_compressed(f) is f)
+			offsets = [random.randrange(len(self.data)) for i in range(50)] + [len(self.data) - 3, 0, half - 1]
+			for offset in offsets:
+				f.seek(offset)
+				self.assertEqual(self.data[offset:offset + 700], f.read(700))
+			self.assertEqual(len(self.data), f.seek(0, io.SEEK_END))
+			self.assertEqual("", f.read(1))
+		f = open_compressed(StringIO.StringIO(sources[0][1]))
+		self.assertEqual(self.data, f.read())
+		self.assertTrue(len(self.data) // GZIP_INDEX_SPACING // 2 <= len(f.raw._index))
+
+	def test_xz(self):
+		"""xz files are decompressed and read from anywhere, where an lzma module is available"""
+		import random
+		import cStringIO as StringIO
+
+		if lzma is None:
+			return
+		compressed = lzma.compress(self.data)
+		f = open_compressed(StringIO.StringIO(compressed))
+		self.assertEqual("xz", f.raw.compression)
+		self.assertEqual(self.data, f.read())
+		self.assertEqual("", f.read(1))
+		offsets = [random.randrange(len(self.data)) for i in range(50)] + [len(self.data) - 3, 0]
+		for offset in offsets:
+			f.seek(offset)
+			self.assertEqual(self.data[offset:offset + 700], f.read(700))
+		self.assertEqual(len(self.data), f.seek(0, io.SEEK_END))
+
+	def test_uncompressed(self):
+		"""Uncompressed files are returned as they are"""
+		import cStringIO as StringIO
+
+		f = StringIO.StringIO(self.data)
+		self.assertTrue(open_compressed(f) is f)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+datatypes.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import unittest
+
+
+class DataTypeError(ValueError):
+	"""Error raised for a data type, or a size of one, which is not supported."""
+
+	def __init__(self, *args, **kwargs):
+		super(DataTypeError, self).__init__(*args, **kwargs)
+
+
+# The kind and byte order of each binary PDS data type, as used by SAMPLE_TYPE and DATA_TYPE.
+DATA_TYPES = {}
+for name in ('UNSIGNED_INTEGER', 'MSB_UNSIGNED_INTEGER', 'SUN_UNSIGNED_INTEGER', 'MAC_UNSIGNED_INTEGER'):
+	DATA_TYPES[name] = 'u', '>'
+for name in ('LSB_UNSIGNED_INTEGER', 'PC_UNSIGNED_INTEGER', 'VAX_UNSIGNED_INTEGER'):
+	DATA_TYPES[name] = 'u', '<'
+for name in ('INTEGER', 'MSB_INTEGER', 'SUN_INTEGER', 'MAC_INTEGER'):
+	DATA_TYPES[name] = 'i', '>'
+for name in ('LSB_INTEGER', 'PC_INTEGER', 'VAX_INTEGER'):
+	DATA_TYPES[name] = 'i', '<'
+for name in ('IEEE_REAL', 'REAL', 'FLOAT', 'SUN_REAL', 'MAC_REAL'):
+	DATA_TYPES[name] = 'f', '>'
+for name in ('PC_REAL',):
+	DATA_TYPES[name] = 'f', '<'
+del name
+
+# The sizes, in bytes, of each kind.
+SIZES = {'u': (1, 2, 4), 'i': (1, 2, 4), 'f': (4, 8)}
+
+# The PIL (mode, raw mode) which decodes each NumPy type string, deeper samples keep their depth.
+PIL_MODES = {
+	'u1': ('L', 'L'), 'i1': ('I', 'I;8S'),
+	'>u2': ('I', 'I;16B'), '<u2': ('I', 'I;16'), '>i2': ('I', 'I;16BS'), '<i2': ('I', 'I;16S'),
+	'>u4': ('I', 'I;32B'), '<u4': ('I', 'I;32'), '>i4': ('I', 'I;32BS'), '<i4': ('I', 'I;32S'),
+	'>f4': ('F', 'F;32BF'), '<f4': ('F', 'F;32F'), '>f8': ('F', 'F;64BF'), '<f8': ('F', 'F;64F'),
+	}
+
+
+def data_type(dataType, bits):
+	"""Return the NumPy type string, e.g. '>i2', of a binary PDS *dataType* of *bits*.
+
+	The type string is understood by numpy.dtype, although NumPy itself is not needed.
+	A DataTypeError is raised for those which are not supported, such as VAX_REAL.
+	"""
+	try:
+		kind, byteOrder = DATA_TYPES[dataType]
+	except KeyError:
+		raise DataTypeError("Data type '%s' is not supported" % (dataType,))
+	size, remainder = divmod(int(bits), 8)
+	if remainder or size not in SIZES[kind]:
+		raise DataTypeError("%d bit %s is not supported" % (int(bits), dataType))
+	if size == 1:
+		return kind + '1'
+	return '%s%s%d' % (byteOrder, kind, size)
+
+def pil_mode(typeString):
+	"""Return the PIL (mode, raw mode) which decodes samples of the NumPy *typeString*."""
+	try:
+		return PIL_MODES[typeString]
+	except KeyError:
+		raise DataTypeError("Samples of type '%s' can not be decoded by PIL" % (typeString,))
+
+
+class DataTypeTests(unittest.TestCase):
+	"""Unit tests for function data_type"""
+	def test_data_type(self):
+		"""Each data type maps to a type string of its size and byte order"""
+		self.assertEqual('u1', data_type('MSB_UNSIGNED_INTEGER', 8))
+		self.assertEqual('i1', data_type('LSB_INTEGER', '8'))
+		self.assertEqual('<i2', data_type('LSB_INTEGER', 16))
+		self.assertEqual('>u4', data_type('UNSIGNED_INTEGER', 32))
+		self.assertEqual('>f4', data_type('IEEE_REAL', 32))
+		self.assertEqual('<f8', data_type('PC_REAL', 64))
+		self.assertRaises(DataTypeError, data_type, 'VAX_REAL', 32)
+		self.assertRaises(DataTypeError, data_type, 'IEEE_REAL', 16)
+		self.assertRaises(DataTypeError, data_type, 'MSB_INTEGER', 12)
+		for dataType in DATA_TYPES:
+			for size in SIZES[DATA_TYPES[dataType][0]]:
+				pil_mode(data_type(dataType, size * 8))
+
+
+if __name__ == '__main__':
+	unittest.main()
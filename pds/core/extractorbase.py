@@ -9,8 +9,24 @@ Copyright (c) 2009 Ryan Matthew Balfanz. All rights reserved.
 """
 
 
+import logging
+import mmap
+import os
+import sys
 import unittest
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from common import map_pds
+from values import Quantity, decode
+
+
+# The extractors which have been registered, in the order they were, see ``register``.
+_registry = []
+
 
 class ExtractorError(Exception):
 	"""Base class for exceptions raised by ``ExtractorBase`` and its subclasses."""
@@ -25,7 +41,15 @@ class ExtractorBase(object):
 	Programs may define their own extractors by creating a new extractor.
 	
 	Any subclass should override the ``extract`` method, otherwise a NotImplementedError is raised.
+
+	A subclass declares the objects it extracts in POINTERS, by the names of their ^POINTER labels
+	without the caret, and is registered for them with ``register``.
+	A ``product.Product`` then dispatches each of its objects to the extractor which handles it.
 	"""
+
+	# The objects handled by the extractor, e.g. ('IMAGE',) for ^IMAGE.
+	POINTERS = ()
+
 	def __init__(self, *args, **kwargs):
 		super(ExtractorBase, self).__init__(*args, **kwargs)
 		pass
@@ -34,6 +58,153 @@ class ExtractorBase(object):
 		"""This method should be overwritten by a subclass."""
 		raise NotImplementedError
 
+	@classmethod
+	def handles(cls, name):
+		"""Return whether the extractor handles the object *name*, by default one of its POINTERS."""
+		return name in cls.POINTERS
+
+	def extract_object(self, source, name, *args, **kwargs):
+		"""Extract the object *name* of *source*, by default with ``extract``.
+
+		Extractors which handle several objects, such as every kind of table, override this to select it.
+		"""
+		return self.extract(source, *args, **kwargs)
+
+	def _init_logging(self):
+		"""Initialize logging, replacing the name given as *log* by a logger which writes to stderr and to that name + .log."""
+		# Set the message format.
+		format = logging.Formatter("%(levelname)s:%(name)s:%(asctime)s:%(message)s")
+
+		# Create the message handler.
+		stderr_hand = logging.StreamHandler(sys.stderr)
+		stderr_hand.setLevel(logging.DEBUG)
+		stderr_hand.setFormatter(format)
+
+		# Create a handler for routing to a file.
+		logfile_hand = logging.FileHandler(self.log + '.log')
+		logfile_hand.setLevel(logging.DEBUG)
+		logfile_hand.setFormatter(format)
+
+		# Create a top-level logger.
+		self.log = logging.getLogger(self.log)
+		self.log.setLevel(logging.DEBUG)
+		self.log.addHandler(logfile_hand)
+		self.log.addHandler(stderr_hand)
+
+		self.log.debug('Initializing logger')
+
+	def _open(self, source, keys=None):
+		"""Map, or open, *source* and parse its labels, only those leading to *keys* unless fullLabels is set.
+
+		The file and labels of a ``product.Product`` are shared rather than opened and parsed again.
+		Subclasses set the _parser, cache, fullLabels and log used here.
+		Return the file and whether it is mapped.
+		"""
+		if _is_product(source):
+			self.labels = source.labels
+			return source.file, source.mapped
+		f = map_pds(source)
+		mapped = isinstance(f, mmap.mmap)
+		if self.log: self.log.debug("Parsing '%s'" % (source))
+		# With a cache, every label is parsed so that they may be stored.
+		keys = not (self.fullLabels or self.cache) and keys or None
+		self.labels = self._parser.parse(f, keys=keys)
+		if self.log: self.log.debug("Found %d labels" % (len(self.labels)))
+		return f, mapped
+
+	def _close(self, f, source, mapped):
+		"""Close the file opened by ``_open``, a map is left to be closed once it is no longer referenced.
+
+		A ``product.Product`` is left open, it is closed by its owner.
+		"""
+		if _is_product(source):
+			return
+		if not mapped:
+			f.close()
+		elif hasattr(source, "read"):
+			# As with any other file handed to us, the file which was mapped is closed.
+			source.close()
+
+	def _get_pointer_location(self, source, name):
+		"""Return the file holding the object *name*, or None for the labelled file itself, and the seek-able position within it.
+
+		The ^name pointer may be a record, a value in <BYTES>, a file name, or a file name with either of those.
+		A file is looked for beside the labelled file *source*, as it is named or in either case.
+		"""
+		pointer = decode(self.labels['^' + name])
+		filename = None
+		if isinstance(pointer, basestring):
+			filename, pointer = pointer, 1
+		elif isinstance(pointer, tuple):
+			filename, pointer = pointer
+		if isinstance(pointer, Quantity):
+			if pointer.units != 'BYTES':
+				raise ValueError("Expected <BYTES> pointer units but found <%s>" % (pointer.units))
+			location = int(pointer.value)
+		elif isinstance(pointer, (int, long)):
+			location = (pointer - 1) * int(self.labels.get('RECORD_BYTES', 1))
+		else:
+			raise ValueError("^%s contains extra information %s" % (name, self.labels['^' + name]))
+		if filename is not None:
+			filename = _find_beside(source, filename)
+		return filename, location
+
+	def _view(self, f, mapped, dtype, offset, shape, strides):
+		"""Return a NumPy array of *shape* and *strides* at *offset* within the file *f*.
+
+		A mapped file is viewed as it is, only the pages of the samples which are used are ever touched.
+		Otherwise the span of bytes the array lies within is read, or, when the lines of the array
+		are sparse within that span, the span of each line, or of each sample.
+		"""
+		dtype = numpy.dtype(dtype)
+		if mapped:
+			return numpy.ndarray(shape, dtype, f, offset, strides)
+		if 0 in shape:
+			return numpy.empty(shape, dtype)
+		if not shape or abs(strides[-1]) > 2 * dtype.itemsize:
+			# The samples of a line are themselves sparse, e.g. a spectrum of a band sequential qube.
+			return self._view(f, mapped, dtype, offset, tuple(shape) + (1,), tuple(strides) + (dtype.itemsize,)).reshape(shape)
+		log = getattr(self, "log", None)
+		low = sum(min(0, (n - 1) * stride) for n, stride in zip(shape, strides))
+		high = sum(max(0, (n - 1) * stride) for n, stride in zip(shape, strides)) + dtype.itemsize
+		lineLow = min(0, (shape[-1] - 1) * strides[-1])
+		lineBytes = abs((shape[-1] - 1) * strides[-1]) + dtype.itemsize
+		lines = reduce(lambda a, b: a * b, shape[:-1], 1)
+		if lines * lineBytes * 2 < high - low:
+			if log: log.debug("Reading %d lines of %d bytes" % (lines, lineBytes))
+			array = numpy.empty(shape, dtype)
+			for index in numpy.ndindex(*shape[:-1]):
+				f.seek(offset + sum(i * stride for i, stride in zip(index, strides)) + lineLow)
+				array[index] = numpy.ndarray(shape[-1:], dtype, f.read(lineBytes), -lineLow, strides[-1:])
+			return array
+		f.seek(offset + low)
+		return numpy.ndarray(shape, dtype, f.read(high - low), -low, strides)
+
+
+def register(extractorClass):
+	"""Register *extractorClass*, a subclass of ExtractorBase, for the objects it handles, returning it."""
+	if extractorClass not in _registry:
+		_registry.append(extractorClass)
+	return extractorClass
+
+def extractors_for(name):
+	"""Return the registered extractors which handle the object *name*, in the order they were registered."""
+	return [extractorClass for extractorClass in _registry if extractorClass.handles(name)]
+
+def _is_product(source):
+	"""Return whether *source* is an opened and parsed ``product.Product``, rather than a file."""
+	return hasattr(source, "labels") and hasattr(source, "mapped") and not hasattr(source, "read")
+
+def _find_beside(source, filename):
+	"""Return the path of *filename* beside the labelled file *source*, as named or in either case."""
+	label = isinstance(source, basestring) and source or getattr(source, "name", "")
+	directory = os.path.dirname(label if isinstance(label, basestring) else "")
+	for candidate in (filename, filename.lower(), filename.upper()):
+		path = os.path.join(directory, candidate)
+		if os.path.exists(path):
+			return path
+	raise IOError("Could not find '%s' beside '%s'" % (filename, label))
+
 
 class ExtractorTests(unittest.TestCase):
 	"""Unit tests for class ExtractorBase"""
@@ -44,6 +215,31 @@ class ExtractorTests(unittest.TestCase):
 		"""Method ``extract`` must be overloaded"""
 		self.assertRaises(NotImplementedError, self.eb.extract)
 
+	def test_registry(self):
+		"""Extractors are found by the objects they handle"""
+		class TestExtractor(ExtractorBase):
+			POINTERS = ('TEST_OBJECT',)
+
+		self.assertTrue(register(TestExtractor) is TestExtractor)
+		try:
+			self.assertEqual([TestExtractor], extractors_for('TEST_OBJECT'))
+			self.assertEqual([], extractors_for('OTHER_OBJECT'))
+		finally:
+			_registry.remove(TestExtractor)
+
+	def test_view(self):
+		"""Views of a file which is not mapped read the same samples as those of a mapped one"""
+		import cStringIO as StringIO
+
+		if numpy is None:
+			return
+		data = numpy.arange(4 * 5 * 6, dtype='>i2')
+		layouts = [(0, (4, 5, 6), (60, 12, 2)), (2, (4,), (60,)), (60, (2, 3, 2), (120, -24, 6)), (0, (2, 0), (2, 2))]
+		for offset, shape, strides in layouts:
+			mapped = self.eb._view(data.tostring(), True, '>i2', offset, shape, strides)
+			read = self.eb._view(StringIO.StringIO(data.tostring()), False, '>i2', offset, shape, strides)
+			self.assertEqual(mapped.tolist(), read.tolist())
+
 
 if __name__ == '__main__':
 	unittest.main()
\ No newline at end of file
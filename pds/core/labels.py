@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+labels.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import sys
+import unittest
+import weakref
+
+from values import decode
+
+
+# Schemas are shared by every label set with the same structure, for as long as one of them is alive.
+_schemas = weakref.WeakValueDictionary()
+
+
+class Schema(object):
+	"""The structure of a label set, its paths in order and an index into them.
+
+	A path joins the keys leading to a label with '/', e.g. 'IMAGE/LINES'.
+	"""
+	__slots__ = ("paths", "index", "children", "__weakref__")
+
+	def __init__(self, paths):
+		super(Schema, self).__init__()
+		self.paths = paths
+		self.index = {}
+		self.children = {}
+		for i, path in enumerate(paths):
+			self.index[path] = i
+			parent, sep, key = path.rpartition("/")
+			self.children.setdefault(parent + sep, []).append(intern(key))
+		for prefix, keys in self.children.iteritems():
+			self.children[prefix] = tuple(keys)
+
+
+def get_schema(paths):
+	"""Return the shared Schema of *paths*, a tuple of paths."""
+	schema = _schemas.get(paths)
+	if schema is None:
+		schema = _schemas[paths] = Schema(tuple(intern(path) for path in paths))
+	return schema
+
+
+class ReadOnlyLabels(object):
+	"""The dictionary interface of a read-only label set, given __getitem__, __contains__, __iter__ and __len__."""
+	__slots__ = ()
+
+	def has_key(self, key):
+		return key in self
+
+	def get(self, key, default=None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+
+	def iterkeys(self):
+		return iter(self)
+
+	def keys(self):
+		return list(self)
+
+	def itervalues(self):
+		for key in self:
+			yield self[key]
+
+	def values(self):
+		return list(self.itervalues())
+
+	def iteritems(self):
+		for key in self:
+			yield key, self[key]
+
+	def items(self):
+		return list(self.iteritems())
+
+	def __eq__(self, other):
+		if isinstance(other, ReadOnlyLabels):
+			other = other.to_dict()
+		return self.to_dict() == other
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __repr__(self):
+		return repr(self.to_dict())
+
+	def to_dict(self):
+		"""Return the labels as nested dictionaries."""
+		labels = {}
+		for key, value in self.iteritems():
+			if isinstance(value, ReadOnlyLabels):
+				value = value.to_dict()
+			labels[key] = value
+		return labels
+
+
+class CompactLabels(ReadOnlyLabels):
+	"""A read-only label set which is held as a flat tuple of values.
+
+	The keys are held by a Schema, which is shared with every other label set of the same structure
+	(e.g. each product from an instrument), so that a label set costs little more than its values.
+	Otherwise, it behaves as the nested dictionaries returned by ``Parser`` do,
+	containers are returned as CompactLabels of their own.
+	In addition, nested labels may be looked up by their path.
+
+	>>> labels = compact_labels(pdsParser.parse(open_pds('pds.img')))
+	>>> labels['IMAGE']['LINES'] == labels['IMAGE/LINES']
+	True
+	"""
+	__slots__ = ("_schema", "_values", "_prefix")
+
+	def __init__(self, schema, values, prefix=""):
+		super(CompactLabels, self).__init__()
+		self._schema = schema
+		self._values = values
+		self._prefix = prefix
+
+	def __getitem__(self, key):
+		try:
+			i = self._schema.index[self._prefix + key]
+		except KeyError:
+			raise KeyError(key)
+		value = self._values[i]
+		if value is None:
+			# Containers hold no value of their own.
+			return CompactLabels(self._schema, self._values, self._schema.paths[i] + "/")
+		return value
+
+	def __contains__(self, key):
+		return self._prefix + key in self._schema.index
+
+	def __len__(self):
+		return len(self._schema.children.get(self._prefix, ()))
+
+	def __iter__(self):
+		return iter(self._schema.children.get(self._prefix, ()))
+
+	def keys(self):
+		return list(self._schema.children.get(self._prefix, ()))
+
+	def __sizeof__(self):
+		"""Return the memory held by this label set, leaving out the shared schema."""
+		size = object.__sizeof__(self) + sys.getsizeof(self._values)
+		for value in self._values:
+			if value is not None:
+				size += sys.getsizeof(value)
+		return size
+
+	def __reduce__(self):
+		return _restore, (self._schema.paths, self._values, self._prefix)
+
+
+class TypedLabels(ReadOnlyLabels):
+	"""A read-only view of a label set whose values are decoded, see ``values.decode``.
+
+	Each value is decoded as it is first looked up and kept from then on,
+	the labels as parsed remain available as *raw*.
+
+	>>> labels = TypedLabels(pdsParser.parse(open_pds('pds.img')))
+	>>> labels['IMAGE']['LINES']
+	1024
+	"""
+	__slots__ = ("raw", "_typed")
+
+	def __init__(self, raw):
+		super(TypedLabels, self).__init__()
+		self.raw = raw
+		self._typed = {}
+
+	def __getitem__(self, key):
+		try:
+			return self._typed[key]
+		except KeyError:
+			pass
+		value = self.raw[key]
+		if isinstance(value, basestring):
+			value = decode(value)
+		else:
+			value = TypedLabels(value)
+		self._typed[key] = value
+		return value
+
+	def __contains__(self, key):
+		return key in self.raw
+
+	def __len__(self):
+		return len(self.raw)
+
+	def __iter__(self):
+		return iter(self.raw)
+
+	def __reduce__(self):
+		return TypedLabels, (self.raw,)
+
+
+def _restore(paths, values, prefix):
+	"""Unpickle CompactLabels, sharing the schema of any label set already in memory."""
+	return CompactLabels(get_schema(paths), values, prefix)
+
+def _flatten(labels, prefix, paths, values):
+	"""Append the paths and values of the nested dictionary *labels* in a depth-first order.
+
+	Keys are sorted, so that the order of the dictionaries does not keep schemas from being shared.
+	"""
+	for key, value in sorted(labels.iteritems()):
+		path = prefix + key
+		paths.append(path)
+		if isinstance(value, dict):
+			values.append(None)
+			_flatten(value, path + "/", paths, values)
+		else:
+			values.append(value)
+
+def compact_labels(labels):
+	"""Return CompactLabels holding the nested dictionary *labels*."""
+	paths, values = [], []
+	_flatten(labels, "", paths, values)
+	return CompactLabels(get_schema(tuple(paths)), tuple(values))
+
+
+class CompactLabelsTests(unittest.TestCase):
+	"""Unit tests for class CompactLabels"""
+	def setUp(self):
+		self.labels = {"RECORD_BYTES": "1024", "^IMAGE": "3",
+			"IMAGE": {"LINES": "1", "LINE_SAMPLES": "2", "GROUP": {"NAME": "A"}}}
+
+	def test_dict_interface(self):
+		"""CompactLabels are used as the nested dictionaries are"""
+		labels = compact_labels(self.labels)
+		self.assertEqual(self.labels, labels.to_dict())
+		self.assertEqual(labels, self.labels)
+		self.assertEqual(sorted(self.labels.keys()), sorted(labels.keys()))
+		self.assertEqual(3, len(labels))
+		self.assertEqual("1", labels["IMAGE"]["LINES"])
+		self.assertEqual("A", labels["IMAGE/GROUP/NAME"])
+		self.assertTrue(labels.has_key("IMAGE"))
+		self.assertTrue("LINES" in labels["IMAGE"])
+		self.assertFalse("LINES" in labels)
+		self.assertEqual(None, labels.get("LINES"))
+		self.assertRaises(KeyError, labels.__getitem__, "LINES")
+
+	def test_shared_schema(self):
+		"""Label sets of the same structure share a schema, also once unpickled"""
+		import cPickle as pickle
+
+		labels = compact_labels(self.labels)
+		other = dict(self.labels, RECORD_BYTES="2048")
+		self.assertTrue(labels._schema is compact_labels(other)._schema)
+		restored = pickle.loads(pickle.dumps(labels, pickle.HIGHEST_PROTOCOL))
+		self.assertEqual(labels, restored)
+		self.assertTrue(labels._schema is restored._schema)
+
+
+class TypedLabelsTests(unittest.TestCase):
+	"""Unit tests for class TypedLabels"""
+	def test_decode(self):
+		"""Values are decoded once, as they are looked up"""
+		raw = {"RECORD_BYTES": "1024", "^IMAGE": "2048 <BYTES>", "IMAGE": {"LINES": "1", "MD5_CHECKSUM": '"0a"'}}
+		for labels in (TypedLabels(raw), TypedLabels(compact_labels(raw))):
+			self.assertEqual(1024, labels["RECORD_BYTES"])
+			self.assertEqual((2048, "BYTES"), labels["^IMAGE"])
+			self.assertEqual("0a", labels["IMAGE"]["MD5_CHECKSUM"])
+			self.assertTrue(labels["IMAGE"] is labels["IMAGE"])
+			self.assertEqual({"RECORD_BYTES": 1024, "^IMAGE": (2048, "BYTES"), "IMAGE": {"LINES": 1, "MD5_CHECKSUM": "0a"}},
+				labels.to_dict())
+			self.assertTrue(labels.has_key("IMAGE"))
+		self.assertEqual(1, TypedLabels(compact_labels(raw))["IMAGE/LINES"])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -19,6 +19,8 @@ import sys
 import unittest
 
 #from common import open_pds
+from common import file_identity, open_pds
+from labels import TypedLabels, compact_labels
 from reader import Reader
 
 
@@ -42,6 +44,30 @@ class IOError(ParserError):
 		super(IOError, self).__init__(*args, **kwargs)
 
 
+# The events generated by Parser.events.
+START_CONTAINER = 'start'
+RECORD = 'record'
+END_CONTAINER = 'end'
+
+
+class ContentHandler(object):
+	"""Receive the events of a label, see ``Parser.dispatch``.
+	
+	Subclasses override the methods they need, any method may return True to stop parsing.
+	"""
+	def start_container(self, container, name):
+		"""Called as the container *name*, an OBJECT or GROUP, is opened."""
+		pass
+
+	def record(self, key, value):
+		"""Called for each (key, value) label within the current container."""
+		pass
+
+	def end_container(self, container, name):
+		"""Called as the container *name* is closed."""
+		pass
+
+
 class ParserNode(object):
 	"""A tree-like node structure to maintain structure within PDS labels."""
 	def __init__(self, children=None, parent=None):
@@ -79,11 +105,27 @@ class Parser(object):
 	>>> pdsParser = Parser()
 	>>> for f in ['file1.lbl', 'file2.lbl']:
 	>>> 	labelDict = pdsParser.parse(open(f, 'rb'))
+	
+	Set *headerOnly* to read just the attached label of each source, see ``Reader``.
+	
+	A *cache*, such as ``cache.LabelCache``, lets labels previously parsed from an unchanged file
+	be returned without reading the file at all. Sources which are not files on disk are always parsed.
+	
+	Set *compact* to return read-only ``labels.CompactLabels`` in place of nested dictionaries,
+	these take far less memory when many label sets are held at once.
+	
+	Set *typed* to return ``labels.TypedLabels``, whose values are decoded as they are looked up,
+	e.g. labels['IMAGE']['LINES'] is an int. Otherwise every value is the string found in the label.
+	
+	Labels may also be streamed as events, without building any tree, see ``events`` and ``dispatch``.
 	"""
-	def __init__(self, log=None):
+	def __init__(self, log=None, headerOnly=False, cache=None, compact=False, typed=False):
 		"""Initialize a reusable instance of the class."""
 		super(Parser, self).__init__()
-		self._reader = Reader()
+		self._reader = Reader(headerOnly=headerOnly)
+		self.cache = cache
+		self.compact = compact
+		self.typed = typed
 		
 		self.log = log
 		if log:
@@ -118,26 +160,59 @@ class Parser(object):
 		strItems.append('PDSParser: %s' % (repr(self),))
 		return '\n'.join(strItems)
 			
-	def parse(self, source):
-		"""Parse the source PDS data."""
+	def parse(self, source, keys=None):
+		"""Parse the source PDS data.
+		
+		Given *keys*, a list of paths such as 'RECORD_BYTES', 'IMAGE/LINES' or 'IMAGE',
+		only those labels are parsed and the source is read no further than the last of them.
+		Labels parsed in part are not stored in the cache, although they may be found there, nor are empty labels.
+		
+		The *source* may also be a filename, the file is then opened and closed here.
+		"""
+		if isinstance(source, basestring):
+			f = open_pds(source)
+			try:
+				return self.parse(f, keys)
+			finally:
+				f.close()
 		# if self.log: self.log.debug("Parsing '%s'" % (source.name,))
-		self._labels = self._parse_header(source)
-		if self.log: self.log.debug("Parsed %d top-level labels" % (len(self._labels)))
+		identity = labels = None
+		if self.cache is not None:
+			identity = file_identity(source)
+			labels = self.cache.get(identity)
+			if not isinstance(labels, dict):
+				# e.g. CompactLabels cached by an earlier release.
+				labels = None
+			if labels is not None:
+				if self.log: self.log.debug("Found cached labels for '%s'" % (identity[0],))
+		if labels is None:
+			labels = self._parse_header(source, keys)
+			if identity is not None and keys is None and labels:
+				# Nested dictionaries are cached, whatever the labels are returned as, so that any parser may share them.
+				self.cache.set(identity, labels)
+			if self.log: self.log.debug("Parsed %d top-level labels" % (len(labels)))
+		if self.compact:
+			labels = compact_labels(labels)
+		if self.typed:
+			labels = TypedLabels(labels)
+		self._labels = labels
 		return self._labels
 
-	def _parse_header(self, source):
-		"""Parse the PDS header.
+	def events(self, source):
+		"""Generate the labels of the source PDS data as (event, key, value) tuples.
 		
-		For grouped data, supported containers belong to {'OBJECT', 'GROUP'}.
-		Unidentified containers will be parsed as simple labels and will not create a child dictionary.
+		The events are
+			* (START_CONTAINER, container, name) as a container, e.g. ('OBJECT', 'IMAGE'), is opened,
+			* (RECORD, key, value) for each label within the current container,
+			* (END_CONTAINER, container, name) as it is closed, e.g. ('END_OBJECT', 'IMAGE').
+		
+		The name of a container is repeated when it is closed, even where the label leaves it out.
+		Nothing is retained between events, so stop iterating to abort parsing.
 		"""
-		if self.log: self.log.debug('Parsing header')
 		CONTAINERS = {'OBJECT':'END_OBJECT', 'GROUP':'END_GROUP'}
 		CONTAINERS_START = CONTAINERS.keys()
 		CONTAINERS_END = CONTAINERS.values()
 		
-		root = ParserNode({}, None)
-		currentNode = root
 		expectedEndQueue = []
 		for record in self._reader.read(source):
 			k, v = record[0], record[1]
@@ -145,22 +220,100 @@ class Parser(object):
 
 			if k in CONTAINERS_START:
 				expectedEndQueue.append((CONTAINERS[k], v))
-				currentNode = ParserNode({}, currentNode)
-				#print expectedEndQueue
+				yield START_CONTAINER, k, v
 			elif k in CONTAINERS_END:
 				try:
 					expectedEnd = expectedEndQueue.pop()
-					newParent = currentNode.parent
-					newParent.children[v] = currentNode.children
-					currentNode = newParent
 				except IndexError:
-					# Verifiy that we are back at the root.
-					assert currentNode.parent is None, ('Parent node is not None.')
+					# Already back at the root, there is nothing to close.
+					continue
+				# A container may be closed without repeating its name.
+				yield END_CONTAINER, k, v or expectedEnd[1]
 			else:
 				assert not k.startswith('END_'), ('Detected a possible uncaught nesting %s.') % (k,)
-				currentNode.children[k] = v
+				yield RECORD, k, v
 		assert not expectedEndQueue, ('Detected hanging chads, very gory... %s') % (expectedEndQueue,)
 
+	def dispatch(self, source, handler):
+		"""Parse the source PDS data, calling the methods of *handler* for each event.
+		
+		The handler is a ``ContentHandler``, parsing stops early when any of its methods returns True.
+		"""
+		for event, k, v in self.events(source):
+			if event == RECORD:
+				stop = handler.record(k, v)
+			elif event == START_CONTAINER:
+				stop = handler.start_container(k, v)
+			else:
+				stop = handler.end_container(k, v)
+			if stop:
+				break
+
+	def _parse_header(self, source, keys=None):
+		"""Parse the PDS header into a tree, consuming the events of the source.
+		
+		For grouped data, supported containers belong to {'OBJECT', 'GROUP'}.
+		Unidentified containers will be parsed as simple labels and will not create a child dictionary.
+		
+		Given *keys*, containers which neither are nor lead to one of the keys are skipped over,
+		and parsing stops as soon as every key has been found.
+		"""
+		if self.log: self.log.debug('Parsing header')
+		remaining = None
+		if keys is not None:
+			remaining = set(keys)
+			# Containers leading to a key, these must be parsed to find it.
+			prefixes = set()
+			for key in remaining:
+				parts = key.split('/')
+				for i in range(1, len(parts)):
+					prefixes.add('/'.join(parts[:i]))
+		
+		root = ParserNode({}, None)
+		currentNode = root
+		# Each open container is held as (name, path of its parent, whether all of its parent is wanted).
+		parentQueue = []
+		path, wantsAll = '', keys is None
+		skipDepth = 0
+		for event, k, v in self.events(source):
+			if event == RECORD:
+				if skipDepth:
+					continue
+				if wantsAll:
+					currentNode.children[k] = v
+				elif path + k in remaining:
+					currentNode.children[k] = v
+					remaining.discard(path + k)
+			elif event == START_CONTAINER:
+				if skipDepth:
+					skipDepth += 1
+					continue
+				containerPath = path + v
+				containerWantsAll = wantsAll or containerPath in remaining
+				if not containerWantsAll and containerPath not in prefixes:
+					skipDepth = 1
+					continue
+				parentQueue.append((v, path, wantsAll))
+				path, wantsAll = containerPath + '/', containerWantsAll
+				currentNode = ParserNode({}, currentNode)
+			else:
+				if skipDepth:
+					skipDepth -= 1
+					continue
+				newParent = currentNode.parent
+				newParent.children[v] = currentNode.children
+				currentNode = newParent
+				if remaining is not None:
+					remaining.discard(path[:-1])
+				path, wantsAll = parentQueue.pop()[1:]
+			if remaining is not None and not remaining:
+				if self.log: self.log.debug('Found every key, parsing stopped early')
+				# Attach any containers left open.
+				while parentQueue:
+					currentNode.parent.children[parentQueue.pop()[0]] = currentNode.children
+					currentNode = currentNode.parent
+				break
+
 		assert currentNode.parent is None, ('Parent is not None, did not make it back up the tree')
 		return root.children
 
@@ -170,6 +323,69 @@ class ParserTests(unittest.TestCase):
 	def setUp(self):
 		pass
 
+	def test_keys(self):
+		"""Only the requested keys are parsed"""
+		import cStringIO as StringIO
+		
+		label = "\r\n".join(("RECORD_BYTES = 10",
+			"GROUP = MODEL", "  A = 1", "  OBJECT = NESTED", "    IMAGE = 2", "  END_OBJECT = NESTED", "END_GROUP = MODEL",
+			"OBJECT = IMAGE", "  LINES = 3", "  OBJECT = PART", "    B = 4", "  END_OBJECT", "END_OBJECT = IMAGE",
+			"^IMAGE = 5", "END"))
+		pdsParser = Parser()
+		labels = pdsParser.parse(StringIO.StringIO(label), keys=['RECORD_BYTES', 'IMAGE/LINES'])
+		self.assertEqual({'RECORD_BYTES': '10', 'IMAGE': {'LINES': '3'}}, labels)
+		labels = pdsParser.parse(StringIO.StringIO(label), keys=['IMAGE', '^IMAGE'])
+		self.assertEqual({'IMAGE': {'LINES': '3', 'PART': {'B': '4'}}, '^IMAGE': '5'}, labels)
+		labels = pdsParser.parse(StringIO.StringIO(label), keys=['MISSING'])
+		self.assertEqual({}, labels)
+
+	def test_cache(self):
+		"""Cached labels are returned as each parser returns them, whichever parser cached them"""
+		import tempfile
+
+		from cache import MemoryCache
+		from labels import CompactLabels
+
+		product = tempfile.NamedTemporaryFile(suffix=".lbl")
+		product.write("\r\n".join(("RECORD_BYTES = 10", "OBJECT = IMAGE", "  LINES = 3", "END_OBJECT", "END", "")))
+		product.flush()
+		cache = MemoryCache()
+		for compactFirst in (True, False):
+			cache.clear()
+			parsers = [Parser(cache=cache, compact=True), Parser(cache=cache)]
+			if not compactFirst:
+				parsers.reverse()
+			for pdsParser in parsers:
+				labels = pdsParser.parse(open(product.name, "rb"))
+				self.assertEqual(pdsParser.compact, isinstance(labels, CompactLabels))
+				self.assertEqual('3', labels['IMAGE']['LINES'])
+		self.assertEqual(2, cache.hits)
+		# A filename is parsed as the file it names, and labels which are empty are not cached.
+		self.assertEqual('3', Parser(cache=cache).parse(product.name)['IMAGE']['LINES'])
+		empty = tempfile.NamedTemporaryFile(suffix=".lbl")
+		empty.write("Not a label\r\n")
+		empty.flush()
+		self.assertEqual({}, Parser(cache=cache).parse(empty.name))
+		self.assertEqual(None, cache.get(file_identity(empty.name)))
+
+	def test_events(self):
+		"""Labels are streamed as events, which may be stopped early"""
+		import cStringIO as StringIO
+		
+		label = "\r\n".join(("RECORD_BYTES = 10", "OBJECT = IMAGE", "  LINES = 3", "END_OBJECT", "^IMAGE = 5", "END"))
+		pdsParser = Parser()
+		events = list(pdsParser.events(StringIO.StringIO(label)))
+		self.assertEqual([(RECORD, 'RECORD_BYTES', '10'), (START_CONTAINER, 'OBJECT', 'IMAGE'), (RECORD, 'LINES', '3'),
+			(END_CONTAINER, 'END_OBJECT', 'IMAGE'), (RECORD, '^IMAGE', '5')], events)
+		
+		class LinesHandler(ContentHandler):
+			def record(self, key, value):
+				self.lines = value
+				return key == 'LINES'
+		handler = LinesHandler()
+		pdsParser.dispatch(StringIO.StringIO(label), handler)
+		self.assertEqual('3', handler.lines)
+
 	def test_no_exceptions(self):
 		"""Check that all test files are parsed without any Exception"""
 		import os
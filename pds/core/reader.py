@@ -16,11 +16,72 @@ Copyright (c) 2009 Ryan Matthew Balfanz. All rights reserved.
 from __future__ import with_statement
 
 import logging
+import mmap
 import re
 import sys
 import unittest
 
+try:
+	import cStringIO as StringIO
+except ImportError:
+	import StringIO
+
 #from common import open_pds
+from common import mapped_header_size, read_pds_header
+
+# Tokens which change the state of the tokenizer.
+_SPECIAL = re.compile(r'"|/\*|[(){}]')
+_CONTAINERS_END = ("END_OBJECT", "END_GROUP")
+
+# A whole statement of a label held in a memory map: a comment, the end of the label,
+# the bare end of a container or a record whose value may span lines.
+_MAPPED_VALUE_ITEMS = r"""(?:
+	[^\r\n"(){}/]+
+	| "[^"]*"
+	| \((?:/\*.*?\*/|[^()"]|"[^"]*"|\((?:/\*.*?\*/|[^()"]|"[^"]*")*\))*\)
+	| \{(?:/\*.*?\*/|[^{}"]|"[^"]*")*\}
+	| /\*.*?\*/
+	| /(?!\*)
+	)*"""
+_MAPPED_STATEMENT = re.compile(r"""
+	^[ \t]*(?:
+		(?P<key>[A-Za-z0-9_^:]+)[ \t]*=(?P<value>%(items)s
+			(?:\r?\n(?![ \t]*(?:[A-Za-z0-9_^:]+[ \t]*=|END(?:_OBJECT|_GROUP)?[ \t]*\r?$))%(items)s)*)
+		| (?P<close>END_OBJECT|END_GROUP)[ \t]*\r?$
+		| (?P<end>END)[ \t]*\r?$
+		)
+	| /\*.*?\*/
+	""" % {"items": _MAPPED_VALUE_ITEMS}, re.M | re.S | re.X)
+
+
+def _depth_change(text):
+	"""Return the change in ()/{} nesting depth over *text*."""
+	if "(" in text or "{" in text or ")" in text or "}" in text:
+		return text.count("(") + text.count("{") - text.count(")") - text.count("}")
+	return 0
+
+def _strip_comments(text, inComment):
+	"""Remove the comments from *text*, which contains no quotes.
+	
+	Return the remaining text and whether a comment is left open at its end.
+	"""
+	remaining = []
+	while True:
+		if inComment:
+			commentEnd = text.find("*/")
+			if commentEnd < 0:
+				break
+			text = text[commentEnd + 2:]
+			inComment = False
+		commentStart = text.find("/*")
+		if commentStart < 0:
+			remaining.append(text)
+			break
+		remaining.append(text[:commentStart])
+		remaining.append(" ")
+		text = text[commentStart + 2:]
+		inComment = True
+	return "".join(remaining), inComment
 
 
 class Reader(object):
@@ -57,11 +118,16 @@ class Reader(object):
 	>>> # Using a list comprehension to consume and store all records
 	>>> records = [record for record in pdsreader.read(open('pdsFile.lbl', 'rb')]
 	>>> process(records)
+	
+	When *headerOnly* is set, only the attached label is read from each source
+	(see ``common.read_pds_header``) rather than iterating the source line-by-line.
+	The cost of reading then scales with the size of the label, not that of the product.
 	"""
 
-	def __init__(self, log=None):
+	def __init__(self, log=None, headerOnly=False):
 		super(Reader, self).__init__()
 		
+		self.headerOnly = headerOnly
 		self.log = log
 		if log:
 			self._init_logging()		
@@ -97,82 +163,181 @@ class Reader(object):
 		"""Return the next record.
 		
 		This method is a generator i.e. it yields values and preserves state.
-		Keep in mind that this method reads the entire file contents at once the first time it is called.
-		Additionally, after the file has been read, all comments and blank lines are stripped.
-		This preprocessing occurs before any result is returned.
-		After the first yield, subsequent calls may be markedly faster due to its generator nature.
+		The source is tokenized in a single pass, one line at a time, and each record
+		is yielded as soon as the line starting the following record (or END) is seen.
+		Only the pieces of the record being assembled are held in memory.
+		
+		Comments, including those spanning several lines, are discarded.
+		Quoted strings and ()/{} sequences may span several lines, a '=' or '/*' within them is not special.
+		As before, runs of whitespace within a value are collapsed to a single space.
+		A container closed without repeating its name (a bare END_OBJECT or END_GROUP)
+		is yielded with an empty value.
 		"""
-		if self.log: self.log.debug("Reading '%s'" % (source.name))
-		# File Preprocessing
-		# ==================
-		# Read file contents to a string.
-		# Break into lines by splitting on PDS-style newlines.
-		# Then split stripped lines on spaces.
-		#splitLines = [x.strip().split(' ') for x in source.read().split('\r\n')]
-		#for i, line in enumerate(splitLines):
-		#	if '/*' not in line:
-		#		errorMessage = "Multi-line comments are not supported.\nAlso, check for spaces around '/*' and '*/'."
-		#		assert '*/' not in line, errorMessage
-		#		[tokens.append(t) for t in line if t]
-		#	else:
-		#		errorMessage = 'Comment appears invalid.'
-		#		assert (line[0][0:2] == '/*') and (line[-1][len(line[-1])-2:] == '*/'), errorMessage
-		#	if 'END' in line:
-		#		errorMessage = "Found garbage near 'END' token."
-		#		assert len(line) == 1, errorMessage
-		#		break
+		if self.log: self.log.debug("Reading '%s'" % (getattr(source, "name", source)))
+		if isinstance(source, mmap.mmap):
+			for record in self._read_mapped(source):
+				yield record
+			return
+		if self.headerOnly:
+			source = StringIO.StringIO(read_pds_header(source))
+
+		recordCount = 0
+		key = None
+		# A complete value on a single line is kept as a *plain* string, otherwise its pieces are gathered.
+		plain = None
+		value = []
+		depth = 0
+		inQuote = False
+		inComment = False
+		for line in source:
+			if not (depth or inQuote or inComment):
+				# We are between records, so this line may start a new one.
+				keyPart, equals, rest = line.partition("=")
+				keyTokens = equals and keyPart.split()
+				if keyTokens and len(keyTokens) == 1 and "/*" not in keyPart:
+					if key is not None:
+						recordCount += 1
+						yield key, plain or " ".join("".join(value).split())
+					key = keyTokens[0]
+					plain = None
+					# The common case is a whole record on a single line.
+					code = rest
+					if '"' in rest:
+						segments = rest.split('"')
+						complete = len(segments) % 2
+						if complete and ("(" in rest or "{" in rest):
+							# Only brackets outside of quoted strings count.
+							code = "".join(segments[0::2])
+					else:
+						if "/*" in rest:
+							code, openComment = _strip_comments(rest, False)
+							if not openComment:
+								rest = code
+						complete = True
+					if complete and ("(" in code or "{" in code):
+						complete = code.count("(") == code.count(")") and code.count("{") == code.count("}")
+					if complete and "/*" not in rest:
+						plain = rest.strip()
+						if "  " in plain or "\t" in plain or "\n" in plain:
+							plain = " ".join(plain.split())
+						if plain:
+							continue
+					value = []
+					line = rest
+				else:
+					stripped = line.strip()
+					if stripped == "END":
+						break
+					elif stripped in _CONTAINERS_END:
+						if key is not None:
+							recordCount += 1
+							yield key, plain or " ".join("".join(value).split())
+						recordCount += 1
+						yield stripped, ""
+						key = None
+						continue
+					elif key is None:
+						# Anything preceding the first record is discarded.
+						continue
+			if plain:
+				# A plain value continued on the following line.
+				value = [plain, " "]
+				plain = None
+
+			# The line now holds nothing but (a part of) the value of the current record.
+			if inComment or "/*" in line:
+				if inQuote or '"' in line:
+					line, inQuote, inComment, depth = self._scan(line, inQuote, inComment, depth)
+					value.append(line)
+					continue
+				line, inComment = _strip_comments(line, inComment)
+			if '"' in line:
+				segments = line.split('"')
+				# Only the segments outside of quoted strings may open or close a sequence.
+				for segment in segments[inQuote and 1 or 0::2]:
+					depth += _depth_change(segment)
+				if len(segments) % 2 == 0:
+					inQuote = not inQuote
+			elif not inQuote:
+				depth += _depth_change(line)
+			if depth < 0:
+				depth = 0
+			value.append(line)
+
+		if key is not None:
+			recordCount += 1
+			yield key, plain or " ".join("".join(value).split())
+		if inQuote or inComment or depth:
+			if self.log: self.log.warn("Reached the end of the header within a quoted string, comment or sequence")
+		if self.log: self.log.info('Found %d key, value pairs' % (recordCount))
+
+	def _read_mapped(self, buf):
+		"""Tokenize the label held in the memory map *buf* in place.
 		
-		# Explicitly create an iterator with a sentinal for more control
-		# Using an iterator produces a bug which causes execution to hang when reading files with "\n" style newlines
-		# Scratch that, it looks like the bug appeared while reading a .DS_Store file -- i.e. breaks if sentinal DNE.
-		#if source.mode in ("U", "rU"):
-		#	it = iter(source.readline, "END\n")
-		#elif source.mode in ("r", "rb"):
-		#	it = iter(source.readline, "END\r\n")
-		#else:
-		#	if self.log: self.log.error("Unrecognized file mode '%s'" % source.mode)
-		commentStart = re.compile(r"/\*")
-		commentEnd = re.compile(r"\*/")
-
-		if self.log: self.log.debug('Tonekization')
-		tokens = []
-		for i, line in enumerate(source):
-		#for i, line in enumerate(it):
-			line = line.strip()
-			if not line:
-				continue
-			elif commentStart.match(line):
-				if not commentEnd.search(line):
-					if self.log: self.log.warn("Detected possible multiline comment near line %d" % i)
-			elif line == r"END":
-				# We only really need this check if not using a sentinal.
-				# But its not going to hurt anyone being around anyway.
+		Each statement is matched directly against the map, only bounded by the extent of the label,
+		so the only strings built are the keys and values which are yielded.
+		"""
+		recordCount = 0
+		for statement in _MAPPED_STATEMENT.finditer(buf, 0, mapped_header_size(buf)):
+			end, close, key, value = statement.group("end", "close", "key", "value")
+			if key is not None:
+				if "/*" in value:
+					value = self._scan(value, False, False, 0)[0]
+				value = value.strip()
+				if "  " in value or "\n" in value or "\t" in value:
+					value = " ".join(value.split())
+				recordCount += 1
+				yield key, value
+			elif close is not None:
+				recordCount += 1
+				yield close, ""
+			elif end is not None:
 				break
+		if self.log: self.log.info('Found %d key, value pairs' % (recordCount))
+
+	def _scan(self, line, inQuote, inComment, depth):
+		"""Scan *line* character by character, used for lines mixing quotes and comments.
+		
+		Return the line stripped of comments and the new (inQuote, inComment, depth) state.
+		"""
+		text = []
+		pos = 0
+		end = len(line)
+		while pos < end:
+			if inComment:
+				commentEnd = line.find("*/", pos)
+				if commentEnd < 0:
+					break
+				inComment = False
+				pos = commentEnd + 2
+			elif inQuote:
+				quoteEnd = line.find('"', pos)
+				if quoteEnd < 0:
+					text.append(line[pos:])
+					break
+				text.append(line[pos:quoteEnd + 1])
+				inQuote = False
+				pos = quoteEnd + 1
 			else:
-				[tokens.append(token) for token in line.split() if token]
-			
-		# Locate each record by indentifying the index of each record denoting token.
-		magicRecordFindingToken = '='
-		recordIndicies = [i for i, t in enumerate(tokens) if t == magicRecordFindingToken]
-		#recordIndicies = (i for i, t in enumerate(tokens) if t == magicRecordFindingToken)
-		if self.log: self.log.info('Found %d possible key, value pairs' % (len(recordIndicies)))
-
-		# Assemble each record from its key and value pair.
-		for i, recIndx in enumerate(recordIndicies):
-			keyIndex = recIndx - 1
-			dataStartIndex = recIndx + 1
-			try:
-				dataEndIndex = recordIndicies[i + 1] - 1
-			except IndexError, e:
-				errorMessage = 'i: %d, Number of tokens: %d' % (i, len(tokens))
-				assert i == (len(recordIndicies) - 1), errorMessage
-				dataEndIndex = len(tokens) - 1
-			finally:
-				if dataStartIndex == dataEndIndex:
-					yield tokens[keyIndex], ' '.join(tokens[dataStartIndex:])
-				yield tokens[keyIndex], ' '.join(tokens[dataStartIndex:dataEndIndex])
-		#yield None
-		#raise StopIteration
+				special = _SPECIAL.search(line, pos)
+				if not special:
+					text.append(line[pos:])
+					break
+				token = special.group()
+				text.append(line[pos:special.start()])
+				pos = special.end()
+				if token == "/*":
+					inComment = True
+					text.append(" ")
+					continue
+				text.append(token)
+				if token == '"':
+					inQuote = True
+				elif token in "({":
+					depth += 1
+				else:
+					depth = max(depth - 1, 0)
+		return "".join(text), inQuote, inComment, depth
 
 	#@property
 	#def reader(self):
@@ -187,7 +352,78 @@ class Reader(object):
 class ReaderTests(unittest.TestCase):
 	"""Unit tests for class Reader"""
 	def setUp(self):
-		pass
+		label = "\r\n".join(("PDS_VERSION_ID = PDS3",
+			"RECORD_TYPE = FIXED_LENGTH",
+			"RECORD_BYTES = 64",
+			"LABEL_RECORDS = 4",
+			"^IMAGE = 5",
+			"OBJECT = IMAGE",
+			"  LINES = 2",
+			"  LINE_SAMPLES = 64",
+			"END_OBJECT = IMAGE",
+			"END", ""))
+		self.product = label.ljust(4 * 64) + "\x00\r\nEND\r\n" * 16
+
+	def test_tokenizer(self):
+		"""Comments, quoted strings and sequences may span lines"""
+		label = "\r\n".join(("/* A comment = not a record",
+			"   spanning two lines */",
+			'NOTE = "A quoted value /* not a comment */',
+			'  on two  lines"',
+			"MODEL_TYPE = CAHVOR /* inline comment */",
+			'UNITS = {"METER", "N/A",',
+			'  "PIXEL"}',
+			"OBJECT = IMAGE",
+			"  LINES=2",
+			"END_OBJECT",
+			"END", ""))
+		records = list(Reader().read(StringIO.StringIO(label)))
+		self.assertEqual([("NOTE", '"A quoted value /* not a comment */ on two lines"'),
+			("MODEL_TYPE", "CAHVOR"),
+			("UNITS", '{"METER", "N/A", "PIXEL"}'),
+			("OBJECT", "IMAGE"),
+			("LINES", "2"),
+			("END_OBJECT", "")], records)
+
+	def test_mapped(self):
+		"""Scanning a memory map in place yields the same records"""
+		import tempfile
+
+		from common import map_pds
+
+		product = tempfile.TemporaryFile()
+		product.write(self.product)
+		product.seek(0)
+		records = list(Reader().read(StringIO.StringIO(self.product)))
+		self.assertEqual(records, list(Reader().read(map_pds(product))))
+		# Unquoted values continued on the next line, of either line ending.
+		for newline in ("\r\n", "\n"):
+			label = newline.join(("PDS_VERSION_ID = PDS3", "C = 1 2", "  3", "D = (4,", "  5)", "E = 6", "END", ""))
+			product = tempfile.TemporaryFile()
+			product.write(label.ljust(256))
+			product.seek(0)
+			records = list(Reader().read(StringIO.StringIO(label)))
+			self.assertEqual(("C", "1 2 3"), records[1])
+			self.assertEqual(records, list(Reader().read(map_pds(product))))
+
+	def test_header_only(self):
+		"""Reading only the header yields the same records"""
+		records = list(Reader().read(StringIO.StringIO(self.product)))
+		headerRecords = list(Reader(headerOnly=True).read(StringIO.StringIO(self.product)))
+		self.assertEqual(records, headerRecords)
+		self.assertEqual(4 * 64, len(read_pds_header(StringIO.StringIO(self.product))))
+		# A block too small to hold LABEL_RECORDS falls back to searching for END.
+		self.assertTrue(read_pds_header(StringIO.StringIO(self.product), blockSize=16).endswith("\r\nEND\r"))
+		# A file which is named is closed once read, one which is handed over is left open.
+		import tempfile
+
+		product = tempfile.NamedTemporaryFile()
+		product.write(self.product)
+		product.flush()
+		self.assertEqual(4 * 64, len(read_pds_header(product.name)))
+		with open(product.name, "rb") as f:
+			read_pds_header(f)
+			self.assertFalse(f.closed)
 
 	def test_no_exceptions(self):
 		"""Check that all test files are read without any Exception"""
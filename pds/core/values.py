@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+values.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import array
+import datetime
+import re
+import unittest
+
+from collections import namedtuple
+
+
+# A value accompanied by its units, e.g. 2048 <BYTES>.
+Quantity = namedtuple('Quantity', 'value units')
+
+# Numeric sequences of at least this many items are decoded as arrays.
+ARRAY_THRESHOLD = 16
+
+_INTEGER = re.compile(r"[+-]?\d+$")
+_BASED_INTEGER = re.compile(r"([+-]?)(\d+)#([0-9A-Fa-f]+)#$")
+_REAL = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?$")
+_UNITS = re.compile(r"(.*?)\s*<([^<>]*)>$")
+_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?:T(\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6})\d*)?)?)?Z?$")
+_DAY_OF_YEAR = re.compile(r"(\d{4})-(\d{3})(?:T(\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6})\d*)?)?)?Z?$")
+
+
+def decode(value):
+	"""Return the label *value* converted to a Python type, as per its PDS value type.
+
+	The PDS value types are decoded as
+		* integers, including based integers such as 16#FF#, as int,
+		* reals as float,
+		* values followed by <units> as a Quantity,
+		* quoted strings and symbols as str, without their quotes,
+		* dates and times as datetime.date or datetime.datetime,
+		* sequences as tuples, or as an array.array for long numeric sequences,
+		* sets as frozensets.
+
+	Anything else, such as an identifier or a value which is already decoded, is returned as it is.
+	"""
+	if not value or not isinstance(value, basestring):
+		return value
+	first = value[0]
+	if first == '"' or first == "'":
+		if value[-1] == first:
+			return value[1:-1]
+		return value
+	if value[-1] == '>':
+		match = _UNITS.match(value)
+		if match and match.group(1):
+			return Quantity(decode(match.group(1)), match.group(2))
+		return value
+	if first == '(':
+		if value[-1] == ')':
+			return _decode_sequence(value[1:-1])
+		return value
+	if first == '{':
+		if value[-1] == '}':
+			return frozenset(decode(item) for item in _split_items(value[1:-1]))
+		return value
+	if first.isdigit() or first in "+-.":
+		return _decode_number(value)
+	return value
+
+def _decode_number(value):
+	"""Return the numeric, or date, *value* decoded. Otherwise, return it as it is."""
+	if _INTEGER.match(value):
+		return int(value)
+	if _REAL.match(value):
+		return float(value)
+	match = _BASED_INTEGER.match(value)
+	if match:
+		sign, base, digits = match.groups()
+		try:
+			return int(sign + digits, int(base))
+		except ValueError:
+			return value
+	match = _DATE.match(value)
+	try:
+		if match:
+			year, month, day, hour, minute, second, fraction = match.groups()
+			if hour is None:
+				return datetime.date(int(year), int(month), int(day))
+			return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute),
+				int(second or 0), int((fraction or '0').ljust(6, '0')))
+		match = _DAY_OF_YEAR.match(value)
+		if match:
+			year, dayOfYear, hour, minute, second, fraction = match.groups()
+			date = datetime.datetime(int(year), 1, 1) + datetime.timedelta(days=int(dayOfYear) - 1)
+			if date.year != int(year):
+				return value
+			if hour is None:
+				return date.date()
+			return date.replace(hour=int(hour), minute=int(minute), second=int(second or 0),
+				microsecond=int((fraction or '0').ljust(6, '0')))
+	except ValueError:
+		pass
+	return value
+
+def _decode_sequence(body):
+	"""Return the items of a sequence as a tuple, or as an array when it is long and numeric."""
+	items = [decode(item) for item in _split_items(body)]
+	if len(items) >= ARRAY_THRESHOLD:
+		types = set(type(item) for item in items)
+		try:
+			if types == set([int]):
+				return array.array('l', items)
+			if types <= set([int, float]):
+				return array.array('d', items)
+		except OverflowError:
+			pass
+	return tuple(items)
+
+def _split_items(body):
+	"""Return the comma separated items of a sequence or set, leaving nested ones and quoted strings whole."""
+	if not body.strip():
+		return []
+	if '"' not in body and "'" not in body and '(' not in body and '{' not in body:
+		return [item.strip() for item in body.split(',')]
+	items = []
+	depth = 0
+	quote = None
+	start = 0
+	for i, c in enumerate(body):
+		if quote:
+			if c == quote:
+				quote = None
+		elif c == '"' or c == "'":
+			quote = c
+		elif c == '(' or c == '{':
+			depth += 1
+		elif c == ')' or c == '}':
+			depth -= 1
+		elif c == ',' and not depth:
+			items.append(body[start:i].strip())
+			start = i + 1
+	items.append(body[start:].strip())
+	return items
+
+
+class DecodeTests(unittest.TestCase):
+	"""Unit tests for function decode"""
+	def test_scalars(self):
+		"""Scalar values are decoded by their type"""
+		self.assertEqual(1024, decode('1024'))
+		self.assertEqual(-5, decode('-5'))
+		self.assertEqual(4095, decode('2#0000111111111111#'))
+		self.assertEqual(255, decode('16#FF#'))
+		self.assertEqual(-0.0522, decode('-5.22e-02'))
+		self.assertEqual(0.5, decode('.5'))
+		self.assertEqual('MARS EXPLORATION ROVER', decode('"MARS EXPLORATION ROVER"'))
+		self.assertEqual('N/A', decode("'N/A'"))
+		self.assertEqual('MSB_INTEGER', decode('MSB_INTEGER'))
+		self.assertEqual(Quantity(2048, 'BYTES'), decode('2048 <BYTES>'))
+		self.assertEqual('', decode(''))
+		self.assertEqual(1024, decode(1024))
+
+	def test_dates(self):
+		"""Dates and times are decoded, day of year included"""
+		self.assertEqual(datetime.date(2004, 1, 5), decode('2004-01-05'))
+		self.assertEqual(datetime.datetime(2004, 1, 5, 12, 1, 2, 123000), decode('2004-01-05T12:01:02.123Z'))
+		self.assertEqual(datetime.datetime(2004, 2, 1, 12, 1), decode('2004-032T12:01'))
+		self.assertEqual('2004-13-05', decode('2004-13-05'))
+
+	def test_sequences(self):
+		"""Sequences and sets are decoded, long numeric sequences as arrays"""
+		self.assertEqual((1.03, -0.0522, 0.721), decode('(1.03e+00, -5.22e-02, 7.21e-01)'))
+		self.assertEqual(((1, 2), ('a, b', 3)), decode('((1, 2), ("a, b", 3))'))
+		self.assertEqual(frozenset(['METER', 'N/A']), decode('{"METER", "N/A"}'))
+		self.assertEqual((Quantity(1.0, 'm'), Quantity(2, 'm')), decode('(1.0 <m>, 2 <m>)'))
+		values = decode('(%s)' % ', '.join(str(i) for i in range(ARRAY_THRESHOLD)))
+		self.assertEqual(array.array('l', range(ARRAY_THRESHOLD)), values)
+		values = decode('(%s, 0.5)' % ', '.join(str(i) for i in range(ARRAY_THRESHOLD)))
+		self.assertEqual('d', values.typecode)
+		self.assertEqual((), decode('()'))
+
+
+if __name__ == '__main__':
+	unittest.main()
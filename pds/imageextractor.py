@@ -9,35 +9,51 @@ Created by Ryan Matthew Balfanz on 2009-05-28.
 Copyright (c) 2009 Ryan Matthew Balfanz. All rights reserved.
 """
 
+from __future__ import with_statement
+
+import Queue
 import hashlib
-import logging
 import os
-import sys
+import threading
 import unittest
 
 try:
 	import Image
+	import ImageMath
 except ImportError:
 	from PIL import Image
+	from PIL import ImageMath
 
-import ImageMath
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
-from core.common import open_pds
+from core.cache import sizeof
+from core.common import file_identity, open_pds
+from core.datatypes import DataTypeError, data_type, pil_mode
 from core.parser import Parser
-from core.extractorbase import ExtractorBase, ExtractorError
+from core.values import Quantity, decode
+from core.extractorbase import ExtractorBase, ExtractorError, register
+
+# Image data is read, and its checksum computed, in chunks of this many bytes.
+CHECKSUM_CHUNK_BYTES = 1024 * 1024
+
+# The ways in which the checksum of an image may be verified, see ``ImageExtractor``.
+CHECKSUM_MODES = ('inline', 'lazy', 'background', 'skip')
 
 
 class ImageExtractorError(ExtractorError):
 	"""Base class for exceptions in this module."""
 
 	def __init__(self, *args, **kwargs):
-		super(ExtractorError, self).__init__(*args, **kwargs)
+		super(ImageExtractorError, self).__init__(*args, **kwargs)
 
 
-class ImageNotSupportedError(object):
-	"""docstring for ImageNotSupportedError"""
-	def __init__(self):
-		super(ImageNotSupportedError, self).__init__()
+class ImageNotSupportedError(ImageExtractorError):
+	"""Error raised when an image, or its layout, is not supported."""
+	def __init__(self, *args, **kwargs):
+		super(ImageNotSupportedError, self).__init__(*args, **kwargs)
 
 
 class ChecksumError(ImageExtractorError):
@@ -52,13 +68,17 @@ class ImageExtractor(ExtractorBase):
 
 	Returned images are instances of the Python Imaging Library Image class.
 	As such, this module depends on PIL.
+	Images may also be extracted as NumPy arrays, see ``extract_array``, where NumPy is available.
 
 	An attached image may be extracted from by
 	determining its location within the file and identifying its size.
 	Not all PDS images are supported at this time.
 
 	Currently this module only supports FIXED_LENGTH as the RECORD_TYPE,
-	8 as the SAMPLE_BITS and either UNSIGNED_INTEGER or MSB_UNSIGNED_INTEGER as the SAMPLE_TYPE.
+	and signed or unsigned 8, 16 or 32 bit integers or 32 or 64 bit IEEE reals, of either byte order,
+	as the SAMPLE_TYPE and SAMPLE_BITS, see ``datatypes.data_type``.
+	Images keep the depth of their samples, 8 bit images are 'L', deeper integers 'I' and reals 'F',
+	see ``stretch.stretch``, or ``scale_to_8_bits``, for display.
 	Attempts to extract an image that is not supported will result in None being returned.
 
 	Simple Example Usage
@@ -71,11 +91,39 @@ class ImageExtractor(ExtractorBase):
 	>>> 	img.save('extractedImage.jpg')
 	>>> else:
 	>>> 	print "The image was not supported."
+
+	Unless *fullLabels* is set, only the labels needed to extract the image are parsed and returned,
+	see ``Parser.parse``.
+
+	A *cache* is handed to the Parser used for the labels, see ``Parser``.
+	An in-process ``cache.MemoryCache`` also holds on to the extracted images, a copy of each once it is first loaded,
+	each later extraction from the unchanged file returns a copy without reading it.
+
+	The MD5_CHECKSUM of an image, where it has one, is verified as per *checksumMode*:
+		* 'inline', each chunk of the image data is hashed as it is read, or mapped,
+		* 'background', the chunks are hashed by a thread of their own while the image is read, decoded and handed back,
+		* 'lazy', the image data is hashed as the pixels of the image are first accessed,
+		* 'skip', the checksum is not verified.
+	Whatever the mode, a ChecksumError is raised before the pixels of an image which fails verification may be used.
+	'background' and 'lazy' raise it from the first access to them (e.g. getdata or save) rather than from ``extract``.
+	Arrays can not tell when they are accessed, ``extract_array`` verifies them before they are returned.
 	"""
 
-	def __init__(self, log=None, raisesChecksumError=True, raisesImageNotSupportedError=True):
+	# The labels which are needed to extract an image.
+	IMAGE_KEYS = ('RECORD_TYPE', 'RECORD_BYTES', '^IMAGE', 'IMAGE')
+
+	POINTERS = ('IMAGE',)
+
+	def __init__(self, log=None, raisesChecksumError=True, raisesImageNotSupportedError=True, cache=None, fullLabels=True,
+			checksumMode='inline'):
 		super(ImageExtractor, self).__init__()
 
+		if checksumMode not in CHECKSUM_MODES:
+			raise ValueError("checksumMode must be one of %s, not '%s'" % (", ".join(CHECKSUM_MODES), checksumMode))
+		self.checksumMode = checksumMode
+		self._parser = Parser(cache=cache)
+		self.cache = cache
+		self.fullLabels = fullLabels
 		self.log = log
 		self.raisesChecksumError = raisesChecksumError
 		self.raisesImageNotSupportedError = raisesImageNotSupportedError
@@ -90,78 +138,58 @@ class ImageExtractor(ExtractorBase):
 
 		# self.verifySecureHash = True
 
-	def _init_logging(self):
-		"""Initialize logging."""
-		# Set the message format.
-		format = logging.Formatter("%(levelname)s:%(name)s:%(asctime)s:%(message)s")
-
-		# Create the message handler.
-		stderr_hand = logging.StreamHandler(sys.stderr)
-		stderr_hand.setLevel(logging.DEBUG)
-		stderr_hand.setFormatter(format)
-
-		# Create a handler for routing to a file.
-		logfile_hand = logging.FileHandler(self.log + '.log')
-		logfile_hand.setLevel(logging.DEBUG)
-		logfile_hand.setFormatter(format)
-
-		# Create a top-level logger.
-		self.log = logging.getLogger(self.log)
-		self.log.setLevel(logging.DEBUG)
-		self.log.addHandler(logfile_hand)
-		self.log.addHandler(stderr_hand)
-
-		self.log.debug('Initializing logger')
-
 	def extract(self, source):
 		"""Extract an image from *source*.
 
 		If the image is supported an instance of PIL's Image is returned, otherwise None.
+		
+		Where possible the source is memory mapped, see ``common.map_pds``.
+		The labels are then scanned in place and the image shares the mapped pages rather than a copy of them.
+		Such a map is closed once the image (and any other reference to it) has been garbage collected.
 		"""
-		p = Parser()
-		f = open_pds(source)
-		if self.log: self.log.debug("Parsing '%s'" % (source))
-		self.labels = p.parse(f)
-		if self.log: self.log.debug("Found %d labels" % (len(self.labels)))
-		if self._check_image_is_supported():
+		identity = None
+		if "image" in getattr(self.cache, "KINDS", ()):
+			identity = file_identity(source)
+			cached = self.cache.get(identity, kind="image")
+			if cached is not None:
+				if self.log: self.log.debug("Found cached image for '%s'" % (identity[0]))
+				img, self.labels = cached
+				if hasattr(source, "read"):
+					source.close()
+				return img.copy(), self.labels
+		f, mapped = self._open(source, self.IMAGE_KEYS)
+		if self._check_image_is_supported() and self._check_image_bands_are_supported():
 			if self.log: self.log.debug("Image in '%s' is supported" % (source))
 			dim = self._get_image_dimensions()
 			loc = self._get_image_location()
-			imageSampleBits = int(self.labels['IMAGE']['SAMPLE_BITS'])
-			imageSampleType = self.labels['IMAGE']['SAMPLE_TYPE']
-			md5Checksum = self._get_image_checksum()
+			mode, rawMode = pil_mode(self._get_image_type_string())
 			if self.log: self.log.debug("Image dimensions should be %s" % (str(dim)))
-			if self.log: self.log.debug("Seeking to image data at %d" % (loc))
-			f.seek(loc)
-			if imageSampleBits == 8:
-				readSize = dim[0] * dim[1]
-			elif imageSampleBits == 16:
-				readSize = dim[0] * dim[1] * 2
-			print readSize
-			if self.log: self.log.debug("Seek successful, reading data (%s)" % (readSize))
-			# rawImageData = f.readline()
-			# f.seek(-int(self.labels["RECORD_BYTES"]), os.SEEK_CUR)
-			rawImageData = f.read(readSize)
-			if md5Checksum:
-				rawImageChecksum = hashlib.md5(rawImageData).hexdigest()
-				checksumVerificationPassed = rawImageChecksum == md5Checksum and True or False
-				if not checksumVerificationPassed:
-					if self.log: self.log.debug("Secure hash verification failed")
-					if self.raisesChecksumError:
-						errorMessage = "Verification failed! Expected '%s' but got '%s'." % (md5Checksum, rawImageChecksum)
-						raise ChecksumError, errorMessage
-				else:
-					if self.log: self.log.debug("Secure hash verification passed")
+			# Every band is read, as the checksum covers them all, but only the first is decoded.
+			readSize = self._get_image_size()
+			rawImageData, verify = self._read_image_data(f, mapped, loc, readSize)
 			if self.log: self.log.debug("Read successful (len: %d), creating Image object" % (len(rawImageData)))
 			# The frombuffer defaults may change in a future release;
 			# for portability, change the call to read:
 			# frombuffer(mode, size, data, 'raw', mode, 0, 1).
-			if (imageSampleBits == 16) and imageSampleType == ('MSB_INTEGER'):
-				#img = Image.frombuffer('I', dim, rawImageData, 'raw', 'I;16BS', 0, 1)
-				img = Image.frombuffer('F', dim, rawImageData, 'raw', 'F;16B', 0, 1)
-				img = ImageMath.eval("convert(a/16.0, 'L')", a=img)
+			prefixBytes, suffixBytes = self._get_image_line_affixes()
+			if prefixBytes or suffixBytes:
+				# Step over the prefix and suffix of each line, the image can no longer share the data.
+				lineBytes = self._get_image_line_bytes()[1]
+				img = Image.new(mode, dim)
+				frombytes = getattr(img, 'frombytes', None) or img.fromstring
+				frombytes(str(buffer(rawImageData, prefixBytes)), 'raw', rawMode, lineBytes, 1)
 			else:
-				img = Image.frombuffer('L', dim, rawImageData, 'raw', 'L', 0, 1)
+				img = Image.frombuffer(mode, dim, rawImageData, 'raw', rawMode, 0, 1)
+			if self.checksumMode in ('lazy', 'background'):
+				before = verify
+			else:
+				verify()
+				before = None
+			after = None
+			if identity is not None:
+				after = self._cache_image(img, identity, self.labels)
+			if before or after:
+				_on_load(img, before, after)
 			if self.log:
 				self.log.debug("Image result: %s" % (str(img)))
 				self.log.debug("Image info: %s" % (str(img.info)))
@@ -170,49 +198,351 @@ class ImageExtractor(ExtractorBase):
 		else:
 			if self.log: self.log.error("Image is not supported '%s'" % (source))
 			img = None
-		f.close()
+		self._close(f, source, mapped)
 
 		return img, self.labels
 
+	def _cache_image(self, img, identity, labels):
+		"""Return a function which stores a copy of *img*, and its *labels*, in the cache.
+
+		It is called once the image is first loaded, so that extracting it is never what reads its pixels.
+		"""
+		def store():
+			# Keep a copy of our own, the image may still share the pages of the mapped file.
+			cachedImg = img.copy()
+			bytesPerPixel = cachedImg.mode in ("I", "F") and 4 or len(cachedImg.getbands())
+			nbytes = bytesPerPixel * cachedImg.size[0] * cachedImg.size[1] + sizeof(labels)
+			self.cache.set(identity, (cachedImg, labels), kind="image", nbytes=nbytes)
+		return store
+
+	def extract_array(self, source, bands=None, native=False):
+		"""Extract an image from *source* as a NumPy array.
+
+		If the image is supported the array is returned, otherwise None.
+		Its data type, byte order included, is given by SAMPLE_TYPE and SAMPLE_BITS, see ``_get_image_dtype``.
+		The array has the shape (LINES, LINE_SAMPLES), or (BANDS, LINES, LINE_SAMPLES) for an image of several bands,
+		whatever its BAND_STORAGE_TYPE, or when *bands* are given.
+
+		Where possible the source is memory mapped, as for ``extract``,
+		the array is then a read-only, strided view of the mapped file rather than a copy of the image.
+		PIL is not used.
+
+		Given *bands*, a list of band indices, only those bands are extracted and only their bytes are read.
+		As the checksum covers every band, it is then not verified.
+
+		Set *native* for an array in the native byte order of this machine.
+		Samples of the other byte order are then copied and swapped in a single pass, the array is no longer a view.
+		"""
+		if numpy is None:
+			raise ImageExtractorError("NumPy is required to extract an array")
+		f, mapped = self._open(source, self.IMAGE_KEYS)
+		if self._check_image_is_supported():
+			if self.log: self.log.debug("Image in '%s' is supported" % (source))
+			if bands is None:
+				dtype = self._get_image_dtype()
+				offset, shape, strides = self._get_image_layout()
+				loc = self._get_image_location()
+				rawImageData, verify = self._read_image_data(f, mapped, loc, self._get_image_size())
+				verify()
+				array = numpy.ndarray(shape, dtype, rawImageData, offset - loc, strides)
+			else:
+				array = self._extract_samples(f, mapped, bands)
+			if bands is None and self._get_image_bands()[0] == 1:
+				array = array[0]
+			if native and not array.dtype.isnative:
+				array = array.byteswap().view(array.dtype.newbyteorder())
+			if self.log: self.log.debug("Array shape: %s, dtype: %s" % (array.shape, array.dtype))
+		else:
+			if self.log: self.log.error("Image is not supported '%s'" % (source))
+			array = None
+		self._close(f, source, mapped)
+
+		return array, self.labels
+
+	def extract_window(self, source, rows, cols, bands=None):
+		"""Extract a window of the image in *source* as a NumPy array.
+
+		The window is given by the slices *rows*, of lines, and *cols*, of line samples,
+		e.g. extract_window(source, slice(1000, 1256), slice(300, 556)),
+		and optionally by *bands*, as for ``extract_array``.
+		If the image is supported the array is returned, otherwise None.
+
+		Only the bytes within the window are read.
+		Where the source is memory mapped the array is a strided view of the mapped file,
+		otherwise the lines spanned by the window are read.
+		As the checksum covers the whole image, it is not verified.
+		"""
+		if numpy is None:
+			raise ImageExtractorError("NumPy is required to extract an array")
+		f, mapped = self._open(source, self.IMAGE_KEYS)
+		if self._check_image_is_supported():
+			if self.log: self.log.debug("Image in '%s' is supported" % (source))
+			array = self._extract_samples(f, mapped, bands, rows, cols)
+			if bands is None and self._get_image_bands()[0] == 1:
+				array = array[0]
+		else:
+			if self.log: self.log.error("Image is not supported '%s'" % (source))
+			array = None
+		self._close(f, source, mapped)
+
+		return array, self.labels
+
+	def thumbnail(self, source, maxSize, box=False):
+		"""Extract a thumbnail of the image in *source*, of at most *maxSize* lines and line samples, as a NumPy array.
+
+		If the image is supported the array is returned, otherwise None.
+		The image is decimated by the smallest whole factor which fits it within *maxSize*,
+		only every such line, and of those every such sample, is read, see ``extract_window``.
+		Set *box* to average each run of samples within a line, rather than picking one.
+		The samples of the lines which are skipped are never read.
+		"""
+		if numpy is None:
+			raise ImageExtractorError("NumPy is required to extract an array")
+		f, mapped = self._open(source, self.IMAGE_KEYS)
+		if self._check_image_is_supported():
+			imageWidth, imageHeight = self._get_image_dimensions()
+			step = max(1, -(-imageWidth // maxSize), -(-imageHeight // maxSize))
+			if self.log: self.log.debug("Decimating by %d" % (step))
+			if box and step > 1 and imageWidth:
+				# A line narrower than the step is averaged whole.
+				boxSize = min(step, imageWidth)
+				lines = self._extract_samples(f, mapped, None, slice(None, None, step), slice(None, imageWidth // boxSize * boxSize))
+				# Sum the samples at each offset within the boxes, a strided view apiece.
+				total = lines[..., 0::boxSize].astype(lines.dtype.kind in 'iu' and 'i8' or 'f8')
+				for i in xrange(1, boxSize):
+					total += lines[..., i::boxSize]
+				if lines.dtype.kind in 'iu':
+					total += boxSize // 2
+					total //= boxSize
+				else:
+					total /= boxSize
+				array = total.astype(lines.dtype)
+			else:
+				array = self._extract_samples(f, mapped, None, slice(None, None, step), slice(None, None, step))
+			if self._get_image_bands()[0] == 1:
+				array = array[0]
+		else:
+			if self.log: self.log.error("Image is not supported '%s'" % (source))
+			array = None
+		self._close(f, source, mapped)
+
+		return array, self.labels
+
+	def extract_line_affixes(self, source):
+		"""Extract the line prefix and suffix bytes of the image in *source*, such as per-line engineering data.
+
+		If the image is supported a tuple of (prefixes, suffixes) is returned, otherwise None.
+		Each is a NumPy array of bytes of shape (LINES, LINE_PREFIX_BYTES or LINE_SUFFIX_BYTES),
+		or (BANDS, LINES, ...) when each band has lines of its own, or None when the lines have none.
+		As for ``extract_array`` these are views of the mapped file where possible.
+		"""
+		if numpy is None:
+			raise ImageExtractorError("NumPy is required to extract an array")
+		f, mapped = self._open(source, self.IMAGE_KEYS)
+		if self._check_image_is_supported():
+			offset, shape, strides = self._get_image_layout()
+			prefixBytes, suffixBytes = self._get_image_line_affixes()
+			lineBytes = self._get_image_line_bytes()[1]
+			imageBands, bandStorageType = self._get_image_bands()
+			if bandStorageType == 'SAMPLE_INTERLEAVED':
+				shape, strides = (1,) + shape[1:], (0,) + strides[1:]
+			shape, strides = shape[:2], strides[:2]
+			offset -= prefixBytes
+			affixes = []
+			for affixOffset, affixBytes in ((offset, prefixBytes), (offset + lineBytes - suffixBytes, suffixBytes)):
+				if affixBytes:
+					array = self._view(f, mapped, numpy.dtype('u1'), affixOffset, shape + (affixBytes,), strides + (1,))
+					if shape[0] == 1:
+						array = array[0]
+					affixes.append(array)
+				else:
+					affixes.append(None)
+			affixes = tuple(affixes)
+		else:
+			if self.log: self.log.error("Image is not supported '%s'" % (source))
+			affixes = None
+		self._close(f, source, mapped)
+
+		return affixes, self.labels
+
+	def _extract_samples(self, f, mapped, bands=None, rows=None, cols=None):
+		"""Return the samples selected by *bands*, *rows* and *cols* as an array of (bands, lines, line samples)."""
+		dtype = self._get_image_dtype()
+		offset, shape, strides = self._get_image_layout()
+		if rows is not None:
+			offset, shape, strides = _select(offset, shape, strides, 1, rows)
+		if cols is not None:
+			offset, shape, strides = _select(offset, shape, strides, 2, cols)
+		if bands is not None:
+			# Normalize the band indices, raising an IndexError for any that is out of range.
+			bands = [xrange(shape[0])[band] for band in bands]
+			index = _as_slice(bands)
+			if index is None:
+				# The bands are not evenly spaced, each is read on its own and they are stacked.
+				if self.log: self.log.debug("Stacking bands %s" % (bands,))
+				return numpy.concatenate([self._view(f, mapped, dtype, *_select(offset, shape, strides, 0, slice(band, band + 1)))
+					for band in bands])
+			offset, shape, strides = _select(offset, shape, strides, 0, index)
+		if self.log: self.log.debug("Samples shape: %s, at %d with strides %s" % (shape, offset, strides))
+		return self._view(f, mapped, dtype, offset, shape, strides)
+
+	def _read_image_data(self, f, mapped, loc, readSize):
+		"""Return *readSize* bytes of image data at *loc*, a view when the file is mapped,
+		and a function which verifies their checksum, see ``_verify_checksum``.
+
+		Unless the checksum is verified lazily, or skipped, the data is hashed in chunks as it is read.
+		"""
+		md5Checksum = None
+		if self.checksumMode != 'skip':
+			md5Checksum = self._get_image_checksum()
+		checksum = None
+		if md5Checksum and self.checksumMode != 'lazy':
+			checksum = _Checksum(background=self.checksumMode == 'background')
+		try:
+			if mapped:
+				if self.log: self.log.debug("Viewing mapped image data at %d (%s)" % (loc, readSize))
+				rawImageData = buffer(f, loc, readSize)
+				if checksum is not None:
+					for chunk in _chunks(rawImageData):
+						checksum.update(chunk)
+			else:
+				if self.log: self.log.debug("Seeking to image data at %d" % (loc))
+				f.seek(loc)
+				if self.log: self.log.debug("Seek successful, reading data (%s)" % (readSize))
+				rawImageData = _read_chunks(f, readSize, checksum)
+		finally:
+			if checksum is not None:
+				# Every chunk has been handed over, any background thread ends whether or not the image is ever verified.
+				checksum.close()
+		return rawImageData, lambda: self._verify_checksum(md5Checksum, checksum, rawImageData)
+
+	def _verify_checksum(self, md5Checksum, checksum, rawImageData):
+		"""Verify the *md5Checksum* of the image data, if the labels have one.
+
+		The digest is that of *checksum*, waiting for any background thread, or else of *rawImageData* hashed now.
+		A ChecksumError is raised on failure, unless *raisesChecksumError* is unset.
+		"""
+		if md5Checksum:
+			if checksum is None:
+				checksum = _Checksum()
+				for chunk in _chunks(rawImageData):
+					checksum.update(chunk)
+			rawImageChecksum = checksum.hexdigest()
+			checksumVerificationPassed = rawImageChecksum == md5Checksum and True or False
+			if not checksumVerificationPassed:
+				if self.log: self.log.debug("Secure hash verification failed")
+				if self.raisesChecksumError:
+					errorMessage = "Verification failed! Expected '%s' but got '%s'." % (md5Checksum, rawImageChecksum)
+					raise ChecksumError, errorMessage
+			else:
+				if self.log: self.log.debug("Secure hash verification passed")
+
 	def _check_image_is_supported(self):
 		"""Check that the image is supported."""
 		SUPPORTED = {}
 		SUPPORTED['RECORD_TYPE'] = 'FIXED_LENGTH',
-		SUPPORTED['SAMPLE_BITS'] = 8, 16
-		SUPPORTED['SAMPLE_TYPE'] = ( 'UNSIGNED_INTEGER',
-				'MSB_UNSIGNED_INTEGER',
-				'LSB_INTEGER',
-				'MSB_INTEGER'
-				)
 
 		imageIsSupported = True
 
 		if not self.labels.has_key('IMAGE'):
 			if self.log: self.log.warn("No image data found")
 			imageIsSupported = False
+			return imageIsSupported
 
 		recordType = self.labels['RECORD_TYPE']
-		imageSampleBits = int(self.labels['IMAGE']['SAMPLE_BITS'])
-		imageSampleType = self.labels['IMAGE']['SAMPLE_TYPE']
 
 		if recordType not in SUPPORTED['RECORD_TYPE']:
 			errorMessage = ("RECORD_TYPE '%s' is not supported") % (recordType)
 			if self.raisesImageNotSupportedError:
 				raise ImageNotSupportedError(errorMessage)
 			imageIsSupported = False
-		if imageSampleBits not in SUPPORTED['SAMPLE_BITS']:
-			errorMessage = ("SAMPLE_BITS '%s' is not supported") % (imageSampleBits)
-			if self.raisesImageNotSupportedError:
-				raise ImageNotSupportedError(errorMessage)
-			imageIsSupported = False
-		if imageSampleType not in SUPPORTED['SAMPLE_TYPE']:
-			errorMessage = ("SAMPLE_TYPE '%s' is not supported") % (imageSampleType)
+		try:
+			self._get_image_type_string()
+		except DataTypeError, e:
 			if self.raisesImageNotSupportedError:
-				raise ImageNotSupportedError(errorMessage)
+				raise ImageNotSupportedError(str(e))
 			imageIsSupported = False
 
 		return imageIsSupported
 
+	def _check_image_bands_are_supported(self):
+		"""Check that the first band of the image may be extracted as a PIL image.
+
+		That band lies in one piece only when the bands are stored BAND_SEQUENTIAL, see ``extract_array`` otherwise.
+		"""
+		imageBands, bandStorageType = self._get_image_bands()
+		if imageBands == 1 or bandStorageType == 'BAND_SEQUENTIAL':
+			return True
+		errorMessage = ("BAND_STORAGE_TYPE '%s' is not supported, use extract_array") % (bandStorageType)
+		if self.raisesImageNotSupportedError:
+			raise ImageNotSupportedError(errorMessage)
+		return False
+
+	def _get_image_type_string(self):
+		"""Return the NumPy type string of the image samples, as given by SAMPLE_TYPE and SAMPLE_BITS.
+
+		This may raise a DataTypeError.
+		"""
+		imageSampleBits = int(self.labels['IMAGE']['SAMPLE_BITS'])
+		imageSampleType = decode(self.labels['IMAGE']['SAMPLE_TYPE'])
+		return data_type(imageSampleType, imageSampleBits)
+
+	def _get_image_dtype(self):
+		"""Return the NumPy data type of the image samples, as given by SAMPLE_TYPE and SAMPLE_BITS."""
+		return numpy.dtype(self._get_image_type_string())
+
+	def _get_image_bands(self):
+		"""Return the number of bands of the image and their BAND_STORAGE_TYPE.
+
+		An image without BANDS has a single band, stored BAND_SEQUENTIAL.
+		"""
+		imageBands = int(self.labels['IMAGE'].get('BANDS', 1))
+		bandStorageType = decode(self.labels['IMAGE'].get('BAND_STORAGE_TYPE', 'BAND_SEQUENTIAL'))
+		return imageBands, bandStorageType
+
+	def _get_image_line_affixes(self):
+		"""Return the LINE_PREFIX_BYTES and LINE_SUFFIX_BYTES of the image, either may be 0."""
+		prefixBytes = int(self.labels['IMAGE'].get('LINE_PREFIX_BYTES', 0))
+		suffixBytes = int(self.labels['IMAGE'].get('LINE_SUFFIX_BYTES', 0))
+		return prefixBytes, suffixBytes
+
+	def _get_image_line_bytes(self):
+		"""Return the number of lines stored, and their length in bytes including any prefix and suffix.
+
+		Each band has lines of its own, except when its samples are interleaved.
+		"""
+		imageWidth, imageHeight = self._get_image_dimensions()
+		imageBands, bandStorageType = self._get_image_bands()
+		prefixBytes, suffixBytes = self._get_image_line_affixes()
+		sampleBytes = int(self.labels['IMAGE']['SAMPLE_BITS']) // 8
+		if bandStorageType == 'SAMPLE_INTERLEAVED':
+			return imageHeight, prefixBytes + imageWidth * imageBands * sampleBytes + suffixBytes
+		return imageHeight * imageBands, prefixBytes + imageWidth * sampleBytes + suffixBytes
+
+	def _get_image_layout(self):
+		"""Return the (location, shape, strides) of the image samples as (bands, lines, line samples).
+
+		Strides are given in bytes, as they are by NumPy, and depend on the BAND_STORAGE_TYPE.
+		Any line prefix and suffix bytes are stepped over.
+		"""
+		imageWidth, imageHeight = self._get_image_dimensions()
+		imageBands, bandStorageType = self._get_image_bands()
+		prefixBytes = self._get_image_line_affixes()[0]
+		lineBytes = self._get_image_line_bytes()[1]
+		sampleBytes = int(self.labels['IMAGE']['SAMPLE_BITS']) // 8
+		if bandStorageType == 'SAMPLE_INTERLEAVED':
+			strides = sampleBytes, lineBytes, imageBands * sampleBytes
+		elif bandStorageType == 'LINE_INTERLEAVED':
+			strides = lineBytes, imageBands * lineBytes, sampleBytes
+		else:
+			strides = imageHeight * lineBytes, lineBytes, sampleBytes
+		return self._get_image_location() + prefixBytes, (imageBands, imageHeight, imageWidth), strides
+
+	def _get_image_size(self):
+		"""Return the size of the image data in bytes, every band and any line prefix or suffix included."""
+		lines, lineBytes = self._get_image_line_bytes()
+		return lines * lineBytes
+
 	def _get_image_dimensions(self):
 		"""Return the dimensions of the image as (width, height).
 
@@ -236,19 +566,19 @@ class ImageExtractor(ExtractorBase):
 
 		This may raise a ValueError.
 		"""
-		imagePointer = self.labels['^IMAGE'].split()
-		if len(imagePointer) == 1:
+		imagePointer = decode(self.labels['^IMAGE'])
+		if isinstance(imagePointer, (int, long)):
 			recordBytes = int(self.labels['RECORD_BYTES'])
-			imageLocation = (int(imagePointer[0]) - 1) * recordBytes
-		elif len(imagePointer) == 2:
-			units = imagePointer[1]
-			if not units == '<BYTES>':
-				errorMessage = ("Expected <BYTES> image pointer units but found %s") % (units)
+			imageLocation = (imagePointer - 1) * recordBytes
+		elif isinstance(imagePointer, Quantity):
+			units = imagePointer.units
+			if not units == 'BYTES':
+				errorMessage = ("Expected <BYTES> image pointer units but found <%s>") % (units)
 				raise ValueError, (errorMessage)
 			else:
-				imageLocation = int(imagePointer[0])
+				imageLocation = int(imagePointer.value)
 		else:
-			errorMessage = ("^IMAGE contains extra information") % (imageSampleType)
+			errorMessage = ("^IMAGE contains extra information %s") % (self.labels['^IMAGE'],)
 			raise ValueError(errorMessage)
 		return imageLocation
 
@@ -270,15 +600,384 @@ class ImageExtractor(ExtractorBase):
 			pass
 		else:
 			if self.log: self.log.debug("Found md5 checksum")
-			md5Checksum = md5Checksum[1:-1]
+			md5Checksum = decode(md5Checksum)
 
 		return md5Checksum
 
 
+class _Checksum(object):
+	"""The md5 digest of image data, which is handed over chunk by chunk.
+
+	Set *background* to have the chunks hashed by a thread of their own,
+	hashlib releases the GIL as it hashes so that this overlaps with reading and decoding.
+	"""
+	def __init__(self, background=False):
+		super(_Checksum, self).__init__()
+		self._md5 = hashlib.md5()
+		self._digest = None
+		self._chunks = None
+		self._closed = False
+		if background:
+			self._chunks = Queue.Queue()
+			self._thread = threading.Thread(target=self._hash_chunks)
+			self._thread.daemon = True
+			self._thread.start()
+
+	def _hash_chunks(self):
+		for chunk in iter(self._chunks.get, None):
+			self._md5.update(chunk)
+
+	def update(self, chunk):
+		"""Hash the *chunk*, or queue it for the background thread."""
+		if self._chunks is None:
+			self._md5.update(chunk)
+		else:
+			self._chunks.put(chunk)
+
+	def close(self):
+		"""Mark the end of the chunks, the background thread then ends once it has hashed them."""
+		if self._chunks is not None and not self._closed:
+			self._closed = True
+			self._chunks.put(None)
+
+	def hexdigest(self):
+		"""Return the digest of every chunk, once the background thread has hashed them."""
+		if self._digest is None:
+			self.close()
+			if self._chunks is not None:
+				self._thread.join()
+			self._digest = self._md5.hexdigest()
+		return self._digest
+
+
+def scale_to_8_bits(img):
+	"""Return *img* as an 8 bit ('L') image for display.
+
+	Deeper samples are divided by 16, as suits the 12 bit data of many cameras.
+	"""
+	if img.mode in ('L', 'RGB'):
+		return img
+	return ImageMath.eval("convert(float(a)/16.0, 'L')", a=img)
+
+def _chunks(data):
+	"""Yield views of *data* of CHECKSUM_CHUNK_BYTES each, the last may be shorter."""
+	for start in xrange(0, len(data), CHECKSUM_CHUNK_BYTES):
+		yield buffer(data, start, CHECKSUM_CHUNK_BYTES)
+
+def _read_chunks(f, readSize, checksum=None):
+	"""Return up to *readSize* bytes read from *f* chunk by chunk, handing each to *checksum* as it is read.
+
+	The chunks are read into a single bytearray, which the image, or array, then shares.
+	"""
+	rawImageData = bytearray(readSize)
+	readinto = getattr(f, 'readinto', None)
+	size = 0
+	while size < readSize:
+		chunkBytes = min(CHECKSUM_CHUNK_BYTES, readSize - size)
+		if readinto is not None:
+			chunkBytes = readinto(memoryview(rawImageData)[size:size + chunkBytes])
+		else:
+			chunk = f.read(chunkBytes)
+			chunkBytes = len(chunk)
+			rawImageData[size:size + chunkBytes] = chunk
+		if not chunkBytes:
+			break
+		if checksum is not None:
+			checksum.update(buffer(rawImageData, size, chunkBytes))
+		size += chunkBytes
+	if size < readSize:
+		# The file is cut short, only the data which was found is returned as when it is read at once.
+		rawImageData = rawImageData[:size]
+	return rawImageData
+
+def _on_load(img, before=None, after=None):
+	"""Have *before*, e.g. a verification, called before the pixels of *img* are first accessed, and *after* once they are loaded.
+
+	PIL loads an image before any access to its pixels, the load method of the image is wrapped until *before* passes.
+	"""
+	def load():
+		if before is not None:
+			before()
+		# Unwrapping also breaks the cycle between the image and this function.
+		del img.load
+		pixels = img.load()
+		if after is not None:
+			after()
+		return pixels
+	img.load = load
+
+def _select(offset, shape, strides, axis, index):
+	"""Return the (offset, shape, strides) of the samples selected by the slice *index* along *axis*."""
+	start, stop, step = index.indices(shape[axis])
+	shape, strides = list(shape), list(strides)
+	offset += start * strides[axis]
+	shape[axis] = len(xrange(start, stop, step))
+	strides[axis] *= step
+	return offset, tuple(shape), tuple(strides)
+
+def _as_slice(indices):
+	"""Return a slice selecting the evenly spaced, non-negative *indices*, or None if they are not."""
+	if len(indices) == 1:
+		return slice(indices[0], indices[0] + 1)
+	step = indices[1] - indices[0]
+	if not step or indices != range(indices[0], indices[0] + step * len(indices), step):
+		return None
+	stop = indices[-1] + step
+	# A stop before the first index, as of descending indices down to 0, is given as None rather than -1.
+	return slice(indices[0], None if stop < 0 else stop, step)
+
+register(ImageExtractor)
+
+
 class ImageExtractorTests(unittest.TestCase):
 	"""Unit tests for class ImageExtractor"""
+	def write_product(self, lines, samples, sampleType, sampleBits, data, imageLabels=()):
+		"""Write a product with an attached image, of *data*, and return its filename."""
+		recordBytes = len(data) // lines
+		labels = ["PDS_VERSION_ID = PDS3", "RECORD_TYPE = FIXED_LENGTH", "RECORD_BYTES = %d" % (recordBytes),
+			"LABEL_RECORDS = %d", "^IMAGE = %d", "OBJECT = IMAGE", "LINES = %d" % (lines), "LINE_SAMPLES = %d" % (samples),
+			"SAMPLE_TYPE = %s" % (sampleType), "SAMPLE_BITS = %d" % (sampleBits)]
+		labels.extend(imageLabels)
+		labels.extend(("END_OBJECT = IMAGE", "END", ""))
+		label = "\r\n".join(labels)
+		labelRecords = len(label) // recordBytes + 2
+		label = (label % (labelRecords, labelRecords + 1)).ljust(labelRecords * recordBytes)
+		filename = os.path.join(self.directory, "product%d.img" % (len(os.listdir(self.directory))))
+		with open(filename, "wb") as f:
+			f.write(label + data)
+		return filename
+
 	def setUp(self):
-		pass
+		import tempfile
+
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		import shutil
+
+		shutil.rmtree(self.directory)
+
+	def test_extract_array(self):
+		"""Arrays have the type of their samples, and view the mapped file"""
+		import cStringIO as StringIO
+
+		if numpy is None:
+			return
+		expected = numpy.arange(-6, 6, dtype='>i2').reshape(3, 4)
+		filename = self.write_product(3, 4, "MSB_INTEGER", 16, expected.tostring(),
+			('MD5_CHECKSUM = "%s"' % (hashlib.md5(expected.tostring()).hexdigest()),))
+		array, labels = ImageExtractor().extract_array(filename)
+		self.assertEqual(numpy.dtype('>i2'), array.dtype)
+		self.assertTrue((expected == array).all())
+		self.assertFalse(array.flags.owndata)
+		array, labels = ImageExtractor().extract_array(StringIO.StringIO(open(filename, "rb").read()))
+		self.assertTrue((expected == array).all())
+
+	def test_extract_window(self):
+		"""Windows are cut from both mapped and read sources"""
+		import cStringIO as StringIO
+
+		if numpy is None:
+			return
+		expected = numpy.arange(42, dtype='>u2').reshape(6, 7)
+		filename = self.write_product(6, 7, "MSB_UNSIGNED_INTEGER", 16, expected.tostring())
+		for window in ((slice(1, 4), slice(2, 5)), (slice(None, None, 2), slice(6, 0, -3)), (slice(3, 3), slice(None))):
+			array, labels = ImageExtractor().extract_window(filename, *window)
+			self.assertEqual(expected[window].tolist(), array.tolist())
+			array, labels = ImageExtractor().extract_window(StringIO.StringIO(open(filename, "rb").read()), *window)
+			self.assertEqual(expected[window].tolist(), array.tolist())
+
+	def test_bands(self):
+		"""Bands are extracted as strided views, whatever their storage type"""
+		import cStringIO as StringIO
+
+		if numpy is None:
+			return
+		cube = numpy.arange(3 * 4 * 5, dtype='u1').reshape(3, 4, 5)
+		layouts = (("BAND_SEQUENTIAL", cube), ("LINE_INTERLEAVED", cube.transpose(1, 0, 2)),
+			("SAMPLE_INTERLEAVED", cube.transpose(1, 2, 0)))
+		for bandStorageType, stored in layouts:
+			filename = self.write_product(4, 5, "UNSIGNED_INTEGER", 8, stored.tostring(),
+				("BANDS = 3", "BAND_STORAGE_TYPE = %s" % (bandStorageType)))
+			array, labels = ImageExtractor().extract_array(filename)
+			self.assertEqual(cube.tolist(), array.tolist())
+			for bands in ([1], [2, 0], [0, 2], [-1, 0, 1], [2, 1], [1, 0]):
+				for source in (filename, StringIO.StringIO(open(filename, "rb").read())):
+					array, labels = ImageExtractor().extract_array(source, bands=bands)
+					self.assertEqual(cube[bands].tolist(), array.tolist())
+				array, labels = ImageExtractor().extract_window(filename, slice(1, 3), slice(None, None, 2), bands=bands)
+				self.assertEqual(cube[bands, 1:3, ::2].tolist(), array.tolist())
+		# Given bands, the band axis is kept even for an image of a single band.
+		filename = self.write_product(4, 5, "UNSIGNED_INTEGER", 8, cube[0].tostring())
+		array, labels = ImageExtractor().extract_array(filename, bands=[0, 0])
+		self.assertEqual((2, 4, 5), array.shape)
+		array, labels = ImageExtractor().extract_window(filename, slice(1, 3), slice(None), bands=[0])
+		self.assertEqual((1, 2, 5), array.shape)
+		self.assertEqual((4, 5), ImageExtractor().extract_array(filename)[0].shape)
+
+	def test_sample_types(self):
+		"""Every sample type is extracted at its own depth"""
+		if numpy is None:
+			return
+		for sampleType, sampleBits, typeString in (("LSB_INTEGER", 16, '<i2'), ("MSB_UNSIGNED_INTEGER", 32, '>u4'),
+				("PC_REAL", 32, '<f4'), ("IEEE_REAL", 64, '>f8'), ("MSB_INTEGER", 8, 'i1')):
+			expected = numpy.arange(-3, 3).astype(typeString).reshape(2, 3)
+			if 'u' in typeString:
+				# PIL holds 32 bit samples as signed integers.
+				expected += 3
+			filename = self.write_product(2, 3, sampleType, sampleBits, expected.tostring())
+			array, labels = ImageExtractor().extract_array(filename)
+			self.assertEqual(numpy.dtype(typeString), array.dtype)
+			self.assertEqual(expected.tolist(), array.tolist())
+			array, labels = ImageExtractor().extract_array(filename, native=True)
+			self.assertTrue(array.dtype.isnative)
+			self.assertEqual(expected.tolist(), array.tolist())
+			img, labels = ImageExtractor().extract(filename)
+			self.assertEqual(expected.ravel().tolist(), list(img.getdata()))
+
+	def test_thumbnail(self):
+		"""Thumbnails are decimated, or box filtered, from every few lines"""
+		import cStringIO as StringIO
+
+		if numpy is None:
+			return
+		expected = numpy.arange(9 * 10, dtype='<i2').reshape(9, 10) * 2
+		filename = self.write_product(9, 10, "LSB_INTEGER", 16, expected.tostring())
+		for source in (filename, StringIO.StringIO(open(filename, "rb").read())):
+			array, labels = ImageExtractor().thumbnail(source, 4)
+			self.assertEqual(expected[::3, ::3].tolist(), array.tolist())
+		array, labels = ImageExtractor().thumbnail(filename, 4, box=True)
+		self.assertEqual(numpy.dtype('<i2'), array.dtype)
+		self.assertEqual(expected[::3, :9].reshape(3, 3, 3).mean(axis=-1).tolist(), array.tolist())
+		array, labels = ImageExtractor().thumbnail(filename, 10)
+		self.assertEqual(expected.tolist(), array.tolist())
+
+	def test_compressed(self):
+		"""Images are extracted from compressed products, which are decompressed as they are read"""
+		import bz2
+		import gzip
+
+		if numpy is None:
+			return
+		expected = numpy.arange(40 * 50, dtype='>u2').reshape(40, 50)
+		filename = self.write_product(40, 50, "MSB_UNSIGNED_INTEGER", 16, expected.tostring(),
+			('MD5_CHECKSUM = "%s"' % (hashlib.md5(expected.tostring()).hexdigest()),))
+		data = open(filename, "rb").read()
+		with gzip.open(filename + ".gz", "wb") as f:
+			f.write(data)
+		with open(filename + ".bz2", "wb") as f:
+			f.write(bz2.compress(data))
+		for compressedFilename in (filename + ".gz", filename + ".bz2"):
+			array, labels = ImageExtractor().extract_array(compressedFilename)
+			self.assertEqual(expected.tolist(), array.tolist())
+			self.assertEqual("40", labels["IMAGE"]["LINES"])
+			array, labels = ImageExtractor().extract_window(compressedFilename, slice(30, 20, -3), slice(5, 10))
+			self.assertEqual(expected[30:20:-3, 5:10].tolist(), array.tolist())
+			img, labels = ImageExtractor().extract(compressedFilename)
+			self.assertEqual(expected.ravel().tolist(), list(img.getdata()))
+
+	def test_line_affixes(self):
+		"""Line prefix and suffix bytes are stepped over, and may be extracted"""
+		import cStringIO as StringIO
+
+		if numpy is None:
+			return
+		expected = numpy.arange(2 * 3 * 4, dtype='>u2').reshape(2, 3, 4)
+		prefixes = numpy.zeros((2, 3, 3), 'u1') + ord('P')
+		suffixes = numpy.zeros((2, 3, 1), 'u1') + ord('S')
+		stored = numpy.concatenate((prefixes, expected.view('u1'), suffixes), axis=2)
+		filename = self.write_product(3, 4, "MSB_UNSIGNED_INTEGER", 16, stored.tostring(),
+			("BANDS = 2", "LINE_PREFIX_BYTES = 3", "LINE_SUFFIX_BYTES = 1",
+			'MD5_CHECKSUM = "%s"' % (hashlib.md5(stored.tostring()).hexdigest())))
+		for source in (filename, StringIO.StringIO(open(filename, "rb").read())):
+			array, labels = ImageExtractor().extract_array(source)
+			self.assertEqual(expected.tolist(), array.tolist())
+		array, labels = ImageExtractor().extract_window(filename, slice(1, 3), slice(1, None))
+		self.assertEqual(expected[:, 1:3, 1:].tolist(), array.tolist())
+		(prefix, suffix), labels = ImageExtractor().extract_line_affixes(filename)
+		self.assertEqual(prefixes.tolist(), prefix.tolist())
+		self.assertEqual(suffixes.tolist(), suffix.tolist())
+		img, labels = ImageExtractor().extract(filename)
+		self.assertEqual(expected[0].ravel().tolist(), list(img.getdata()))
+
+	def test_checksum_modes(self):
+		"""Checksums are verified in chunks, whatever the mode, and failures are always raised"""
+		import cStringIO as StringIO
+		global CHECKSUM_CHUNK_BYTES
+
+		data = "".join(chr(i % 251) for i in range(64 * 50))
+		checksum = hashlib.md5(data).hexdigest()
+		good = self.write_product(64, 50, "UNSIGNED_INTEGER", 8, data, ('MD5_CHECKSUM = "%s"' % (checksum),))
+		bad = self.write_product(64, 50, "UNSIGNED_INTEGER", 8, data, ('MD5_CHECKSUM = "%s"' % (checksum[::-1]),))
+		chunkBytes = CHECKSUM_CHUNK_BYTES
+		CHECKSUM_CHUNK_BYTES = 1000
+		try:
+			for checksumMode in CHECKSUM_MODES:
+				for open_source in (lambda filename: filename, lambda filename: StringIO.StringIO(open(filename, "rb").read())):
+					img, labels = ImageExtractor(checksumMode=checksumMode).extract(open_source(good))
+					self.assertEqual(data, "".join(chr(v) for v in img.getdata()))
+					ie = ImageExtractor(checksumMode=checksumMode)
+					if checksumMode == 'skip':
+						img, labels = ie.extract(open_source(bad))
+						self.assertEqual(data, "".join(chr(v) for v in img.getdata()))
+					elif checksumMode in ('lazy', 'background'):
+						img, labels = ie.extract(open_source(bad))
+						self.assertRaises(ChecksumError, img.getdata)
+						self.assertRaises(ChecksumError, img.save, StringIO.StringIO(), "PNG")
+					else:
+						self.assertRaises(ChecksumError, ie.extract, open_source(bad))
+					if numpy is not None and checksumMode != 'skip':
+						self.assertRaises(ChecksumError, ie.extract_array, open_source(bad))
+		finally:
+			CHECKSUM_CHUNK_BYTES = chunkBytes
+		self.assertRaises(ValueError, ImageExtractor, checksumMode='eager')
+
+	def test_background_threads(self):
+		"""Background checksum threads end whether or not the image is loaded, or decoded"""
+		data = "".join(chr(i % 251) for i in range(64 * 50))
+		checksum = hashlib.md5(data).hexdigest()
+		good = self.write_product(64, 50, "UNSIGNED_INTEGER", 8, data, ('MD5_CHECKSUM = "%s"' % (checksum),))
+		truncated = self.write_product(64, 50, "UNSIGNED_INTEGER", 8, data, ('MD5_CHECKSUM = "%s"' % (checksum),))
+		with open(truncated, "r+b") as f:
+			f.truncate(os.path.getsize(truncated) - 100)
+		threads = threading.active_count()
+		ie = ImageExtractor(checksumMode='background')
+		for i in range(5):
+			img, labels = ie.extract(good)
+			self.assertRaises(ValueError, ie.extract, truncated)
+		del img
+		for thread in threading.enumerate():
+			if thread is not threading.current_thread():
+				thread.join(5)
+		self.assertEqual(threads, threading.active_count())
+
+	def test_cache(self):
+		"""Images are cached once loaded, and only by a cache which keeps them"""
+		import shutil
+		import tempfile
+		from core.cache import LabelCache, MemoryCache
+
+		data = "".join(chr(i % 251) for i in range(64 * 50))
+		checksum = hashlib.md5(data).hexdigest()
+		good = self.write_product(64, 50, "UNSIGNED_INTEGER", 8, data, ('MD5_CHECKSUM = "%s"' % (checksum),))
+		bad = self.write_product(64, 50, "UNSIGNED_INTEGER", 8, data, ('MD5_CHECKSUM = "%s"' % (checksum[::-1]),))
+		memoryCache = MemoryCache()
+		ie = ImageExtractor(cache=memoryCache, checksumMode='lazy')
+		img, labels = ie.extract(bad)
+		self.assertRaises(ChecksumError, img.getdata)
+		img, labels = ie.extract(good)
+		self.assertEqual(None, memoryCache.get(file_identity(good), kind="image"))
+		img.load()
+		self.assertTrue(memoryCache.get(file_identity(good), kind="image") is not None)
+		img, labels = ie.extract(good)
+		self.assertEqual(data, "".join(chr(v) for v in img.getdata()))
+		directory = tempfile.mkdtemp()
+		try:
+			# The labels are cached but the image, which is not loaded, is left unverified.
+			img, labels = ImageExtractor(cache=LabelCache(directory), checksumMode='lazy').extract(bad)
+			self.assertRaises(ChecksumError, img.getdata)
+		finally:
+			shutil.rmtree(directory)
 
 	def test_no_exceptions(self):
 		import os
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+indexer.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import fnmatch
+import logging
+import os
+import sqlite3
+import sys
+import time
+import unittest
+
+from core.common import open_pds
+from core.parser import Parser
+
+
+class IndexerError(Exception):
+	"""Base class for exceptions in this module."""
+
+	def __init__(self, *args, **kwargs):
+		super(IndexerError, self).__init__(*args, **kwargs)
+
+
+# The leading bytes of an attached or detached PDS label, one of these must be found within LABEL_SIGNATURE_BYTES.
+LABEL_SIGNATURES = ("PDS_VERSION_ID", "ODL_VERSION_ID", "CCSD")
+LABEL_SIGNATURE_BYTES = 256
+
+# Changes are committed every this many files, an interrupted run keeps what it had indexed.
+COMMIT_FILES = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+	id INTEGER PRIMARY KEY,
+	path TEXT UNIQUE NOT NULL,
+	size INTEGER NOT NULL,
+	mtime REAL NOT NULL,
+	inode INTEGER,
+	indexed REAL NOT NULL,
+	error TEXT
+);
+CREATE TABLE IF NOT EXISTS labels (
+	file_id INTEGER NOT NULL REFERENCES files (id),
+	key TEXT NOT NULL,
+	value TEXT
+);
+CREATE INDEX IF NOT EXISTS labels_file ON labels (file_id);
+CREATE INDEX IF NOT EXISTS labels_key_value ON labels (key, value);
+"""
+
+
+class IndexStats(object):
+	"""The number of files added, updated, removed, left unchanged and failed by ``Indexer.index``.
+
+	A new file which fails is counted as failed, a changed one as both updated and failed.
+	"""
+	def __init__(self):
+		super(IndexStats, self).__init__()
+		self.added = self.updated = self.removed = self.unchanged = self.failed = 0
+
+	def __str__(self):
+		return "%d added, %d updated, %d removed, %d unchanged, %d failed" % (self.added, self.updated, self.removed,
+			self.unchanged, self.failed)
+
+
+class Indexer(object):
+	"""Index the labels of the PDS products of a directory tree in an SQLite *database*.
+
+	Each file is recorded by its path, size, mtime and inode, and each of its labels as a row of
+	(key, value), where the key of a label within a container is its path, e.g. IMAGE/LINES.
+	Values are as found in the label, see ``Parser``.
+
+	Indexing again only parses the files which are new or whose size or mtime has changed,
+	and drops the files which are gone, so a tree which has barely changed is indexed at the speed of stat.
+
+	>>> from indexer import Indexer
+	>>> indexer = Indexer('archive.db')
+	>>> print indexer.index('/data/archive')
+	>>> indexer.find('INSTRUMENT_ID', '"PANCAM"')
+	>>> indexer.labels('/data/archive/1p128287181eff0000p2303l2m1.img')['IMAGE/LINES']
+
+	Only the attached, or detached, label of each file is read. Files matching any of *patterns*
+	are indexed if they begin with a PDS label, others are recorded so that they are not read again while unchanged.
+	"""
+	def __init__(self, database, patterns=('*',), log=None):
+		super(Indexer, self).__init__()
+		self.database = database
+		self.patterns = patterns
+		self.log = log
+		if log:
+			self._init_logging()
+		self._parser = Parser(headerOnly=True)
+		self._connection = sqlite3.connect(database)
+		self._connection.text_factory = str
+		self._connection.executescript(SCHEMA)
+
+	def _init_logging(self):
+		"""Initialize logging."""
+		format = logging.Formatter("%(levelname)s:%(name)s:%(asctime)s:%(message)s")
+
+		stderr_hand = logging.StreamHandler(sys.stderr)
+		stderr_hand.setLevel(logging.DEBUG)
+		stderr_hand.setFormatter(format)
+
+		logfile_hand = logging.FileHandler(self.log + '.log')
+		logfile_hand.setLevel(logging.DEBUG)
+		logfile_hand.setFormatter(format)
+
+		self.log = logging.getLogger(self.log)
+		self.log.setLevel(logging.DEBUG)
+		self.log.addHandler(logfile_hand)
+		self.log.addHandler(stderr_hand)
+
+		self.log.debug('Initializing logger')
+
+	def close(self):
+		"""Close the database."""
+		self._connection.close()
+
+	def index(self, root):
+		"""Index the tree below the directory *root*, returning the ``IndexStats`` of the files indexed."""
+		root = os.path.abspath(root)
+		if not os.path.isdir(root):
+			raise IndexerError("'%s' is not a directory" % (root))
+		stats = IndexStats()
+		cursor = self._connection.cursor()
+		prefix = root.rstrip(os.sep) + os.sep
+		known = {}
+		for fileId, path, size, mtime in cursor.execute("SELECT id, path, size, mtime FROM files WHERE substr(path, 1, ?) = ?",
+			(len(prefix), prefix)):
+			known[path] = (fileId, size, mtime)
+		pending = 0
+		for path in self._walk(root):
+			try:
+				stat = os.stat(path)
+			except EnvironmentError, e:
+				# e.g. removed since it was listed.
+				if self.log: self.log.warn("Could not stat '%s': %s" % (path, e))
+				continue
+			previous = known.pop(path, None)
+			if previous is not None and previous[1] == stat.st_size and previous[2] == stat.st_mtime:
+				stats.unchanged += 1
+				continue
+			if previous is not None:
+				cursor.execute("DELETE FROM labels WHERE file_id = ?", (previous[0],))
+				cursor.execute("DELETE FROM files WHERE id = ?", (previous[0],))
+			labels, error = self._parse(path)
+			if previous is not None:
+				stats.updated += 1
+			elif not error:
+				stats.added += 1
+			if error:
+				stats.failed += 1
+				if self.log: self.log.warn("Could not index '%s': %s" % (path, error))
+			cursor.execute("INSERT INTO files (path, size, mtime, inode, indexed, error) VALUES (?, ?, ?, ?, ?, ?)",
+				(path, stat.st_size, stat.st_mtime, stat.st_ino, time.time(), error))
+			fileId = cursor.lastrowid
+			cursor.executemany("INSERT INTO labels (file_id, key, value) VALUES (?, ?, ?)",
+				((fileId, key, value) for key, value in labels))
+			pending += 1
+			if pending >= COMMIT_FILES:
+				self._connection.commit()
+				pending = 0
+		for fileId, size, mtime in known.itervalues():
+			cursor.execute("DELETE FROM labels WHERE file_id = ?", (fileId,))
+			cursor.execute("DELETE FROM files WHERE id = ?", (fileId,))
+			stats.removed += 1
+		self._connection.commit()
+		if self.log: self.log.debug("Indexed '%s': %s" % (root, stats))
+		return stats
+
+	def find(self, key, value=None):
+		"""Return the paths of the files which have the label *key*, e.g. IMAGE/LINES, or which have it with *value*."""
+		if value is None:
+			rows = self._connection.execute("SELECT DISTINCT path FROM files JOIN labels ON labels.file_id = files.id "
+				"WHERE key = ? ORDER BY path", (key,))
+		else:
+			rows = self._connection.execute("SELECT DISTINCT path FROM files JOIN labels ON labels.file_id = files.id "
+				"WHERE key = ? AND value = ? ORDER BY path", (key, value))
+		return [row[0] for row in rows]
+
+	def labels(self, path):
+		"""Return the indexed labels of the file *path* as a dictionary of label paths and values."""
+		rows = self._connection.execute("SELECT key, value FROM labels JOIN files ON labels.file_id = files.id "
+			"WHERE path = ?", (os.path.abspath(path),))
+		return dict(rows)
+
+	def _walk(self, root):
+		"""Yield the paths of the files below *root* which match any of the patterns.
+
+		The database, and the journals SQLite keeps beside it, are skipped should they lie within the tree.
+		"""
+		database = os.path.abspath(self.database)
+		skipped = set(database + suffix for suffix in ('', '-journal', '-wal', '-shm'))
+		for directory, directories, filenames in os.walk(root):
+			directories.sort()
+			for filename in sorted(filenames):
+				if os.path.join(directory, filename) in skipped:
+					continue
+				for pattern in self.patterns:
+					if fnmatch.fnmatch(filename.lower(), pattern.lower()):
+						yield os.path.join(directory, filename)
+						break
+
+	def _parse(self, path):
+		"""Return the flattened labels of *path*, and an error message, or None, if they could not be parsed."""
+		try:
+			f = open_pds(path)
+		except EnvironmentError, e:
+			return [], str(e)
+		try:
+			try:
+				start = f.read(LABEL_SIGNATURE_BYTES)
+				if not any(signature in start for signature in LABEL_SIGNATURES):
+					return [], "No PDS label found"
+				f.seek(0)
+				return flatten(self._parser.parse(f)), None
+			except Exception, e:
+				return [], "%s: %s" % (e.__class__.__name__, e)
+		finally:
+			f.close()
+
+
+def flatten(labels, prefix=''):
+	"""Return the nested *labels* as a list of (path, value), e.g. ('IMAGE/LINES', '1024')."""
+	flattened = []
+	for key, value in labels.iteritems():
+		if isinstance(value, dict):
+			flattened.extend(flatten(value, prefix + key + '/'))
+		else:
+			flattened.append((prefix + key, value))
+	return flattened
+
+
+class IndexerTests(unittest.TestCase):
+	"""Unit tests for class Indexer"""
+	def write(self, path, lines=1024, extra=""):
+		"""Write a product with an image of *lines*, and return its path."""
+		label = ["PDS_VERSION_ID = PDS3", "RECORD_TYPE = FIXED_LENGTH", "RECORD_BYTES = 512", "^IMAGE = 2",
+			"OBJECT = IMAGE", "LINES = %d" % (lines), "END_OBJECT = IMAGE", "END", ""]
+		path = os.path.join(self.directory, path)
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+		with open(path, "wb") as f:
+			f.write("\r\n".join(label).ljust(512) + extra)
+		return path
+
+	def setUp(self):
+		import tempfile
+
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		import shutil
+
+		shutil.rmtree(self.directory)
+
+	def test_index(self):
+		"""Only new and changed files are parsed again, and removed files are dropped"""
+		a = self.write("a.img", 10)
+		b = self.write("sub/b.img", 20)
+		c = self.write("sub/c.IMG", 20)
+		notPDS = os.path.join(self.directory, "readme.txt")
+		with open(notPDS, "wb") as f:
+			f.write("Not a product\n")
+		database = os.path.join(self.directory, "index.db")
+		indexer = Indexer(database, patterns=('*.img', '*.txt'))
+		stats = indexer.index(self.directory)
+		self.assertEqual((3, 0, 0, 0, 1), (stats.added, stats.updated, stats.removed, stats.unchanged, stats.failed))
+		self.assertEqual([b, c], indexer.find('IMAGE/LINES', '20'))
+		self.assertEqual([a, b, c], indexer.find('^IMAGE'))
+		self.assertEqual('10', indexer.labels(a)['IMAGE/LINES'])
+		indexer.close()
+
+		self.write("sub/b.img", 30, extra="longer")
+		os.remove(c)
+		indexer = Indexer(database, patterns=('*.img', '*.txt'))
+		parsed = []
+		parse = indexer._parse
+		indexer._parse = lambda path: parsed.append(path) or parse(path)
+		stats = indexer.index(self.directory)
+		self.assertEqual((0, 1, 1, 2, 0), (stats.added, stats.updated, stats.removed, stats.unchanged, stats.failed))
+		self.assertEqual([b], parsed)
+		self.assertEqual([b], indexer.find('IMAGE/LINES', '30'))
+		self.assertEqual({}, indexer.labels(c))
+		self.assertRaises(IndexerError, indexer.index, a)
+		indexer.close()
+
+		# A changed file which no longer parses is updated, and failed, and the database itself is never indexed.
+		with open(a, "wb") as f:
+			f.write("No longer a product\n")
+		indexer = Indexer(database)
+		stats = indexer.index(self.directory)
+		self.assertEqual((0, 1, 0, 2, 1), (stats.added, stats.updated, stats.removed, stats.unchanged, stats.failed))
+		self.assertEqual({}, indexer.labels(a))
+		self.assertEqual([b], indexer.find('IMAGE/LINES', '30'))
+		indexer.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
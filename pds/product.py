@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+product.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import mmap
+import unittest
+
+from core.common import map_pds
+from core.parser import Parser
+from core.extractorbase import extractors_for
+
+# Register the extractors of the package, each is found by the objects it handles.
+import imageextractor
+import qubeextractor
+import tableextractor
+
+
+class ProductError(Exception):
+	"""Error raised for an object of a product which no extractor handles."""
+
+	def __init__(self, *args, **kwargs):
+		super(ProductError, self).__init__(*args, **kwargs)
+
+
+class Product(object):
+	"""A PDS product, opened and mapped where possible, and its labels parsed, once for all of its objects.
+
+	Each object, named by its ^POINTER label without the caret, is extracted by the registered extractor
+	which handles it, see ``extractorbase.register``. Every extractor shares the file and the labels of the product.
+
+	>>> from product import Product
+	>>> with Product('pds.img') as product:
+	...     img, labels = product.extract('IMAGE')
+	...     table, labels = product.extract('INDEX_TABLE', columns=['FILE_NAME'])
+
+	Any extractor may also be handed the product in place of a file, to extract with options of its own.
+
+	>>> array, labels = ImageExtractor(checksumMode='skip').extract_array(product)
+
+	The labels are parsed in full, with *cache*, see ``Parser``.
+	Extractors are created with *log*, as are those of the package.
+	"""
+	def __init__(self, source, cache=None, log=None):
+		super(Product, self).__init__()
+		self.source = source
+		self.name = isinstance(source, basestring) and source or getattr(source, "name", None)
+		self.log = log
+		self.file = map_pds(source)
+		self.mapped = isinstance(self.file, mmap.mmap)
+		self.labels = Parser(cache=cache).parse(self.file)
+		self._columnLabels = {}
+		self._extractors = {}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def pointers(self):
+		"""Return the names of the objects of the product, those of its ^POINTER labels, sorted."""
+		return sorted(key[1:] for key in self.labels if key.startswith('^'))
+
+	def extractor(self, name):
+		"""Return the extractor of the object *name*, the same one each time it is asked for."""
+		extractorClasses = extractors_for(name)
+		if not extractorClasses:
+			raise ProductError("No extractor handles the object '%s'" % (name))
+		extractorClass = extractorClasses[0]
+		if extractorClass not in self._extractors:
+			self._extractors[extractorClass] = extractorClass(log=self.log)
+		return self._extractors[extractorClass]
+
+	def column_labels(self, name, scan):
+		"""Return the labels of the COLUMN objects of the table *name*, as returned by *scan* the first time they are asked for.
+
+		The parsed labels keep only the last of the COLUMN objects of a table, which share a name,
+		an extractor scans the label for all of them once and they are kept here for every later extract.
+		"""
+		if name not in self._columnLabels:
+			self._columnLabels[name] = scan()
+		return self._columnLabels[name]
+
+	def extract(self, name, *args, **kwargs):
+		"""Extract the object *name*, passing any other arguments to the ``extract`` of its extractor."""
+		if '^' + name not in self.labels:
+			raise ProductError("'%s' has no object '%s'" % (self.name, name))
+		return self.extractor(name).extract_object(self, name, *args, **kwargs)
+
+	def extract_all(self):
+		"""Return a dictionary of every object which an extractor handles, by name."""
+		return dict((name, self.extract(name)[0]) for name in self.pointers() if extractors_for(name))
+
+	def close(self):
+		"""Close the file the product opened, a map is left to be closed once it is no longer referenced.
+
+		A file object handed to the product is left open, it is closed by its owner.
+		"""
+		if not self.mapped and not hasattr(self.source, "read"):
+			self.file.close()
+
+
+class ProductTests(unittest.TestCase):
+	"""Unit tests for class Product"""
+	def setUp(self):
+		import tempfile
+
+		labels = ["PDS_VERSION_ID = PDS3", "RECORD_TYPE = FIXED_LENGTH", "RECORD_BYTES = 256", "LABEL_RECORDS = 4",
+			"^IMAGE = 5", "^INDEX_TABLE = 6", "^HEADER = 1", "OBJECT = IMAGE", "LINES = 4", "LINE_SAMPLES = 64",
+			"SAMPLE_TYPE = MSB_UNSIGNED_INTEGER", "SAMPLE_BITS = 8", "END_OBJECT = IMAGE", "OBJECT = INDEX_TABLE",
+			"INTERFACE_FORMAT = ASCII", "ROWS = 2", "ROW_BYTES = 8", "COLUMNS = 2", "OBJECT = COLUMN", "NAME = ID",
+			"DATA_TYPE = ASCII_INTEGER", "START_BYTE = 1", "BYTES = 3", "END_OBJECT = COLUMN", "OBJECT = COLUMN",
+			"NAME = VALUE", "DATA_TYPE = ASCII_REAL", "START_BYTE = 5", "BYTES = 2", "END_OBJECT = COLUMN",
+			"END_OBJECT = INDEX_TABLE", "END", ""]
+		self.file = tempfile.NamedTemporaryFile(suffix=".img")
+		self.file.write("\r\n".join(labels).ljust(4 * 256) + "".join(chr(i) for i in range(256)) + " 12,.5\r\n -3,-1\r\n")
+		self.file.flush()
+
+	def tearDown(self):
+		self.file.close()
+
+	def test_extract(self):
+		"""Every object is extracted from a single parse of the product"""
+		import cStringIO as StringIO
+
+		for source in (self.file.name, StringIO.StringIO(open(self.file.name, "rb").read()), open(self.file.name, "rb")):
+			with Product(source) as product:
+				self.assertEqual(['HEADER', 'IMAGE', 'INDEX_TABLE'], product.pointers())
+				self.assertTrue(product.extractor('IMAGE') is product.extractor('IMAGE'))
+				objects = product.extract_all()
+				self.assertEqual(['IMAGE', 'INDEX_TABLE'], sorted(objects))
+				self.assertEqual((64, 4), objects['IMAGE'].size)
+				self.assertEqual([12, -3], objects['INDEX_TABLE']['ID'].tolist())
+				table, labels = product.extract('INDEX_TABLE', columns=['VALUE'])
+				self.assertTrue(labels is product.labels)
+				self.assertEqual([0.5, -1.0], table['VALUE'].tolist())
+				# The columns were scanned for by the first extract of the table, and are not scanned for again.
+				self.assertEqual(['ID', 'VALUE'], [column['NAME'] for column in product.column_labels('INDEX_TABLE', None)])
+				product.extractor('INDEX_TABLE')._parser = None
+				table, labels = product.extract('INDEX_TABLE', columns=['ID'])
+				self.assertEqual([12, -3], table['ID'].tolist())
+				array, labels = imageextractor.ImageExtractor(checksumMode='skip').extract_array(product)
+				self.assertEqual(range(64, 128), array[1].tolist())
+				self.assertRaises(ProductError, product.extract, 'HEADER')
+				self.assertRaises(ProductError, product.extract, 'QUBE')
+			if hasattr(source, "read"):
+				# The file handed over is still ours.
+				source.seek(0)
+				source.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+qubeextractor.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import mmap
+import unittest
+
+from collections import OrderedDict
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from core.common import map_pds
+from core.datatypes import DataTypeError, data_type
+from core.parser import Parser
+from core.values import decode
+from core.extractorbase import ExtractorBase, ExtractorError, register
+
+
+class QubeExtractorError(ExtractorError):
+	"""Base class for exceptions in this module."""
+
+	def __init__(self, *args, **kwargs):
+		super(QubeExtractorError, self).__init__(*args, **kwargs)
+
+
+class QubeNotSupportedError(QubeExtractorError):
+	"""Error raised when a qube, or one of its suffix planes, is not supported."""
+
+	def __init__(self, *args, **kwargs):
+		super(QubeNotSupportedError, self).__init__(*args, **kwargs)
+
+
+# The axes of a qube, in the order of the arrays returned.
+AXES = ('BAND', 'LINE', 'SAMPLE')
+
+# The name of the planes of the suffix of each axis.
+SUFFIX_PLANES = {'BAND': 'backplanes', 'SAMPLE': 'sideplanes', 'LINE': 'bottomplanes'}
+
+# The bytes of each suffix item, unless given by SUFFIX_BYTES.
+DEFAULT_SUFFIX_BYTES = 4
+
+
+class Qube(object):
+	"""The core and suffix planes of a qube.
+
+	The core is an array of (bands, lines, samples), whatever the storage order of the qube.
+	Each of backplanes, sideplanes and bottomplanes maps the name of a suffix plane to its array,
+	of (lines, samples), (bands, lines) and (bands, samples) respectively.
+	The core samples are as they are stored, their value is core * multiplier + base.
+	"""
+	def __init__(self, core, backplanes, sideplanes, bottomplanes, base=0.0, multiplier=1.0):
+		super(Qube, self).__init__()
+		self.core = core
+		self.backplanes = backplanes
+		self.sideplanes = sideplanes
+		self.bottomplanes = bottomplanes
+		self.base = base
+		self.multiplier = multiplier
+
+
+class QubeExtractor(ExtractorBase):
+	"""Extract the spectral qube, such as an ISIS cube, of a PDS file as NumPy arrays.
+
+	The qube is located by its ^QUBE pointer and described by its QUBE object:
+	AXIS_NAME gives the storage order of the axes, from the fastest varying,
+	e.g. (SAMPLE, LINE, BAND) for band sequential, (SAMPLE, BAND, LINE) for band interleaved by line,
+	or (BAND, SAMPLE, LINE) for band interleaved by pixel,
+	CORE_ITEMS the size of each axis, and CORE_ITEM_TYPE and CORE_ITEM_BYTES the type of the core samples.
+
+	The core is returned as an array of (bands, lines, samples) in any order,
+	and the suffix planes, as given by SUFFIX_ITEMS, as arrays of their own, see ``Qube``.
+
+	When the file is mapped, the arrays are views of it and reading a band, or a spectrum,
+	touches only the pages holding its samples.
+
+	>>> from qubeextractor import QubeExtractor
+	>>> qe = QubeExtractor()
+	>>> qube, labels = qe.extract('pdsFileWithAQube.qub')
+	>>> spectrum = qube.core[:, 100, 200]
+	>>> qube.backplanes['LATITUDE'][100, 200]
+
+	A single band, or spectrum, may also be extracted on its own, only its samples are then read
+	from files which are not mapped, such as compressed ones.
+
+	>>> band, labels = qe.extract_band('pdsFileWithAQube.qub', 10)
+	>>> spectrum, labels = qe.extract_spectrum('pdsFileWithAQube.qub', 100, 200)
+	"""
+
+	# The labels needed to extract a qube, the only ones parsed unless fullLabels is set.
+	QUBE_KEYS = ['RECORD_BYTES', '^QUBE', 'QUBE']
+
+	POINTERS = ('QUBE',)
+
+	def __init__(self, log=None, raisesQubeNotSupportedError=True, cache=None, fullLabels=True):
+		super(QubeExtractor, self).__init__()
+
+		self._parser = Parser(cache=cache)
+		self.cache = cache
+		self.fullLabels = fullLabels
+		self.log = log
+		self.raisesQubeNotSupportedError = raisesQubeNotSupportedError
+		if log:
+			self._init_logging()
+
+	def extract(self, source):
+		"""Extract the qube of *source*.
+
+		If the qube is supported a ``Qube`` is returned, otherwise None.
+		"""
+		return self._extract(source, self._extract_qube)
+
+	def extract_band(self, source, band):
+		"""Extract the *band* of the qube of *source*, as an array of (lines, samples)."""
+		return self._extract(source, lambda f, mapped, location: self._extract_core(f, mapped, location, (band, slice(None), slice(None))))
+
+	def extract_spectrum(self, source, line, sample):
+		"""Extract the spectrum at *line* and *sample* of the qube of *source*, as an array of its bands."""
+		return self._extract(source, lambda f, mapped, location: self._extract_core(f, mapped, location, (slice(None), line, sample)))
+
+	def _extract(self, source, extractor):
+		"""Open *source* and return what *extractor* reads of its qube, along with its labels."""
+		if numpy is None:
+			raise QubeExtractorError("NumPy is required to extract a qube")
+		f, mapped = self._open(source, self.QUBE_KEYS)
+		result = None
+		try:
+			if self._check_qube_is_supported():
+				filename, location = self._get_pointer_location(source, 'QUBE')
+				if filename is None:
+					result = extractor(f, mapped, location)
+				else:
+					if self.log: self.log.debug("Reading qube from '%s'" % (filename))
+					qubeFile = map_pds(filename)
+					qubeMapped = isinstance(qubeFile, mmap.mmap)
+					try:
+						result = extractor(qubeFile, qubeMapped, location)
+					finally:
+						if not qubeMapped:
+							qubeFile.close()
+		finally:
+			self._close(f, source, mapped)
+		return result, self.labels
+
+	def _extract_qube(self, f, mapped, location):
+		"""Return the ``Qube`` at *location*."""
+		qube = self.labels['QUBE']
+		planes = {}
+		for axis in AXES:
+			planes[axis] = OrderedDict()
+			for name, dtype, offset, shape, strides in self._get_suffix_layouts(location, axis):
+				planes[axis][name] = self._view(f, mapped, dtype, offset, shape, strides)
+		core = self._view(f, mapped, self._get_core_dtype(), *self._get_core_layout(location))
+		planes = dict((SUFFIX_PLANES[axis], planes[axis]) for axis in AXES)
+		return Qube(core, base=float(decode(qube.get('CORE_BASE', 0.0))), multiplier=float(decode(qube.get('CORE_MULTIPLIER', 1.0))),
+			**planes)
+
+	def _extract_core(self, f, mapped, location, index):
+		"""Return the core samples selected by *index*, an integer or a slice for each of the bands, lines and samples."""
+		offset, shape, strides = self._get_core_layout(location)
+		selected = []
+		for i, n, stride in zip(index, shape, strides):
+			if isinstance(i, slice):
+				start, stop, step = i.indices(n)
+				offset += start * stride
+				selected.append((len(xrange(start, stop, step)), stride * step))
+			else:
+				offset += xrange(n)[i] * stride
+		shape, strides = [s[0] for s in selected], [s[1] for s in selected]
+		if self.log: self.log.debug("Core samples shape: %s, at %d with strides %s" % (shape, offset, strides))
+		return self._view(f, mapped, self._get_core_dtype(), offset, tuple(shape), tuple(strides))
+
+	def _not_supported(self, errorMessage):
+		"""Raise a QubeNotSupportedError, unless *raisesQubeNotSupportedError* is unset."""
+		if self.log: self.log.error(errorMessage)
+		if self.raisesQubeNotSupportedError:
+			raise QubeNotSupportedError(errorMessage)
+		return False
+
+	def _check_qube_is_supported(self):
+		"""Check that the qube is supported."""
+		if not self.labels.has_key('QUBE') or not self.labels.has_key('^QUBE'):
+			if self.log: self.log.warn("No qube found")
+			return False
+		qube = self.labels['QUBE']
+		axisNames = _sequence(qube.get('AXIS_NAME', ()))
+		if sorted(axisNames) != sorted(AXES):
+			return self._not_supported("AXIS_NAME %s is not supported, expected the axes %s" % (axisNames, AXES))
+		if len(_sequence(qube.get('CORE_ITEMS', ()))) != len(AXES):
+			return self._not_supported("CORE_ITEMS must give the size of each axis")
+		try:
+			self._get_core_dtype()
+		except DataTypeError, e:
+			return self._not_supported(str(e))
+		return True
+
+	def _get_core_dtype(self):
+		"""Return the NumPy dtype of the core samples."""
+		qube = self.labels['QUBE']
+		return numpy.dtype(data_type(decode(qube['CORE_ITEM_TYPE']), int(qube['CORE_ITEM_BYTES']) * 8))
+
+	def _get_storage(self):
+		"""Return the axis names, core items, suffix items and strides of the qube in storage order.
+
+		The strides of the core, and those of the rows and planes which lie within a suffix,
+		whose items are SUFFIX_BYTES each whatever the type of the core.
+		"""
+		qube = self.labels['QUBE']
+		axisNames = _sequence(qube['AXIS_NAME'])
+		coreItems = [int(n) for n in _sequence(qube['CORE_ITEMS'])]
+		suffixItems = [int(n) for n in _sequence(qube.get('SUFFIX_ITEMS', (0, 0, 0)))]
+		coreBytes = int(qube['CORE_ITEM_BYTES'])
+		suffixBytes = int(qube.get('SUFFIX_BYTES', DEFAULT_SUFFIX_BYTES))
+		# A row along the fastest axis, through the core and through a suffix.
+		rowBytes = coreItems[0] * coreBytes + suffixItems[0] * suffixBytes
+		suffixRowBytes = (coreItems[0] + suffixItems[0]) * suffixBytes
+		# A plane of the two fastest axes, likewise.
+		planeBytes = coreItems[1] * rowBytes + suffixItems[1] * suffixRowBytes
+		suffixPlaneBytes = (coreItems[1] + suffixItems[1]) * suffixRowBytes
+		return (axisNames, coreItems, suffixItems, (coreBytes, rowBytes, planeBytes), suffixBytes, suffixRowBytes,
+			suffixPlaneBytes)
+
+	def _get_core_layout(self, location):
+		"""Return the (offset, shape, strides) of the core, as (bands, lines, samples)."""
+		axisNames, coreItems, suffixItems, strides, suffixBytes, suffixRowBytes, suffixPlaneBytes = self._get_storage()
+		order = [axisNames.index(axis) for axis in AXES]
+		return location, tuple(coreItems[i] for i in order), tuple(strides[i] for i in order)
+
+	def _get_suffix_layouts(self, location, axis):
+		"""Return the (name, dtype, offset, shape, strides) of each suffix plane of *axis*.
+
+		Each plane is that of the other two axes, in the order of AXES, at one suffix item of *axis*.
+		"""
+		qube = self.labels['QUBE']
+		axisNames, coreItems, suffixItems, coreStrides, suffixBytes, suffixRowBytes, suffixPlaneBytes = self._get_storage()
+		i = axisNames.index(axis)
+		if not suffixItems[i]:
+			return []
+		# Within the suffix of an axis, the slower axes keep their core strides and the faster ones step over suffix items.
+		strides = [suffixBytes, suffixRowBytes, suffixPlaneBytes][:i + 1] + list(coreStrides[i + 1:])
+		offset = location + coreItems[i] * coreStrides[i]
+		names = _items(qube.get(axis + '_SUFFIX_NAME'), suffixItems[i])
+		types = _items(qube.get(axis + '_SUFFIX_ITEM_TYPE'), suffixItems[i])
+		itemBytes = _items(qube.get(axis + '_SUFFIX_ITEM_BYTES', suffixBytes), suffixItems[i])
+		others = [axisNames.index(other) for other in AXES if other != axis]
+		layouts = []
+		for k in range(suffixItems[i]):
+			name = names[k] is not None and str(decode(names[k])) or '%s_SUFFIX_%d' % (axis, k + 1)
+			try:
+				if int(itemBytes[k]) != suffixBytes:
+					raise DataTypeError("%d byte items within %d byte suffix items are not supported" % (int(itemBytes[k]), suffixBytes))
+				dtype = numpy.dtype(data_type(decode(types[k] or 'INTEGER'), suffixBytes * 8))
+			except DataTypeError, e:
+				self._not_supported("Suffix plane '%s': %s" % (name, e))
+				continue
+			layouts.append((name, dtype, offset + k * strides[i], tuple(coreItems[j] for j in others), tuple(strides[j] for j in others)))
+		return layouts
+
+
+def _sequence(value):
+	"""Return the label *value* decoded as a list, a single value being a list of one."""
+	value = decode(value)
+	if isinstance(value, (tuple, list)):
+		return [decode(v) for v in value]
+	return [value]
+
+def _items(value, n):
+	"""Return a list of the *n* items of *value*, a single value, or None, being that of every item."""
+	items = value is not None and _sequence(value) or [None]
+	if len(items) == 1:
+		return items * n
+	if len(items) != n:
+		raise QubeExtractorError("Expected %d suffix items but found %s" % (n, value))
+	return items
+
+register(QubeExtractor)
+
+
+class QubeExtractorTests(unittest.TestCase):
+	"""Unit tests for class QubeExtractor"""
+	def write_product(self, axisNames, coreItems, suffixItems):
+		"""Write a qube of 2 byte core samples and 4 byte suffix items, in the order of *axisNames*.
+
+		Core samples have the value band * 100 + line * 10 + sample, suffix items that, negated, of the suffix plane.
+		"""
+		import struct
+		import tempfile
+
+		data = []
+		for k in range(coreItems[2] + suffixItems[2]):
+			for j in range(coreItems[1] + suffixItems[1]):
+				for i in range(coreItems[0] + suffixItems[0]):
+					position = dict(zip(axisNames, (i, j, k)))
+					value = position['BAND'] * 100 + position['LINE'] * 10 + position['SAMPLE']
+					if i < coreItems[0] and j < coreItems[1] and k < coreItems[2]:
+						data.append(struct.pack('>h', value))
+					else:
+						data.append(struct.pack('>i', -value))
+		labels = ["PDS_VERSION_ID = PDS3", "RECORD_TYPE = FIXED_LENGTH", "RECORD_BYTES = 512", "LABEL_RECORDS = 2",
+			"^QUBE = 3", "OBJECT = QUBE", "AXES = 3", "AXIS_NAME = (%s)" % (",".join(axisNames)),
+			"CORE_ITEMS = (%s)" % (",".join(str(n) for n in coreItems)), "CORE_ITEM_BYTES = 2", "CORE_ITEM_TYPE = SUN_INTEGER",
+			"SUFFIX_BYTES = 4", "SUFFIX_ITEMS = (%s)" % (",".join(str(n) for n in suffixItems)),
+			'BAND_SUFFIX_NAME = ("LATITUDE", "LONGITUDE")', "BAND_SUFFIX_ITEM_BYTES = 4", "BAND_SUFFIX_ITEM_TYPE = SUN_INTEGER",
+			"SAMPLE_SUFFIX_ITEM_TYPE = SUN_INTEGER", "END_OBJECT = QUBE", "END", ""]
+		f = tempfile.NamedTemporaryFile(suffix=".qub")
+		f.write("\r\n".join(labels).ljust(1024) + "".join(data))
+		f.flush()
+		self.files.append(f)
+		return f.name
+
+	def setUp(self):
+		self.files = []
+
+	def tearDown(self):
+		for f in self.files:
+			f.close()
+
+	def test_storage_orders(self):
+		"""The core and suffix planes are in the same order whatever the storage order"""
+		import cStringIO as StringIO
+
+		if numpy is None:
+			return
+		bands, lines, samples = numpy.ogrid[:3, :4, :5]
+		expected = bands * 100 + lines * 10 + samples
+		for axisNames in (('SAMPLE', 'LINE', 'BAND'), ('SAMPLE', 'BAND', 'LINE'), ('BAND', 'SAMPLE', 'LINE')):
+			sizes = {'SAMPLE': 5, 'LINE': 4, 'BAND': 3}
+			suffixes = {'SAMPLE': 1, 'LINE': 0, 'BAND': 2}
+			filename = self.write_product(axisNames, [sizes[axis] for axis in axisNames], [suffixes[axis] for axis in axisNames])
+			for source in (filename, StringIO.StringIO(open(filename, "rb").read())):
+				qube, labels = QubeExtractor().extract(source)
+				self.assertEqual(expected.tolist(), qube.core.tolist())
+				self.assertEqual(['LATITUDE', 'LONGITUDE'], qube.backplanes.keys())
+				self.assertEqual((-(300 + lines * 10 + samples))[0].tolist(), qube.backplanes['LATITUDE'].tolist())
+				self.assertEqual((-(400 + lines * 10 + samples))[0].tolist(), qube.backplanes['LONGITUDE'].tolist())
+				self.assertEqual(['SAMPLE_SUFFIX_1'], qube.sideplanes.keys())
+				self.assertEqual((-(bands * 100 + lines * 10 + 5))[..., 0].tolist(), qube.sideplanes['SAMPLE_SUFFIX_1'].tolist())
+				self.assertEqual({}, qube.bottomplanes)
+			for source in (filename, StringIO.StringIO(open(filename, "rb").read())):
+				band, labels = QubeExtractor().extract_band(source, -1)
+				self.assertEqual(expected[-1].tolist(), band.tolist())
+			for source in (filename, StringIO.StringIO(open(filename, "rb").read())):
+				spectrum, labels = QubeExtractor(fullLabels=False).extract_spectrum(source, 2, 3)
+				self.assertEqual(expected[:, 2, 3].tolist(), spectrum.tolist())
+
+	def test_not_supported(self):
+		"""Qubes of other axes are not supported"""
+		if numpy is None:
+			return
+		filename = self.write_product(('SAMPLE', 'LINE', 'BAND'), (2, 2, 2), (0, 0, 0))
+		qube, labels = QubeExtractor().extract(filename)
+		self.assertEqual({}, qube.backplanes)
+		labels['QUBE']['AXIS_NAME'] = '(SAMPLE,LINE,TIME)'
+		extractor = QubeExtractor()
+		extractor.labels = labels
+		self.assertRaises(QubeNotSupportedError, extractor._check_qube_is_supported)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+stretch.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import unittest
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+class StretchError(ValueError):
+	"""Error raised for a stretch which is not known, or can not be applied."""
+
+	def __init__(self, *args, **kwargs):
+		super(StretchError, self).__init__(*args, **kwargs)
+
+
+# The stretches known to ``stretch``.
+STRETCHES = ('linear', 'percentile', 'shift', 'lut')
+
+# The stretch of samples deeper than 8 bits for display, unless given, see ``to_display``.
+DEFAULT_STRETCH = 'linear'
+
+# The percentiles clipped by a percentile stretch, unless given.
+DEFAULT_PERCENTILES = (0.5, 99.5)
+
+# Arrays are stretched in chunks of whole lines of about this many samples, which bounds the temporary memory.
+CHUNK_SAMPLES = 1024 * 1024
+
+# Integer samples spanning at most this many values are stretched through a lookup table and histogrammed.
+LUT_MAX_VALUES = 1 << 16
+
+
+def stretch(array, spec='linear'):
+	"""Return the samples of the NumPy *array* stretched to 8 bits, as an array of unsigned bytes of the same shape.
+
+	The stretch is given by *spec*, its name optionally followed by a colon and its arguments:
+		* 'linear[:LOW,HIGH]', LOW to HIGH are mapped onto 0 to 255, by default the minimum and maximum,
+		* 'percentile[:LOW,HIGH]', as linear from the LOW to the HIGH percentile, by default 0.5 and 99.5,
+		* 'shift[:BITS]', samples are divided by 2 ** BITS, by default 4 as by ``imageextractor.scale_to_8_bits``,
+		* 'lut:FILE', samples are looked up in a table of up to 65536 values, one per line, read from FILE.
+
+	Samples outside of the stretch are clipped.
+
+	>>> array, labels = ImageExtractor().extract_array('pds.img')
+	>>> img = Image.fromarray(stretch(array, 'percentile:1,99'))
+	"""
+	if numpy is None:
+		raise StretchError("NumPy is required to stretch an image")
+	method, sep, args = spec.partition(':')
+	try:
+		args = [arg.strip() for arg in args.split(',') if arg.strip()]
+		if method == 'lut':
+			if len(args) != 1:
+				raise StretchError("A lut stretch needs a single file, e.g. 'lut:table.txt'")
+			return apply_lut(array, load_lut(args[0]))
+		args = [float(arg) for arg in args]
+	except ValueError, e:
+		raise StretchError("Invalid stretch '%s': %s" % (spec, e))
+	if method == 'linear' and len(args) in (0, 2):
+		return linear(array, *args)
+	if method == 'percentile' and len(args) in (0, 2):
+		return linear(array, *percentile_limits(array, *args))
+	if method == 'shift' and len(args) in (0, 1):
+		return shift(array, *[int(arg) for arg in args])
+	raise StretchError("Invalid stretch '%s', expected one of %s" % (spec, ", ".join(STRETCHES)))
+
+def to_display(array, spec=None):
+	"""Return the image *array* as an array of unsigned bytes of (LINES, LINE_SAMPLES) for display.
+
+	An image of several bands is shown by its first, as by ``ImageExtractor.extract``.
+	Samples are stretched by *spec*, see ``stretch``, those deeper than 8 bits by DEFAULT_STRETCH unless it is given.
+	This is how each of the scripts turns an image into 8 bits, so that they agree.
+
+	>>> array, labels = ImageExtractor().extract_array('pds.img')
+	>>> img = Image.fromarray(to_display(array))
+	"""
+	if array.ndim == 3:
+		array = array[0]
+	if spec or array.dtype != 'u1':
+		array = stretch(array, spec or DEFAULT_STRETCH)
+	return array
+
+def linear(array, low=None, high=None):
+	"""Return *array* stretched linearly from *low* to *high*, by default its minimum and maximum, onto 0 to 255."""
+	if low is None or high is None:
+		low, high = array.min(), array.max()
+	table = _table(array)
+	if table is not None:
+		values, offset = table
+		return apply_lut(array, _linear(values, low, high).astype('u1'), offset)
+	out = numpy.empty(array.shape, 'u1')
+	for chunk, outChunk in zip(_chunks(array), _chunks(out)):
+		outChunk[...] = _linear(chunk, low, high)
+	return out
+
+def shift(array, bits=4):
+	"""Return *array* divided by 2 ** *bits*, clipped to 0 to 255."""
+	table = _table(array)
+	if table is not None:
+		values, offset = table
+		return apply_lut(array, numpy.clip(values >> bits, 0, 255).astype('u1'), offset)
+	out = numpy.empty(array.shape, 'u1')
+	for chunk, outChunk in zip(_chunks(array), _chunks(out)):
+		outChunk[...] = numpy.clip(chunk / float(2 ** bits), 0, 255)
+	return out
+
+def apply_lut(array, lut, offset=0):
+	"""Return the values of the lookup table *lut* for the integer *array*, where lut[0] is that of the sample *offset*.
+
+	Samples beyond either end of the table take the value of that end.
+	"""
+	if array.dtype.kind not in 'iu':
+		raise StretchError("A lookup table can not be applied to samples of type '%s'" % (array.dtype,))
+	lut = numpy.asarray(lut)
+	out = numpy.empty(array.shape, lut.dtype)
+	for chunk, outChunk in zip(_chunks(array), _chunks(out)):
+		if offset:
+			chunk = chunk.astype(numpy.intp) - offset
+		numpy.take(lut, chunk, out=outChunk, mode='clip')
+	return out
+
+def load_lut(filename):
+	"""Return the lookup table held by *filename*, a value from 0 to 255 per line for each sample from 0 on."""
+	lut = numpy.loadtxt(filename, ndmin=1)
+	if not 0 < len(lut) <= LUT_MAX_VALUES or lut.min() < 0 or lut.max() > 255:
+		raise StretchError("'%s' does not hold a lookup table of up to %d values from 0 to 255" % (filename, LUT_MAX_VALUES))
+	return lut.astype('u1')
+
+def histogram(array):
+	"""Return the histogram of the integer *array*, counted in a single pass, and the sample of its first bin.
+
+	Samples of up to 16 bits have a bin for each value of their type, deeper ones for each value
+	from their minimum to their maximum, provided there are at most LUT_MAX_VALUES of them.
+	"""
+	table = _table(array)
+	if table is None:
+		raise StretchError("Samples of type '%s' can not be histogrammed" % (array.dtype,))
+	values, offset = table
+	counts = numpy.zeros(len(values), numpy.intp)
+	for chunk in _chunks(array):
+		if offset:
+			chunk = chunk.astype(numpy.intp) - offset
+		counts += numpy.bincount(chunk.ravel(), minlength=len(values))
+	return counts, offset
+
+def percentile_limits(array, low=DEFAULT_PERCENTILES[0], high=DEFAULT_PERCENTILES[1]):
+	"""Return the samples at the *low* and *high* percentiles of *array*.
+
+	Integer samples are counted in a histogram, see ``histogram``, rather than sorted.
+	Any others, such as reals, are sorted by numpy.percentile, leaving out those which are not finite.
+	"""
+	try:
+		counts, offset = histogram(array)
+	except StretchError:
+		samples = array[numpy.isfinite(array)]
+		if not samples.size:
+			return 0, 0
+		return tuple(numpy.percentile(samples, (low, high)))
+	cumulative = numpy.cumsum(counts)
+	total = cumulative[-1]
+	lowIndex, highIndex = numpy.searchsorted(cumulative, (total * low / 100.0, total * high / 100.0))
+	return offset + lowIndex, offset + min(highIndex, len(counts) - 1)
+
+def _linear(values, low, high):
+	"""Return *values* mapped linearly from *low* to *high* onto 0 to 255, as reals."""
+	scale = high > low and 255.0 / (float(high) - float(low)) or 0.0
+	return numpy.clip((values - float(low)) * scale + 0.5, 0, 255)
+
+def _table(array):
+	"""Return every value the integer samples of *array* may take, in order, and the first of them.
+
+	None is returned for samples which are not integers, or which span too many values for a table.
+	"""
+	dtype = array.dtype
+	if dtype.kind not in 'iu':
+		return None
+	if dtype.itemsize <= 2:
+		first, last = numpy.iinfo(dtype).min, numpy.iinfo(dtype).max
+	elif array.size:
+		first, last = int(array.min()), int(array.max())
+		if last - first >= LUT_MAX_VALUES:
+			return None
+	else:
+		first, last = 0, 0
+	return numpy.arange(first, last + 1, dtype=numpy.int64), first
+
+def _chunks(array):
+	"""Yield views of *array* of whole lines, of about CHUNK_SAMPLES samples each."""
+	if array.ndim > 2:
+		for band in array:
+			for chunk in _chunks(band):
+				yield chunk
+		return
+	if array.ndim < 2:
+		yield array
+		return
+	lines = max(1, CHUNK_SAMPLES // max(1, array.shape[1]))
+	for start in xrange(0, array.shape[0], lines):
+		yield array[start:start + lines]
+
+
+class StretchTests(unittest.TestCase):
+	"""Unit tests for function stretch"""
+	def setUp(self):
+		global CHUNK_SAMPLES
+
+		# Stretch the small arrays in several chunks.
+		self.chunkSamples = CHUNK_SAMPLES
+		CHUNK_SAMPLES = 8
+
+	def tearDown(self):
+		global CHUNK_SAMPLES
+
+		CHUNK_SAMPLES = self.chunkSamples
+
+	def test_linear(self):
+		"""Linear stretches map the limits onto 0 to 255, whatever the sample type"""
+		if numpy is None:
+			return
+		for typeString in ('>u2', '<i2', 'i1', '>i4', '>f4'):
+			array = (numpy.arange(6 * 5).reshape(6, 5) * 4).astype(typeString)
+			stretched = stretch(array)
+			self.assertEqual(numpy.dtype('u1'), stretched.dtype)
+			self.assertEqual(array.shape, stretched.shape)
+			self.assertEqual((0, 255), (stretched.min(), stretched.max()))
+			self.assertTrue((numpy.diff(stretched.ravel().astype(int)) > 0).all())
+			self.assertEqual([[0, 51, 102, 153, 204], [255] * 5], stretch(array, 'linear:0,20')[:2].tolist())
+		self.assertEqual([[0, 1, 255]], stretch(numpy.array([[0, 16, 8000]], '>u2'), 'shift').tolist())
+		self.assertEqual([[0, 0, 255]], stretch(numpy.array([[5, 5, 6]], 'u1'), 'linear:5.5,6').tolist())
+
+	def test_to_display(self):
+		"""Images are shown by their first band, stretched unless they are 8 bit"""
+		if numpy is None:
+			return
+		array = numpy.arange(2 * 2 * 3, dtype='>u2').reshape(2, 2, 3)
+		self.assertEqual(stretch(array[0]).tolist(), to_display(array).tolist())
+		array = numpy.array([[5, 5, 6]], 'u1')
+		self.assertTrue(to_display(array) is array)
+		self.assertEqual([[0, 0, 255]], to_display(array, 'linear').tolist())
+		self.assertEqual([[0, 0, 0]], to_display(array, 'shift').tolist())
+
+	def test_percentile(self):
+		"""Percentiles are found in an integer histogram, or sorted for reals"""
+		if numpy is None:
+			return
+		array = numpy.arange(1000, dtype='>u2').reshape(10, 100)
+		self.assertEqual((9, 989), percentile_limits(array, 1, 99))
+		counts, offset = histogram(array.astype('<i2') - 500)
+		self.assertEqual((-32768, 1000), (offset, counts.sum()))
+		low, high = percentile_limits(array.astype('f8'), 1, 99)
+		self.assertAlmostEqual(9.99, low)
+		stretched = stretch(array, 'percentile:1,99')
+		self.assertEqual((0, 0, 255), (stretched[0, 0], stretched[0, 9], stretched[9, 89]))
+		self.assertRaises(StretchError, stretch, array, 'percentile:1')
+		self.assertRaises(StretchError, stretch, array, 'gamma')
+
+	def test_lut(self):
+		"""Lookup tables are read from a file and applied to the samples"""
+		import os
+		import tempfile
+
+		if numpy is None:
+			return
+		fd, filename = tempfile.mkstemp()
+		try:
+			os.write(fd, "\n".join(str(255 - i) for i in range(256)))
+			os.close(fd)
+			array = numpy.array([[0, 1, 255, 4095]], '>u2')
+			self.assertEqual([[255, 254, 0, 0]], stretch(array, 'lut:%s' % (filename)).tolist())
+		finally:
+			os.remove(filename)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+tableextractor.py
+
+Created on 2026-10-18.
+Copyright (c) 2026 Ryan Balfanz. All rights reserved.
+"""
+
+import mmap
+import os
+import unittest
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from core.common import map_pds
+from core.datatypes import DataTypeError, data_type
+from core.parser import ContentHandler, Parser
+from core.values import decode
+from core.extractorbase import ExtractorBase, ExtractorError, register
+
+
+class TableExtractorError(ExtractorError):
+	"""Base class for exceptions in this module."""
+
+	def __init__(self, *args, **kwargs):
+		super(TableExtractorError, self).__init__(*args, **kwargs)
+
+
+class TableNotSupportedError(TableExtractorError):
+	"""Error raised when a table, or one of its columns, is not supported."""
+
+	def __init__(self, *args, **kwargs):
+		super(TableNotSupportedError, self).__init__(*args, **kwargs)
+
+
+# The NumPy types which the values of ASCII columns are decoded to, any other column is kept as a string.
+ASCII_TYPES = {'ASCII_INTEGER': 'i8', 'ASCII_REAL': 'f8', 'ASCII_COMPLEX': None}
+
+
+class TableExtractor(ExtractorBase):
+	"""Extract a table embedded within, or pointed to by, a PDS file as a NumPy structured array.
+
+	The table is described by the COLUMN objects of its TABLE object, each of which becomes a field named by its NAME.
+	A column of several ITEMS becomes a field of that many values.
+
+	Rows of a BINARY table are read as they are stored, the array is a view of the mapped file rather than a copy.
+	Its fields have the type given by DATA_TYPE and BYTES, see ``datatypes.data_type``, or are strings of bytes for
+	CHARACTER columns. Reading a field only touches the bytes of that field.
+
+	Rows of an ASCII table are cut into fixed-width fields, which are then decoded a column at a time:
+	ASCII_INTEGER as 64 bit integers, ASCII_REAL as 64 bit reals and any other column as strings,
+	stripped of padding and quotes.
+
+	Given *columns*, a list of column names, only those columns are decoded and returned, in that order.
+
+	>>> from tableextractor import TableExtractor
+	>>> te = TableExtractor()
+	>>> table, labels = te.extract('pdsFileWithATable.lbl', columns=['TIME', 'TEMPERATURE'])
+	>>> table['TEMPERATURE'].mean()
+
+	A table other than TABLE, e.g. INDEX_TABLE, is extracted by its *name*.
+	The table may be attached or lie in a file of its own, which is looked for beside the label.
+
+	Unless *fullLabels* is set, only the labels needed to extract the table are parsed and returned,
+	see ``Parser.parse``.
+	"""
+
+	POINTERS = ('TABLE',)
+
+	def __init__(self, log=None, raisesTableNotSupportedError=True, cache=None, fullLabels=True):
+		super(TableExtractor, self).__init__()
+
+		self._parser = Parser(cache=cache)
+		self.cache = cache
+		self.fullLabels = fullLabels
+		self.log = log
+		self.raisesTableNotSupportedError = raisesTableNotSupportedError
+		if log:
+			self._init_logging()
+
+	@classmethod
+	def handles(cls, name):
+		"""Return whether *name* is a table, i.e. TABLE or a kind of one, such as INDEX_TABLE."""
+		return name in cls.POINTERS or name.endswith('_TABLE')
+
+	def extract_object(self, source, name, *args, **kwargs):
+		"""Extract the table *name* of *source*, see ``extract``."""
+		return self.extract(source, name=name, *args, **kwargs)
+
+	def extract(self, source, columns=None, name='TABLE'):
+		"""Extract the table *name* from *source*.
+
+		If the table is supported a NumPy structured array of its rows is returned, otherwise None.
+		"""
+		if numpy is None:
+			raise TableExtractorError("NumPy is required to extract a table")
+		f, mapped = self._open(source, ['RECORD_TYPE', 'RECORD_BYTES', '^' + name, name])
+		table = None
+		try:
+			if self._check_table_is_supported(name):
+				columns = self._get_columns(f, source, name, columns)
+				if columns is not None:
+					table = self._read_table(f, mapped, source, name, columns)
+					if self.log: self.log.debug("Table shape: %s, dtype: %s" % (table.shape, table.dtype))
+		finally:
+			self._close(f, source, mapped)
+
+		return table, self.labels
+
+	def _not_supported(self, errorMessage):
+		"""Raise a TableNotSupportedError, unless *raisesTableNotSupportedError* is unset."""
+		if self.log: self.log.error(errorMessage)
+		if self.raisesTableNotSupportedError:
+			raise TableNotSupportedError(errorMessage)
+		return False
+
+	def _check_table_is_supported(self, name):
+		"""Check that the table is supported."""
+		if not self.labels.has_key(name) or not self.labels.has_key('^' + name):
+			if self.log: self.log.warn("No table '%s' found" % (name))
+			return False
+		interfaceFormat = decode(self.labels[name].get('INTERFACE_FORMAT', 'ASCII'))
+		if interfaceFormat not in ('ASCII', 'BINARY'):
+			return self._not_supported("INTERFACE_FORMAT '%s' is not supported" % (interfaceFormat))
+		return True
+
+	def _get_columns(self, f, source, name, columns=None):
+		"""Return the (name, format, offset, items) of the columns to be decoded, in order.
+
+		Offsets are from the start of the row, its prefix included.
+		"""
+		table = self.labels[name]
+		binary = decode(table.get('INTERFACE_FORMAT', 'ASCII')) == 'BINARY'
+		prefixBytes = int(table.get('ROW_PREFIX_BYTES', 0))
+		found = {}
+		for column in self._get_column_labels(f, source, name):
+			columnName = str(decode(column.get('NAME', 'COLUMN_%d' % (len(found) + 1))))
+			while columnName in found:
+				columnName += '_'
+			found[columnName] = column
+		if columns is None:
+			columns = [columnName for columnName, column in sorted(found.items(), key=lambda item: int(item[1]['START_BYTE']))]
+		described = []
+		for columnName in columns:
+			try:
+				column = found[columnName]
+			except KeyError:
+				raise KeyError("Table '%s' has no column '%s'" % (name, columnName))
+			if 'START_BYTE' not in column or 'BYTES' not in column:
+				return self._not_supported("Column '%s' has no START_BYTE or BYTES" % (columnName)) or None
+			items = int(column.get('ITEMS', 1))
+			columnBytes = int(column['BYTES'])
+			itemBytes = int(column.get('ITEM_BYTES', columnBytes // items))
+			itemOffset = int(column.get('ITEM_OFFSET', itemBytes))
+			if itemOffset != itemBytes:
+				return self._not_supported("Column '%s' has items which are not contiguous" % (columnName)) or None
+			dataType = decode(column.get('DATA_TYPE', 'CHARACTER'))
+			if binary:
+				try:
+					format = _binary_format(dataType, itemBytes)
+				except DataTypeError, e:
+					return self._not_supported("Column '%s': %s" % (columnName, e)) or None
+			else:
+				format = 'S%d' % (itemBytes)
+			offset = prefixBytes + int(column['START_BYTE']) - 1
+			described.append((columnName, format, offset, items, dataType))
+		return described
+
+	def _get_column_labels(self, f, source, name):
+		"""Return the labels of each COLUMN of the table *name*, in order.
+
+		The COLUMN objects of a table share a name, only the last of them is kept by the parsed labels,
+		so the label is scanned again for all of them.
+		A ``product.Product`` keeps them, see ``Product.column_labels``, so its label is scanned once for each table.
+		Extracting from a plain file still scans its label a second time.
+		"""
+		def scan():
+			if hasattr(f, "seek") and not isinstance(f, mmap.mmap):
+				f.seek(0)
+			handler = _ColumnsHandler(name)
+			self._parser.dispatch(f, handler)
+			return handler.columns
+		column_labels = getattr(source, "column_labels", None)
+		if column_labels is not None:
+			return column_labels(name, scan)
+		return scan()
+
+	def _read_table(self, f, mapped, source, name, columns):
+		"""Return the rows of the table, reading only the *columns* of an ASCII table."""
+		table = self.labels[name]
+		rows = int(table['ROWS'])
+		rowBytes = int(table['ROW_BYTES']) + int(table.get('ROW_PREFIX_BYTES', 0)) + int(table.get('ROW_SUFFIX_BYTES', 0))
+		filename, location = self._get_pointer_location(source, name)
+		if filename is not None:
+			if self.log: self.log.debug("Reading table from '%s'" % (filename))
+			f = map_pds(filename)
+			mapped = isinstance(f, mmap.mmap)
+		try:
+			dtype = numpy.dtype({'names': [column[0] for column in columns],
+				'formats': [column[3] > 1 and (column[1], column[3]) or column[1] for column in columns],
+				'offsets': [column[2] for column in columns], 'itemsize': rowBytes})
+			if mapped:
+				data, offset = f, location
+				available = max(0, (len(f) - location) // rowBytes)
+			else:
+				f.seek(location)
+				data, offset = f.read(rows * rowBytes), 0
+				available = len(data) // rowBytes
+			if available < rows:
+				# As for an image, a file cut short is an error rather than a table of fewer rows.
+				raise TableExtractorError("Table '%s' has %d ROWS but only %d were found" % (name, rows, available))
+			raw = numpy.ndarray((rows,), dtype, data, offset)
+		finally:
+			if filename is not None and not mapped:
+				f.close()
+		if decode(table.get('INTERFACE_FORMAT', 'ASCII')) == 'BINARY':
+			return raw
+		return _decode_ascii(raw, columns)
+
+
+class _ColumnsHandler(ContentHandler):
+	"""Collect the labels of each COLUMN of the table *name*, parsing stops once the table is closed."""
+
+	def __init__(self, name):
+		super(_ColumnsHandler, self).__init__()
+		self.name = name
+		self.columns = []
+		self._path = []
+
+	def start_container(self, container, name):
+		self._path.append(name)
+		if self._path[:1] == [self.name] and len(self._path) == 2 and name == 'COLUMN':
+			self.columns.append({})
+
+	def record(self, key, value):
+		if self._path[:1] == [self.name] and len(self._path) == 2 and self._path[1] == 'COLUMN':
+			self.columns[-1][key] = value
+
+	def end_container(self, container, name):
+		self._path.pop()
+		return name == self.name and not self._path
+
+
+def _binary_format(dataType, itemBytes):
+	"""Return the NumPy type string of an item of *itemBytes* of a BINARY column of *dataType*."""
+	if dataType in ('CHARACTER', 'ASCII_INTEGER', 'ASCII_REAL') or dataType.endswith('BIT_STRING'):
+		return 'S%d' % (itemBytes)
+	return data_type(dataType, itemBytes * 8)
+
+def _decode_ascii(raw, columns):
+	"""Return a structured array of the ASCII fields of *raw* decoded as per the DATA_TYPE of each of the *columns*."""
+	formats = []
+	for columnName, format, offset, items, dataType in columns:
+		formats.append(ASCII_TYPES.get(dataType) or format)
+	dtype = numpy.dtype({'names': [column[0] for column in columns],
+		'formats': [column[3] > 1 and (format, column[3]) or format for format, column in zip(formats, columns)]})
+	table = numpy.empty(raw.shape, dtype)
+	for (columnName, format, offset, items, dataType), decodedFormat in zip(columns, formats):
+		field = raw[columnName]
+		if decodedFormat == format:
+			table[columnName] = numpy.char.strip(field, ' "\t')
+			continue
+		try:
+			if dataType == 'ASCII_INTEGER':
+				table[columnName] = _parse_integers(field)
+			else:
+				table[columnName] = _parse_reals(field)
+		except ValueError, e:
+			raise TableExtractorError("Column '%s' holds a value which is not %s: %s" % (columnName, dataType, e))
+	return table
+
+# The bytes of a decimal integer field, its digits, blanks and sign.
+_INTEGER_BYTES = numpy and numpy.zeros(256, bool)
+if numpy is not None:
+	_INTEGER_BYTES[[ord(c) for c in "0123456789 +-"]] = True
+
+def _parse_integers(field):
+	"""Return the fixed-width decimal integers of the string array *field*, which may be padded by blanks.
+
+	The digits of every field are accumulated a byte column at a time, rather than converting each field in turn.
+	Fields which are not plain integers, such as blank ones, are left to NumPy, which raises a ValueError.
+	"""
+	width = field.dtype.itemsize
+	digits = numpy.ascontiguousarray(field).view('u1').reshape(field.shape + (width,))
+	values = numpy.zeros(field.shape, 'i8')
+	found = numpy.zeros(field.shape, bool)
+	signs = numpy.zeros(field.shape, 'u1')
+	negative = numpy.zeros(field.shape, bool)
+	for i in xrange(width):
+		byte = digits[..., i]
+		digit = byte - 48
+		isDigit = digit < 10
+		values = numpy.where(isDigit, values * 10 + digit, values)
+		found |= isDigit
+		signs += (byte == 43) | (byte == 45)
+		negative |= byte == 45
+	if not (_INTEGER_BYTES[digits].all() and found.all() and (signs <= 1).all()):
+		return field.astype('i8')
+	return numpy.where(negative, -values, values)
+
+def _parse_reals(field):
+	"""Return the reals of the string array *field*, blank fields are missing values, i.e. NaN."""
+	try:
+		return field.astype('f8')
+	except ValueError:
+		field = numpy.char.strip(field)
+		# FORTRAN style exponents, e.g. 1.0D+02.
+		field = numpy.char.replace(numpy.char.upper(field), 'D', 'E')
+		return numpy.where(field == '', 'nan', field).astype('f8')
+
+register(TableExtractor)
+
+
+class TableExtractorTests(unittest.TestCase):
+	"""Unit tests for class TableExtractor"""
+	def write_product(self, rowBytes, rows, interfaceFormat, columns, data, detached=False):
+		"""Write a product with a table of *columns*, each (NAME, DATA_TYPE, START_BYTE, BYTES, ITEMS), and return its filename."""
+		recordBytes = rowBytes
+		labels = ["PDS_VERSION_ID = PDS3", "RECORD_TYPE = FIXED_LENGTH", "RECORD_BYTES = %d" % (recordBytes),
+			"LABEL_RECORDS = %d", detached and '^TABLE = "TABLE.DAT"' or "^TABLE = %d", "OBJECT = TABLE",
+			"INTERFACE_FORMAT = %s" % (interfaceFormat), "ROWS = %d" % (rows), "ROW_BYTES = %d" % (rowBytes),
+			"COLUMNS = %d" % (len(columns))]
+		for columnName, dataType, startByte, columnBytes, items in columns:
+			labels.extend(("OBJECT = COLUMN", '  NAME = "%s"' % (columnName), "  DATA_TYPE = %s" % (dataType),
+				"  START_BYTE = %d" % (startByte), "  BYTES = %d" % (columnBytes)))
+			if items > 1:
+				labels.append("  ITEMS = %d" % (items))
+			labels.append("END_OBJECT = COLUMN")
+		labels.extend(("END_OBJECT = TABLE", "END", ""))
+		label = "\r\n".join(labels)
+		labelRecords = len(label) // recordBytes + 2
+		label = detached and label % (labelRecords,) or label % (labelRecords, labelRecords + 1)
+		label = label.ljust(labelRecords * recordBytes)
+		filename = os.path.join(self.directory, "product%d.lbl" % (len(os.listdir(self.directory))))
+		with open(filename, "wb") as f:
+			f.write(detached and label or label + data)
+		if detached:
+			with open(os.path.join(self.directory, "table.dat"), "wb") as f:
+				f.write(data)
+		return filename
+
+	def setUp(self):
+		import tempfile
+
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		import shutil
+
+		shutil.rmtree(self.directory)
+
+	def test_binary(self):
+		"""Binary tables are views of the mapped file, of the columns asked for"""
+		import cStringIO as StringIO
+
+		if numpy is None:
+			return
+		stored = numpy.zeros(5, [('COUNT', '>i4'), ('NAME', 'S3'), ('SPECTRUM', '<f4', 3), ('PAD', 'S2')])
+		stored['COUNT'] = range(-2, 3)
+		stored['NAME'] = ['a', 'bc', 'def', '', 'g']
+		stored['SPECTRUM'] = numpy.arange(15).reshape(5, 3) / 2.0
+		columns = (("COUNT", "MSB_INTEGER", 1, 4, 1), ("NAME", "CHARACTER", 5, 3, 1), ("SPECTRUM", "PC_REAL", 8, 12, 3))
+		for detached in (True, False):
+			filename = self.write_product(stored.dtype.itemsize, 5, "BINARY", columns, stored.tostring(), detached)
+			table, labels = TableExtractor().extract(filename)
+			self.assertEqual(['COUNT', 'NAME', 'SPECTRUM'], list(table.dtype.names))
+			for name in table.dtype.names:
+				self.assertEqual(stored[name].tolist(), table[name].tolist())
+			self.assertFalse(table.flags.owndata)
+		table, labels = TableExtractor().extract(StringIO.StringIO(open(filename, "rb").read()), columns=['SPECTRUM', 'COUNT'])
+		self.assertEqual(('SPECTRUM', 'COUNT'), table.dtype.names)
+		self.assertEqual(stored['SPECTRUM'].tolist(), table['SPECTRUM'].tolist())
+		self.assertRaises(KeyError, TableExtractor().extract, filename, columns=['MISSING'])
+		# A table cut short is not extracted, whether it is mapped or read.
+		truncated = self.write_product(stored.dtype.itemsize, 5, "BINARY", columns, stored.tostring()[:-1], False)
+		self.assertRaises(TableExtractorError, TableExtractor().extract, truncated)
+		self.assertRaises(TableExtractorError, TableExtractor().extract, StringIO.StringIO(open(truncated, "rb").read()))
+
+	def test_ascii(self):
+		"""ASCII tables are decoded a column at a time"""
+		if numpy is None:
+			return
+		rows = ['  12, 1.5E+02,"ABC "\r\n', '  -3,-2.0D-01,"D"   \r\n', '   7,        ,"EF"  \r\n']
+		columns = (("COUNT", "ASCII_INTEGER", 1, 4, 1), ("VALUE", "ASCII_REAL", 6, 8, 1), ("NAME", "CHARACTER", 15, 6, 1))
+		filename = self.write_product(len(rows[0]), 3, "ASCII", columns, "".join(rows))
+		table, labels = TableExtractor().extract(filename)
+		self.assertEqual([12, -3, 7], table['COUNT'].tolist())
+		self.assertEqual([150.0, -0.2], table['VALUE'][:2].tolist())
+		self.assertTrue(numpy.isnan(table['VALUE'][2]))
+		self.assertEqual(['ABC', 'D', 'EF'], table['NAME'].tolist())
+		table, labels = TableExtractor().extract(filename, columns=['NAME'])
+		self.assertEqual(('NAME',), table.dtype.names)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -17,4 +17,4 @@ setup(
 	author_email='ryan@ryanbalfanz.net',
 	url='http://github.com/RyanBalfanz/PyPDS',
 	packages=['pds', 'pds.core'],
-	scripts=['bin/pds-labels.py', 'bin/pds-image.py', 'bin/pds-view.py', 'bin/pds-convert.py'],)
\ No newline at end of file
+	scripts=['bin/pds-labels.py', 'bin/pds-image.py', 'bin/pds-view.py', 'bin/pds-convert.py', 'bin/pds-index.py'],)
\ No newline at end of file